@@ -0,0 +1,264 @@
+'''
+Benchmark suite for the pymaiden modules. Times the scalar pymaiden
+functions and their pymaiden_batch and pymaiden_parallel counterparts on
+reproducible synthetic data at several element counts, and writes the
+results to a JSON file that can be compared between runs.
+
+Run from the bench directory:
+    python bench_pymaiden.py --output run1.json
+    python bench_pymaiden.py --sizes 1 1000 --output run2.json
+    python bench_pymaiden.py --compare run1.json run2.json
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+# This setup is needed to access pymaiden imports while working from the \bench directory
+import os
+import sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_path))
+
+import argparse
+import datetime
+import json
+import platform
+import time
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_parallel
+import pymaiden_rollup
+
+
+# ====================================================================
+# Default element counts, random seed and the largest number of calls made
+# to a scalar function. Scalar timings for larger counts are scaled up from
+# the per call time of scalar_limit calls.
+default_sizes = (1, 1000, 1000000, 10000000)
+default_seed = 20230101
+scalar_limit = 10000
+
+# Ratio of new to old time per element reported as a regression by --compare
+regression_ratio = 1.10
+
+# Worker processes of the parallel benchmarks. At least 2, as one worker
+# runs the job in this process. Each job is split into one shard per worker,
+# so every element count of at least parallel_workers goes through the pool.
+parallel_workers = max(os.cpu_count() or 1, 2)
+
+
+# ====================================================================
+# Synthetic data generators. The same seed and count always give the same data.
+
+# Returns: Tuple of latitude and longitude arrays of random points
+def random_points(n, seed=default_seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-89.999, 89.999, n), rng.uniform(-179.999, 179.999, n)
+
+
+# Returns: 'U' array of random valid grid IDs with the given precision
+def random_grid_IDs(n, precision=10, seed=default_seed):
+    lat, lon = random_points(n, seed)
+    return pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, precision, 'U')[0]
+
+
+# Returns: 'U' array of 10 character grid IDs in n different latitude rows (up
+#          to the 1,036,800 rows), so grid_location_size never finds a row cached
+def distinct_row_grid_IDs(n, seed=default_seed):
+    rng = np.random.default_rng(seed)
+    rows = rng.permutation(pymaiden.grid_code_cells)[:n] if n <= pymaiden.grid_code_cells else rng.integers(0, pymaiden.grid_code_cells, n)
+    lat = (rows + 0.5) * (180 / pymaiden.grid_code_cells) - 90
+    return pymaiden_batch.lat_lon_to_grid_ID_array(lat, rng.uniform(-179.999, 179.999, n), 10, 'U')[0]
+
+
+# Returns: Tuple of start lat, start lon, end lat and end lon arrays of random spot pairs
+def random_spot_pairs(n, seed=default_seed):
+    slat, slon = random_points(n, seed)
+    elat, elon = random_points(n, seed + 1)
+    return slat, slon, elat, elon
+
+
+# ====================================================================
+# Benchmark definitions. Each entry is (name, kind, setup) where setup(n)
+# returns a function that processes n elements when called. Scalar setups
+# return a function that loops over the scalar function, batch and parallel
+# setups one that makes a single call on arrays of n elements.
+
+def _scalar_loop(function, *columns):
+    rows = list(zip(*(column.tolist() for column in columns)))
+    def run():
+        for row in rows:
+            function(*row)
+    return run
+
+def _scalar(function, data):
+    return lambda n: _scalar_loop(function, *data(n))
+
+def _vector_call(function, *columns):
+    return lambda: function(*columns)
+
+def _vector(function, data):
+    return lambda n: _vector_call(function, *data(n))
+
+def _parallel_call(function, *columns):
+    chunk_rows = -(-len(columns[0]) // parallel_workers)
+    return lambda: function(*columns, workers=parallel_workers, chunk_rows=chunk_rows)
+
+def _parallel(function, data):
+    return lambda n: _parallel_call(function, *data(n))
+
+# grid_location_size with an empty cache at the start of every run
+def _uncached_size(n):
+    run = _scalar_loop(pymaiden.grid_location_size, distinct_row_grid_IDs(n))
+    def uncached_run():
+        pymaiden.grid_size_cache.clear()
+        run()
+    return uncached_run
+
+def _ids(n, precision=10):
+    return (random_grid_IDs(n, precision),)
+
+def _id_pairs(n):
+    return random_grid_IDs(n, 6), random_grid_IDs(n, 6, default_seed + 1)
+
+def _codes(n):
+    return (pymaiden_batch.pack_grid_ID_array(random_grid_IDs(n))[0],)
+
+benchmarks = [
+    ('grid_location_valid_ID', 'scalar', _scalar(pymaiden.grid_location_valid_ID, _ids)),
+    ('lat_lon_to_grid_ID', 'scalar', _scalar(pymaiden.lat_lon_to_grid_ID, random_points)),
+    ('grid_location_ID_bounds', 'scalar', _scalar(pymaiden.grid_location_ID_bounds, _ids)),
+    ('grid_location_size', 'scalar', _uncached_size),
+    ('grid_location_size cached', 'scalar', _scalar(pymaiden.grid_location_size, lambda n: _ids(n, 6))),
+    ('lat_lon_distance', 'scalar', _scalar(pymaiden.lat_lon_distance, random_spot_pairs)),
+    ('grid_location_distance', 'scalar', _scalar(pymaiden.grid_location_distance, _id_pairs)),
+    ('angle_from_coordinates', 'scalar', _scalar(pymaiden.angle_from_coordinates, random_spot_pairs)),
+    ('angle_from_grid_location_IDs', 'scalar', _scalar(pymaiden.angle_from_grid_location_IDs, _id_pairs)),
+    ('pack_grid_ID', 'scalar', _scalar(pymaiden.pack_grid_ID, _ids)),
+    ('grid_location_neighbors', 'scalar', _scalar(pymaiden.grid_location_neighbors, _ids)),
+
+    ('grid_location_valid_ID_array', 'batch', _vector(pymaiden_batch.grid_location_valid_ID_array, _ids)),
+    ('grid_location_neighbors_array', 'batch', _vector(pymaiden_batch.grid_location_neighbors_array, _codes)),
+    ('lat_lon_to_grid_ID_array', 'batch', _vector(pymaiden_batch.lat_lon_to_grid_ID_array, random_points)),
+    ('lat_lon_to_grid_code_array', 'batch', _vector(pymaiden_batch.lat_lon_to_grid_code_array, random_points)),
+    ('grid_location_ID_bounds_array', 'batch', _vector(pymaiden_batch.grid_location_ID_bounds_array, _ids)),
+    ('grid_location_ID_bounds_array codes', 'batch', _vector(pymaiden_batch.grid_location_ID_bounds_array, _codes)),
+    ('pack_grid_ID_array', 'batch', _vector(pymaiden_batch.pack_grid_ID_array, _ids)),
+    ('unpack_grid_ID_array', 'batch', _vector(pymaiden_batch.unpack_grid_ID_array, _codes)),
+    ('lat_lon_distance_array', 'batch', _vector(pymaiden_batch.lat_lon_distance_array, random_spot_pairs)),
+    ('grid_location_distance_array', 'batch', _vector(pymaiden_batch.grid_location_distance_array, _id_pairs)),
+    ('angle_from_coordinates_array', 'batch', _vector(pymaiden_batch.angle_from_coordinates_array, random_spot_pairs)),
+    ('angle_from_grid_location_IDs_array', 'batch', _vector(pymaiden_batch.angle_from_grid_location_IDs_array, _id_pairs)),
+    ('geodesic_inverse_array', 'batch', _vector(pymaiden_batch.geodesic_inverse_array, random_spot_pairs)),
+    ('grid_location_rollup', 'batch', _vector(pymaiden_rollup.grid_location_rollup, _ids)),
+    ('grid_location_distance_matrix', 'batch', _vector(pymaiden_batch.grid_location_distance_matrix, lambda n: _id_pairs(max(int(n**0.5), 1)))),
+
+    ('lat_lon_to_grid_ID_parallel', 'parallel', _parallel(pymaiden_parallel.lat_lon_to_grid_ID_parallel, random_points)),
+    ('grid_location_ID_bounds_parallel', 'parallel', _parallel(pymaiden_parallel.grid_location_ID_bounds_parallel, _ids)),
+    ('lat_lon_distance_parallel', 'parallel', _parallel(pymaiden_parallel.lat_lon_distance_parallel, random_spot_pairs)),
+    ('angle_from_coordinates_parallel', 'parallel', _parallel(pymaiden_parallel.angle_from_coordinates_parallel, random_spot_pairs)),
+    ('grid_location_distance_parallel', 'parallel', _parallel(pymaiden_parallel.grid_location_distance_parallel, _id_pairs)),
+    ('angle_from_grid_location_IDs_parallel', 'parallel', _parallel(pymaiden_parallel.angle_from_grid_location_IDs_parallel, _id_pairs)),
+]
+
+
+# ====================================================================
+# Time one benchmark at one element count
+# Returns: Result structure with the best time of repeats runs
+def run_benchmark(name, kind, setup, n, repeats=3):
+
+    # Scalar loops are timed on at most scalar_limit calls
+    timed = min(n, scalar_limit) if kind == 'scalar' else n
+    run = setup(timed)
+
+    # Single runs are enough for large counts
+    repeats = repeats if timed <= 100000 else 1
+    best = float('inf')
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    return {'name': name, 'kind': kind, 'elements': n, 'elements_timed': timed,
+            'seconds': best * n / timed, 'ns_per_element': best * 1e9 / timed}
+
+
+# ====================================================================
+# Run the benchmarks
+# Input parameters: element counts, benchmark kinds and name filter, repeats and
+#                   an optional function called with each result as it is made
+# Returns: Run structure with metadata and the list of results
+def run_benchmarks(sizes=default_sizes, kinds=('scalar', 'batch', 'parallel'), match=None, repeats=3, report=None):
+
+    results = []
+    for name, kind, setup in benchmarks:
+        if kind not in kinds or (match and match not in name):
+            continue
+        for n in sizes:
+            # Fewer elements than workers can not be shared out to the pool
+            if kind == 'parallel' and n < parallel_workers:
+                continue
+            result = run_benchmark(name, kind, setup, n, repeats)
+            results.append(result)
+            if report:
+                report(result)
+
+    return {'meta': {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(),
+                     'numpy': np.__version__,
+                     'platform': platform.platform(),
+                     'cpus': os.cpu_count(),
+                     'seed': default_seed,
+                     'scalar_limit': scalar_limit,
+                     'parallel_workers': parallel_workers},
+            'results': results}
+
+
+# ====================================================================
+# Compare two benchmark runs
+# Returns: List of (name, kind, elements, old ns, new ns, ratio) for results in both runs
+def compare_runs(old, new):
+
+    old_results = {(r['name'], r['kind'], r['elements']): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        key = (r['name'], r['kind'], r['elements'])
+        if key in old_results:
+            old_ns = old_results[key]['ns_per_element']
+            rows.append(key + (old_ns, r['ns_per_element'], r['ns_per_element'] / old_ns if old_ns else float('inf')))
+
+    return rows
+
+
+def _print_result(result):
+    print('%-40s %-8s %10d %14.1f ns/element' % (result['name'], result['kind'], result['elements'], result['ns_per_element']))
+
+
+# ====================================================================
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the pymaiden modules.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(default_sizes), help='element counts to time')
+    parser.add_argument('--kinds', nargs='+', default=['scalar', 'batch', 'parallel'], help='benchmark kinds to run')
+    parser.add_argument('--match', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--repeats', type=int, default=3, help='runs per timing, the best is kept')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two JSON result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = 0
+        for name, kind, elements, old_ns, new_ns, ratio in compare_runs(old, new):
+            flag = '  REGRESSION' if ratio > regression_ratio else ''
+            regressions += bool(flag)
+            print('%-40s %-8s %10d %12.1f %12.1f %6.2fx%s' % (name, kind, elements, old_ns, new_ns, ratio, flag))
+        sys.exit(1 if regressions else 0)
+
+    run = run_benchmarks(args.sizes, args.kinds, args.match, args.repeats, _print_result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=1)
@@ -1,7 +1,16 @@
 '''
-This module contains a set of eight functions that provide calculations related
+This module contains a set of functions that provide calculations related
 to the Maidenhead Grid Locator System used world wide by the Amateur Radio
-community. Refer to the readme.md file for information on the Maidenhead Grid
+community:
+    grid_location_valid_ID, lat_lon_to_grid_ID, grid_location_ID_bounds and
+    grid_location_size check, find and measure grid squares
+    lat_lon_distance, grid_location_distance, angle_from_coordinates and
+    angle_from_grid_location_IDs give distances and bearings
+    lat_lon_to_grid_code, pack_grid_ID and unpack_grid_ID convert to and
+    from packed integer grid codes
+    grid_location_neighbors and grid_location_k_ring find the squares
+    around a grid square
+Refer to the readme.md file for information on the Maidenhead Grid
 Locator System and the usage of the pymaiden module.
 
 Written by: Kevin Hallquist, WB7BGJ
@@ -10,8 +19,7 @@ Written by: Kevin Hallquist, WB7BGJ
 
 # ====================================================================
 # Module imports:
-from pyproj import Geod
-import numpy as np
+from collections import Counter, OrderedDict, deque
 import gridtables # Used for converting between Lat/Lon and grid formats.
 import math
 import re
@@ -27,254 +35,625 @@ grid_location_pattern_AR09ax = re.compile(r'^[A-R]{2}[0-9]{2}[a-x]{2}$')
 grid_location_pattern_AR09ax09 = re.compile(r'^[A-R]{2}[0-9]{2}[a-x]{2}[0-9]{2}$')
 grid_location_pattern_AR09ax09AX = re.compile(r'^[A-R]{2}[0-9]{2}[a-x]{2}[0-9]{2}[A-X]{2}$')
 
+# Character class of each byte value used by grid_location_valid_ID. F is a
+# Field letter A-R, X a Super extended subsquare only letter S-X, D a digit
+# and s a Subsquare letter a-x. Every other byte is ?. A grid ID is valid
+# when its class string is one of grid_location_valid_classes.
+grid_location_char_classes = bytes(
+    ord('F') if 'A' <= chr(c) <= 'R' else
+    ord('X') if 'S' <= chr(c) <= 'X' else
+    ord('D') if '0' <= chr(c) <= '9' else
+    ord('s') if 'a' <= chr(c) <= 'x' else ord('?') for c in range(256))
+grid_location_valid_classes = frozenset((b'FF', b'FFDD', b'FFDDss', b'FFDDssDD',
+                                         b'FFDDssDDFF', b'FFDDssDDFX', b'FFDDssDDXF', b'FFDDssDDXX'))
+
 
 # ====================================================================
-# Validates correct format of a given grid ID.
-# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string
-# Returns: True or False
-def grid_location_valid_ID(gl_id):
+# Scale multipliers for different units of distance. Mean radius of the
+# Earth in kilometers, statute miles and nautical miles.
+kilometers = 6371.0210
+statute_miles = 3958.7613
+nautical_miles = 3437.8675
 
-    # Use the regular expression to valid the format of the given grid ID 
-    if (len(gl_id)%2 == 0) and (len(gl_id) >= 2) and (len(gl_id) <= 10):
-        if (len(gl_id) == 2):
-            if grid_location_pattern_AR.match(gl_id):
-                return True
-            else:
-                return False
-        elif (len(gl_id) == 4):
-            if grid_location_pattern_AR09.match(gl_id):
-                return True
-            else:
-                return False
-        elif (len(gl_id) == 6):
-            if grid_location_pattern_AR09ax.match(gl_id):
-                return True
-            else:
-                return False
-        elif (len(gl_id) == 8):
-            if grid_location_pattern_AR09ax09.match(gl_id):
-                return True
-            else:
-                return False
+# Meters in one kilometer, statute mile and nautical mile. Used to convert
+# WGS84 geodesic distances.
+meters_per_unit = {'km': 1000.0, 'smi': 1609.344, 'nmi': 1852.0}
+
+# Earth models used for distance and bearing. 'sphere' uses the mean radius
+# above, 'wgs84' solves the geodesic on the WGS84 ellipsoid with pyproj.
+earth_models = ('sphere', 'wgs84')
+
+
+# ====================================================================
+# Packed grid codes. A grid ID can be packed into one integer that fits in
+# 64 bits: (pairs << 40) | (lon_cell << 20) | lat_cell
+# pairs is the number of character pairs in the grid ID (1 to 5). lon_cell and
+# lat_cell are the indexes of the grid ID's SW Super extended square counted
+# from the SW corner of field AA (0 to 1,036,799). A code of 0 is never valid.
+grid_code_divisions = (18, 10, 24, 10, 24)  # Fields, Squares, Subsquares, ...
+grid_code_char_base = (ord('A'), ord('0'), ord('a'), ord('0'), ord('A'))
+grid_code_cells = 1036800                   # 18*10*24*10*24 cells in lon and in lat
+grid_code_lon_shift = 20
+grid_code_pairs_shift = 40
+grid_code_cell_mask = (1 << 20) - 1
+
+# Number of Super extended squares in one grid square, indexed by pairs
+grid_code_cell_units = (grid_code_cells, 57600, 5760, 240, 24, 1)
+
+# Grid square size in degrees and SW corner to center offsets, indexed by pairs
+grid_lon_size = (0, 20, 2, 5/60, 30/3600, 1.25/3600)
+grid_lat_size = (0, 10, 1, 2.5/60, 15/3600, 0.625/3600)
+grid_lon_center = (0, 10, 1, 2.5/60, 15/3600, 0.625/3600)
+grid_lat_center = (0, 5, .5, 1.25/60, 7.5/3600, 0.3125/3600)
+
+# Field size and Square size in degrees and Subsquares per degree, the steps
+# of _grid_digits in longitude and in latitude
+grid_lon_steps = (20, 2, 12)
+grid_lat_steps = (10, 1, 24)
+
+# Largest lon + 180 and lat + 90 offsets inside the grid. A longitude just
+# below 180 rounds up to an offset of 360 when 180 is added, it is kept in
+# the last Super extended square instead.
+grid_lon_offset_max = math.nextafter(360.0, 0.0)
+grid_lat_offset_max = math.nextafter(180.0, 0.0)
+
+# gridtables boundary values in degrees indexed by the digit value of each pair level
+grid_code_lon_degrees = tuple(tuple(gridtables.lon_degrees[level][ord(c)] for c in chars) for level, chars in enumerate(gridtables.pair_chars))
+grid_code_lat_degrees = tuple(tuple(gridtables.lat_degrees[level][ord(c)] for c in chars) for level, chars in enumerate(gridtables.pair_chars))
+
+
+# ====================================================================
+# Handling of out of range input. The lat/lon functions take errors, one of
+# error_modes or an ErrorLog:
+#   'print', print a message and return False (the scalar default)
+#   'mask', return False without printing. Batch functions return the valid mask.
+#   'nan', return the value batch functions give invalid rows: NaN, '' or 0
+#          (the batch default)
+#   'raise', raise InputError
+#   'collect', return the 'nan' value and add the error code to error_log, or
+#              to the ErrorLog given as errors
+error_modes = ('print', 'mask', 'nan', 'raise', 'collect')
+
+# Error codes, in the order the values are checked. The first failed check
+# gives the code of an invalid input.
+input_ok = 0
+lat_error = 1
+lon_error = 2
+end_lat_error = 3
+end_lon_error = 4
+precision_error = 5
+error_messages = ('', 'latitude must be -90<=lat<90', 'longitude must be -180<=lon<180',
+                  'end latitude must be -90<=lat<90', 'end longitude must be -180<=lon<180',
+                  'precision must be 2, 4, 6, 8 or 10')
+
+# Messages printed in the 'print' mode. The end point checks print the same
+# text as the start point checks, as they always have.
+print_messages = error_messages[:end_lat_error] + error_messages[lat_error:end_lat_error] + error_messages[precision_error:]
+
+
+# ====================================================================
+# Raised for out of range input when errors is 'raise'. code is the error
+# code, value the first invalid value, and for batch functions row is its
+# flat row index and count the number of invalid rows.
+class InputError(ValueError):
+
+    def __init__(self, function, code, value, row=None, count=1):
+
+        self.function = function
+        self.code = code
+        self.value = value
+        self.row = row
+        self.count = count
+        if row is None:
+            message = '%s: %s, given %r' % (function, error_messages[code], value)
         else:
-            if grid_location_pattern_AR09ax09AX.match(gl_id):
-                return True
-            else:
-                return False
-    else:
-        # Invalid string length
-        return False
+            message = '%s: %d invalid rows, first at row %d: %s, given %r' % (function, count, row, error_messages[code], value)
+        super().__init__(message)
 
 
 # ====================================================================
-# Find cooresponding grid ID for a given lat/lon location
-# Input parameters: Longitude and Latitiude. (Use minus prefix for South and West)
-# Returns: A 10 character Grid Locator ID string
-def lat_lon_to_grid_ID(lat, lon):
-    
-    # Check that latitude and longitude values given are within required range
-    if not (-90 < lat < 90):
-        print('latitude must be -90<=lat<90, given %f\n'%lat)
-        return False
+# Most calls an ErrorLog keeps by default. Older entries are dropped first so
+# a long running process collecting errors does not grow without bound.
+error_log_max = 1000
 
-    if not (-180 < lon < 180):
-        print('longitude must be -180<=lon<180, given %f\n'%lon)
+
+# ====================================================================
+# Collects the errors of calls made with errors='collect' or errors=<ErrorLog>
+class ErrorLog:
+
+    # ====================================================================
+    # Input parameter: maxlen, the most calls kept (None keeps every call)
+    def __init__(self, maxlen=error_log_max):
+        self.entries = deque(maxlen=maxlen)
+
+    # ====================================================================
+    # Record the errors of one call
+    # Input parameters: Function name and for a scalar function its error code,
+    #                   for a batch function arrays of the error codes and flat
+    #                   row indexes of its invalid rows
+    def add(self, function, codes, rows=None):
+        self.entries.append((function, codes, rows))
+
+    # ====================================================================
+    # Returns: Dict of the number of errors by error code
+    def counts(self):
+
+        counts = Counter()
+        for function, codes, rows in self.entries:
+            counts.update(codes.tolist() if rows is not None else (codes,))
+        return dict(counts)
+
+    def clear(self):
+        self.entries.clear()
+
+    # Number of errors recorded
+    def __len__(self):
+        return sum(1 if rows is None else len(rows) for function, codes, rows in self.entries)
+
+# ErrorLog used by errors='collect'
+error_log = ErrorLog()
+
+
+# ====================================================================
+# Check an errors argument before any input is looked at, so a bad mode is
+# reported even when every input is in range
+def _check_errors(errors):
+
+    if errors not in error_modes and not isinstance(errors, ErrorLog):
+        raise ValueError('errors must be one of %s or an ErrorLog, given %r' % (', '.join(error_modes), errors))
+
+
+# ====================================================================
+# Handle out of range input to a scalar function the way errors asks for
+# Input parameters: errors, the function name, the error code, the invalid value
+#                   and the value returned for invalid input in the 'nan' mode
+# Returns: False, or the 'nan' value
+def _input_error(errors, function, code, value, fill):
+
+    if errors == 'print':
+        print('%s, given %s\n' % (print_messages[code], value if code == precision_error else '%f' % value))
         return False
+    if errors == 'mask':
+        return False
+    if errors == 'raise':
+        raise InputError(function, code, value)
+    if errors == 'collect':
+        error_log.add(function, code)
+    elif isinstance(errors, ErrorLog):
+        errors.add(function, code)
 
-    # Convert plus/minus 90 deg lat and 180 deg lon format to 180 deg Lat and 360 deg Lon format
-    gls_lon = lon + 180.0
-    gls_lat = lat + 90.0
+    return fill
 
-    # Created initial empty grid ID string
-    grid_ID = ""
+
+# ====================================================================
+# Validates correct format of a given grid ID.
+# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string
+# Returns: True or False
+def grid_location_valid_ID(gl_id):
+
+    # Replace each character with its class in one pass and look up the class string
+    return gl_id.isascii() and gl_id.encode().translate(grid_location_char_classes) in grid_location_valid_classes
+
+
+# ====================================================================
+# Find the digit of each pair level holding a location along one axis. Shared
+# by the scalar and the array encoders so that both give the same grid IDs:
+# with trunc=int it works on floats, with a truncating array conversion on
+# NumPy arrays, and both round every step the same way.
+# Input parameters: lon + 180 or lat + 90 offset in degrees, grid_lon_steps or
+#                   grid_lat_steps, and trunc, conversion truncating to integers
+# Returns: Tuple of the Field, Square, Subsquare, Extended square and Super
+#          extended square digits
+def _grid_digits(gls, field_size, square_size, subsquares, trunc=int):
 
     #-----------------------------------------
-    # Calculate First Pair (AA-RR)
-    # Field, A-R, 18x18, 20 x 10 degrees
-    field_lon_index = int(gls_lon/20)
-    grid_ID += gridtables.field[field_lon_index]
-     
-    field_lat_index = int(gls_lat/10)
-    grid_ID += gridtables.field[field_lat_index]
-        
-    #-----------------------------------------
-    # Calculate Second Pair (00-99)
-    # Square, 0-9, 10x10,  2 x 1 degrees
-    lon_square_index_rmdr = (gls_lon - field_lon_index*20)/2
-    grid_lon_square = str(int(lon_square_index_rmdr))
-    grid_ID += grid_lon_square
-    
-    lat_square_index_rmdr = (gls_lat - field_lat_index*10)/1
-    grid_lat_square = str(int(lat_square_index_rmdr))
-    grid_ID += grid_lat_square
+    # First Pair, Field, A-R, 18x18, 20 x 10 degrees
+    field_index = trunc(gls/field_size)
 
     #-----------------------------------------
-    # Calculate Third Pair (aa-xx)
-    # Subsquare, a-x, 24x24,  5 x 2.5 minutes
-    lon_subsquare_rmdr = lon_square_index_rmdr*2 - int(lon_square_index_rmdr)*2
-    lon_subsquare_index = int(lon_subsquare_rmdr * 12)
-    grid_lon_subsquare = gridtables.subsquare[lon_subsquare_index]
-    grid_ID += grid_lon_subsquare
-
-    lat_subsquare_rmdr = lat_square_index_rmdr - int(lat_square_index_rmdr)
-    lat_subsquare_index = int(lat_subsquare_rmdr * 24)
-    grid_lat_subsquare = gridtables.subsquare[lat_subsquare_index]
-    grid_ID += grid_lat_subsquare
-    
+    # Second Pair, Square, 0-9, 10x10,  2 x 1 degrees
+    square_index_rmdr = (gls - field_index*field_size)/square_size
+    square_index = trunc(square_index_rmdr)
+
     #-----------------------------------------
-    # Calculate Fourth Pair PAIR (00-99)
-    # Extended square, 0-9, 10x10, 30 x 15 seconds
-    lon_extsubsquare_rmdr = lon_subsquare_rmdr - (lon_subsquare_index/12)
-    lon_extsubsquare_index_rmdr = lon_extsubsquare_rmdr * 120
-    grid_ID += str(int(lon_extsubsquare_index_rmdr))
+    # Third Pair, Subsquare, a-x, 24x24,  5 x 2.5 minutes
+    subsquare_rmdr = square_index_rmdr*square_size - square_index*square_size
+    subsquare_index = trunc(subsquare_rmdr * subsquares)
 
-    lat_extsubsquare_rmdr = lat_subsquare_rmdr - (lat_subsquare_index/24)
-    lat_extsubsquare_index_rmdr = lat_extsubsquare_rmdr * 240
-    grid_ID += str(int(lat_extsubsquare_index_rmdr))
+    #-----------------------------------------
+    # Fourth Pair, Extended square, 0-9, 10x10, 30 x 15 seconds
+    extsubsquare_rmdr = subsquare_rmdr - (subsquare_index/subsquares)
+    extsubsquare_index_rmdr = extsubsquare_rmdr * (subsquares*10)
+    extsubsquare_index = trunc(extsubsquare_index_rmdr)
 
     #-----------------------------------------
-    # Calculate Fifth Pair (AA-XX)
-    # Super extended square, A-X, 24x24, 1.25 x 0.625 seconds
-    lon_supextsquare_rmdr = lon_extsubsquare_rmdr - (int(lon_extsubsquare_index_rmdr)/120)
-    lon_supextsquare_index = int(lon_supextsquare_rmdr * 2880)
-    grid_ID += gridtables.supsextsubsquare[lon_supextsquare_index]
+    # Fifth Pair, Super extended square, A-X, 24x24, 1.25 x 0.625 seconds
+    supextsquare_rmdr = extsubsquare_rmdr - (extsubsquare_index/(subsquares*10))
+    supextsquare_index = trunc(supextsquare_rmdr * (subsquares*240))
+
+    return field_index, square_index, subsquare_index, extsubsquare_index, supextsquare_index
+
+
+# ====================================================================
+# Find cooresponding grid ID for a given lat/lon location
+# Input parameters: Longitude and Latitiude. (Use minus prefix for South and West)
+#                   errors, handling of out of range input (see error_modes)
+# Returns: A 10 character Grid Locator ID string, '' in the 'nan' mode for out of range input
+def lat_lon_to_grid_ID(lat, lon, errors='print'):
     
-    lat_supextsquare_rmdr = lat_extsubsquare_rmdr - (int(lat_extsubsquare_index_rmdr)/240)
-    lat_supextsquare_index = int(lat_supextsquare_rmdr * 5760)
-    grid_ID += gridtables.supsextsubsquare[int(lat_supextsquare_index)]
+    _check_errors(errors)
+
+    # Check that latitude and longitude values given are within required range
+    if not (-90 < lat < 90):
+        return _input_error(errors, 'lat_lon_to_grid_ID', lat_error, lat, '')
+
+    if not (-180 < lon < 180):
+        return _input_error(errors, 'lat_lon_to_grid_ID', lon_error, lon, '')
+
+    # Convert plus/minus 90 deg lat and 180 deg lon format to 180 deg Lat and 360 deg Lon format
+    lon_digits = _grid_digits(min(lon + 180.0, grid_lon_offset_max), *grid_lon_steps)
+    lat_digits = _grid_digits(min(lat + 90.0, grid_lat_offset_max), *grid_lat_steps)
+
+    # Field (AA-RR), Square (00-99), Subsquare (aa-xx), Extended square (00-99)
+    # and Super extended square (AA-XX) pairs
+    grid_ID = (gridtables.field[lon_digits[0]] + gridtables.field[lat_digits[0]]
+               + str(lon_digits[1]) + str(lat_digits[1])
+               + gridtables.subsquare[lon_digits[2]] + gridtables.subsquare[lat_digits[2]]
+               + str(lon_digits[3]) + str(lat_digits[3])
+               + gridtables.supsextsubsquare[lon_digits[4]] + gridtables.supsextsubsquare[lat_digits[4]])
 
     return grid_ID
 
 
 # ====================================================================
 # Calculates and returns center and four corner coordinates of a given grid ID square
-# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string
+# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string or a packed grid code
 # Returns: Structure containing lat/lon of the SW, NW, NE, SE corners and Center of the provide grid ID 
 def grid_location_ID_bounds(gl_id):
-    if (len(gl_id) == 10):
-        # Calculate the longitude and latitude of the square's SW corner
-        SW_coord_lon = gridtables.lon_field[gl_id[0]] + gridtables.lon_square[gl_id[2]] + gridtables.lon_subsquare[gl_id[4]]/60 + gridtables.lon_extendedsquare[gl_id[6]]/3600 + gridtables.lon_supextsquare[gl_id[8]]/3600
-        SW_coord_lat = gridtables.lat_field[gl_id[1]] + gridtables.lat_square[gl_id[3]] + gridtables.lat_subsquare[gl_id[5]]/60 + gridtables.lat_extendedsquare[gl_id[7]]/3600 + gridtables.lat_supextsquare[gl_id[9]]/3600
+
+    # Packed grid codes are decoded from their cell indexes without a grid ID string
+    if not isinstance(gl_id, str):
+        return _grid_code_bounds(int(gl_id))
+
+    # Calculate the longitude and latitude of the square's SW corner. The byte
+    # indexed gridtables hold each character's boundary value in degrees.
+    chars = gl_id.encode()
+    lon_t = gridtables.lon_degrees
+    lat_t = gridtables.lat_degrees
+    try:
+        if (len(gl_id) == 10):
+            SW_coord_lon = lon_t[0][chars[0]] + lon_t[1][chars[2]] + lon_t[2][chars[4]] + lon_t[3][chars[6]] + lon_t[4][chars[8]]
+            SW_coord_lat = lat_t[0][chars[1]] + lat_t[1][chars[3]] + lat_t[2][chars[5]] + lat_t[3][chars[7]] + lat_t[4][chars[9]]
+        elif (len(gl_id) == 8):
+            SW_coord_lon = lon_t[0][chars[0]] + lon_t[1][chars[2]] + lon_t[2][chars[4]] + lon_t[3][chars[6]]
+            SW_coord_lat = lat_t[0][chars[1]] + lat_t[1][chars[3]] + lat_t[2][chars[5]] + lat_t[3][chars[7]]
+        elif (len(gl_id) == 6):
+            SW_coord_lon = lon_t[0][chars[0]] + lon_t[1][chars[2]] + lon_t[2][chars[4]]
+            SW_coord_lat = lat_t[0][chars[1]] + lat_t[1][chars[3]] + lat_t[2][chars[5]]
+        elif (len(gl_id) == 4):
+            SW_coord_lon = lon_t[0][chars[0]] + lon_t[1][chars[2]]
+            SW_coord_lat = lat_t[0][chars[1]] + lat_t[1][chars[3]]
+        elif (len(gl_id) == 2):
+            SW_coord_lon = lon_t[0][chars[0]]
+            SW_coord_lat = lat_t[0][chars[1]]
+        else:
+            return False
+        pairs = len(gl_id) // 2
 
         # Calculate lon/lat for the other three corners and center from the SW corner location
-        NW_coord_lon = SW_coord_lon
-        NW_coord_lat = SW_coord_lat + 0.625/3600
+        NE_coord_lon = SW_coord_lon + grid_lon_size[pairs]
+        NE_coord_lat = SW_coord_lat + grid_lat_size[pairs]
+        CEN_coord_lon = SW_coord_lon + grid_lon_center[pairs]
+        CEN_coord_lat = SW_coord_lat + grid_lat_center[pairs]
 
-        NE_coord_lon = SW_coord_lon + 1.25/3600
-        NE_coord_lat = SW_coord_lat +  0.625/3600
+    # Characters that are not part of their pair level index a None entry, raise
+    # the KeyError the character dictionaries did
+    except TypeError:
+        raise KeyError(gl_id) from None
 
-        SE_coord_lon = SW_coord_lon + 1.25/3600
-        SE_coord_lat = SW_coord_lat
+    grid_bounds = {'NE':{'lat':NE_coord_lat, 'lon':NE_coord_lon},
+                   'SE':{'lat':SW_coord_lat, 'lon':NE_coord_lon},
+                   'SW':{'lat':SW_coord_lat, 'lon':SW_coord_lon},
+                   'NW':{'lat':NE_coord_lat, 'lon':SW_coord_lon},
+                   'CEN':{'lat':CEN_coord_lat, 'lon':CEN_coord_lon}}
 
-        CEN_coord_lon = SW_coord_lon + 0.625/3600
-        CEN_coord_lat = SW_coord_lat + 0.3125/3600
-        
-    elif (len(gl_id) == 8):
-        # Calculate the longitude and latitude of the square's SW corner
-        SW_coord_lon = gridtables.lon_field[gl_id[0]] + gridtables.lon_square[gl_id[2]] + gridtables.lon_subsquare[gl_id[4]]/60 + gridtables.lon_extendedsquare[gl_id[6]]/3600
-        SW_coord_lat = gridtables.lat_field[gl_id[1]] + gridtables.lat_square[gl_id[3]] + gridtables.lat_subsquare[gl_id[5]]/60 + gridtables.lat_extendedsquare[gl_id[7]]/3600
+    return grid_bounds
 
-        # Calculate lon/lat for the other three corners and center from the SW corner location
-        NW_coord_lon = SW_coord_lon
-        NW_coord_lat = SW_coord_lat + 15/3600
 
-        NE_coord_lon = SW_coord_lon + 30/3600
-        NE_coord_lat = SW_coord_lat + 15/3600
+# ====================================================================
+# Find cooresponding packed grid code for a given lat/lon location
+# Input parameters: Latitude and Longitude. (Use minus prefix for South and West)
+#                   precision, grid ID length of 2, 4, 6, 8 or 10 characters
+#                   errors, handling of out of range input and of a precision
+#                   that is not 2, 4, 6, 8 or 10 (see error_modes)
+# Returns: Packed grid code integer, 0 in the 'nan' mode for invalid input
+def lat_lon_to_grid_code(lat, lon, precision=10, errors='print'):
 
-        SE_coord_lon = SW_coord_lon + 30/3600
-        SE_coord_lat = SW_coord_lat
+    _check_errors(errors)
 
-        CEN_coord_lon = SW_coord_lon + 15/3600
-        CEN_coord_lat = SW_coord_lat + 7.5/3600
-    
-    elif (len(gl_id) == 6):
-        # Calculate the longitude and latitude of the square's SW corner
-        SW_coord_lon = gridtables.lon_field[gl_id[0]] + gridtables.lon_square[gl_id[2]] + gridtables.lon_subsquare[gl_id[4]]/60
-        SW_coord_lat = gridtables.lat_field[gl_id[1]] + gridtables.lat_square[gl_id[3]] + gridtables.lat_subsquare[gl_id[5]]/60
-    
-        # Calculate lon/lat for the other three corners and center from the SW corner location
-        NW_coord_lon = SW_coord_lon
-        NW_coord_lat = SW_coord_lat + 2.5/60
+    # Check that latitude and longitude values given are within required range
+    if not (-90 < lat < 90):
+        return _input_error(errors, 'lat_lon_to_grid_code', lat_error, lat, 0)
 
-        NE_coord_lon = SW_coord_lon + 5/60
-        NE_coord_lat = SW_coord_lat +  2.5/60
+    if not (-180 < lon < 180):
+        return _input_error(errors, 'lat_lon_to_grid_code', lon_error, lon, 0)
 
-        SE_coord_lon = SW_coord_lon + 5/60
-        SE_coord_lat = SW_coord_lat
+    if precision not in (2, 4, 6, 8, 10):
+        return _input_error(errors, 'lat_lon_to_grid_code', precision_error, precision, 0)
 
-        CEN_coord_lon = SW_coord_lon + 2.5/60
-        CEN_coord_lat = SW_coord_lat + 1.25/60
-    
-    elif  (len(gl_id) == 4):
-        # Calculate the longitude and latitude of the square's SW corner
-        SW_coord_lon = gridtables.lon_field[gl_id[0]] + gridtables.lon_square[gl_id[2]]
-        SW_coord_lat = gridtables.lat_field[gl_id[1]] + gridtables.lat_square[gl_id[3]]
-    
-        # Calculate lon/lat for the other three corners and center from the SW corner location
-        NW_coord_lon = SW_coord_lon
-        NW_coord_lat = SW_coord_lat + 1
-
-        NE_coord_lon = SW_coord_lon + 2
-        NE_coord_lat = SW_coord_lat +  1
-
-        SE_coord_lon = SW_coord_lon + 2
-        SE_coord_lat = SW_coord_lat
-
-        CEN_coord_lon = SW_coord_lon + 1
-        CEN_coord_lat = SW_coord_lat + .5
-   
-    elif  (len(gl_id) == 2):
-        # Calculate the longitude and latitude of the square's SW corner
-        SW_coord_lon = gridtables.lon_field[gl_id[0]]
-        SW_coord_lat = gridtables.lat_field[gl_id[1]]
-    
-        # Calculate lon/lat for the other three corners and center from the SW corner location
-        NW_coord_lon = SW_coord_lon
-        NW_coord_lat = SW_coord_lat + 10
+    # Pair digits of the location, the same as lat_lon_to_grid_ID, combined
+    # into the index of the grid square's SW Super extended square
+    lon_digits = _grid_digits(min(lon + 180.0, grid_lon_offset_max), *grid_lon_steps)
+    lat_digits = _grid_digits(min(lat + 90.0, grid_lat_offset_max), *grid_lat_steps)
+    pairs = precision // 2
+    lon_cell = 0
+    lat_cell = 0
+    for level in range(5):
+        lon_cell *= grid_code_divisions[level]
+        lat_cell *= grid_code_divisions[level]
+        if level < pairs:
+            lon_cell += lon_digits[level]
+            lat_cell += lat_digits[level]
+
+    return (pairs << grid_code_pairs_shift) | (lon_cell << grid_code_lon_shift) | lat_cell
 
-        NE_coord_lon = SW_coord_lon + 20
-        NE_coord_lat = SW_coord_lat +  10
 
-        SE_coord_lon = SW_coord_lon + 20
-        SE_coord_lat = SW_coord_lat
+# ====================================================================
+# Pack a grid ID into a grid code integer
+# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string
+# Returns: Packed grid code integer, False for an invalid grid ID
+def pack_grid_ID(gl_id):
 
-        CEN_coord_lon = SW_coord_lon + 10
-        CEN_coord_lat = SW_coord_lat + 5
-    else:
+    if not grid_location_valid_ID(gl_id):
         return False
-    
+
+    pairs = len(gl_id) // 2
+    lon_cell = 0
+    lat_cell = 0
+    for level in range(5):
+        lon_cell *= grid_code_divisions[level]
+        lat_cell *= grid_code_divisions[level]
+        if level < pairs:
+            lon_cell += ord(gl_id[2*level]) - grid_code_char_base[level]
+            lat_cell += ord(gl_id[2*level + 1]) - grid_code_char_base[level]
+
+    return (pairs << grid_code_pairs_shift) | (lon_cell << grid_code_lon_shift) | lat_cell
+
+
+# ====================================================================
+# Split a grid code into its number of pairs and the lon and lat digit of each pair level
+# Returns: Tuple of pairs, lon digits and lat digits. False for an invalid grid code.
+def _grid_code_digits(code):
+
+    pairs = code >> grid_code_pairs_shift
+    lon_cell = (code >> grid_code_lon_shift) & grid_code_cell_mask
+    lat_cell = code & grid_code_cell_mask
+    if not (1 <= pairs <= 5) or lon_cell >= grid_code_cells or lat_cell >= grid_code_cells:
+        return False
+    if lon_cell % grid_code_cell_units[pairs] or lat_cell % grid_code_cell_units[pairs]:
+        return False
+
+    lon_digits = [0] * 5
+    lat_digits = [0] * 5
+    for level in range(4, -1, -1):
+        lon_cell, lon_digits[level] = divmod(lon_cell, grid_code_divisions[level])
+        lat_cell, lat_digits[level] = divmod(lat_cell, grid_code_divisions[level])
+
+    return pairs, lon_digits, lat_digits
+
+
+# ====================================================================
+# Unpack a grid code integer into a grid ID
+# Input parameter: Packed grid code integer
+# Returns: 2, 4, 6, 8 or 10 character grid locator character string, False for an invalid grid code
+def unpack_grid_ID(code):
+
+    digits = _grid_code_digits(code)
+    if not digits:
+        return False
+    pairs, lon_digits, lat_digits = digits
+
+    grid_ID = ""
+    for level in range(pairs):
+        grid_ID += chr(grid_code_char_base[level] + lon_digits[level])
+        grid_ID += chr(grid_code_char_base[level] + lat_digits[level])
+
+    return grid_ID
+
+
+# ====================================================================
+# Calculates the center and four corner coordinates of a packed grid code
+# Returns: The same structure as grid_location_ID_bounds, False for an invalid grid code
+def _grid_code_bounds(code):
+
+    digits = _grid_code_digits(code)
+    if not digits:
+        return False
+    pairs, lon_digits, lat_digits = digits
+
+    # Sum the table values in the same order as grid_location_ID_bounds. Digits
+    # of pairs not in the grid code are 0 and their table values are 0.
+    lon_t = grid_code_lon_degrees
+    lat_t = grid_code_lat_degrees
+    SW_coord_lon = lon_t[0][lon_digits[0]] + lon_t[1][lon_digits[1]] + lon_t[2][lon_digits[2]] + lon_t[3][lon_digits[3]] + lon_t[4][lon_digits[4]]
+    SW_coord_lat = lat_t[0][lat_digits[0]] + lat_t[1][lat_digits[1]] + lat_t[2][lat_digits[2]] + lat_t[3][lat_digits[3]] + lat_t[4][lat_digits[4]]
+
+    NE_coord_lon = SW_coord_lon + grid_lon_size[pairs]
+    NE_coord_lat = SW_coord_lat + grid_lat_size[pairs]
+
     grid_bounds = {'NE':{'lat':NE_coord_lat, 'lon':NE_coord_lon},
-                   'SE':{'lat':SE_coord_lat, 'lon':SE_coord_lon},
+                   'SE':{'lat':SW_coord_lat, 'lon':NE_coord_lon},
                    'SW':{'lat':SW_coord_lat, 'lon':SW_coord_lon},
-                   'NW':{'lat':NW_coord_lat, 'lon':NW_coord_lon},
-                   'CEN':{'lat':CEN_coord_lat, 'lon':CEN_coord_lon}}
+                   'NW':{'lat':NE_coord_lat, 'lon':SW_coord_lon},
+                   'CEN':{'lat':SW_coord_lat + grid_lat_center[pairs], 'lon':SW_coord_lon + grid_lon_center[pairs]}}
 
     return grid_bounds
 
 
+# ====================================================================
+# Offsets in grid squares (lon, lat) of the eight neighbors of a grid square
+# in compass order N, NE, E, SE, S, SW, W, NW
+grid_neighbor_offsets = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+
+
+# ====================================================================
+# Move a valid grid code by a number of grid squares of its own precision.
+# Longitude wraps around at the antimeridian.
+# Returns: Grid code of the moved grid square, 0 for a square past a pole
+def _grid_code_offset(code, lon_squares, lat_squares):
+
+    pairs = code >> grid_code_pairs_shift
+    unit = grid_code_cell_units[pairs]
+    lon_cell = (((code >> grid_code_lon_shift) & grid_code_cell_mask) + lon_squares * unit) % grid_code_cells
+    lat_cell = (code & grid_code_cell_mask) + lat_squares * unit
+    if not (0 <= lat_cell < grid_code_cells):
+        return 0
+
+    return (pairs << grid_code_pairs_shift) | (lon_cell << grid_code_lon_shift) | lat_cell
+
+
+# ====================================================================
+# Pack a grid ID, or check a grid code, for the neighbor functions
+# Returns: Tuple of the grid code and the function that turns grid codes
+#          back into the type given, or False for an invalid grid ID or code
+def _grid_code_and_type(gl_id):
+
+    if isinstance(gl_id, str):
+        code = pack_grid_ID(gl_id)
+        return code and (code, unpack_grid_ID)
+
+    code = int(gl_id)
+    return bool(_grid_code_digits(code)) and (code, int)
+
+
+# ====================================================================
+# Find the grid squares next to a given grid square
+# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string or a packed grid code
+# Returns: List of the neighboring grid IDs (grid codes for a grid code) of the same
+#          precision in compass order N, NE, E, SE, S, SW, W, NW. Longitude wraps around
+#          at the antimeridian and neighbors past a pole are left out.
+#          False for an invalid grid ID or grid code.
+def grid_location_neighbors(gl_id):
+
+    found = _grid_code_and_type(gl_id)
+    if not found:
+        return False
+    code, to_type = found
+
+    neighbors = []
+    for lon_squares, lat_squares in grid_neighbor_offsets:
+        neighbor = _grid_code_offset(code, lon_squares, lat_squares)
+        if neighbor:
+            neighbors.append(to_type(neighbor))
+
+    return neighbors
+
+
+# ====================================================================
+# Find the grid squares within k squares of a given grid square
+# Input parameters: 2, 4, 6, 8 or 10 character grid locator character string or
+#                   a packed grid code, and k, the number of squares (0 or more)
+# Returns: List of the grid IDs (grid codes for a grid code) of the same precision
+#          at most k squares away in longitude and latitude, including the given
+#          one, in rows from south to north and west to east along each row.
+#          Longitude wraps around at the antimeridian without repeating a square
+#          and rows past a pole are left out. False for an invalid grid ID or grid code.
+def grid_location_k_ring(gl_id, k=1):
+
+    if k < 0:
+        raise ValueError('k must be 0 or more, given %r' % (k,))
+    found = _grid_code_and_type(gl_id)
+    if not found:
+        return False
+    code, to_type = found
+
+    # Grid squares of this precision around the globe in longitude
+    lon_squares_around = grid_code_cells // grid_code_cell_units[code >> grid_code_pairs_shift]
+
+    ring = []
+    for lat_squares in range(-k, k + 1):
+        for lon_squares in range(-k, min(k + 1, lon_squares_around - k)):
+            square = _grid_code_offset(code, lon_squares, lat_squares)
+            if square:
+                ring.append(to_type(square))
+
+    return ring
+
+
+# ====================================================================
+# Grid square sizes depend only on the precision and the latitude row of the
+# grid square, so grid_location_size keeps the most recently used results
+# keyed by (pairs, lat_cell) of the grid code. The oldest entry is evicted when more than
+# grid_size_cache_max rows are held.
+grid_size_cache = OrderedDict()
+grid_size_cache_max = 4096
+
+# WGS84 geodesic used by grid_location_size and the 'wgs84' earth model,
+# created on first use by get_wgs84_geod
+wgs84_geod = None
+
+
+# ====================================================================
+# Returns: The shared pyproj Geod object for the WGS84 ellipsoid. pyproj is
+#          imported here so that only its users pay for loading it.
+def get_wgs84_geod():
+
+    global wgs84_geod
+
+    # Define WGS84 as Coordinate Reference Systems (CRS)
+    if wgs84_geod is None:
+        from pyproj import Geod
+        wgs84_geod = Geod('+a=6378137 +f=0.0033528106647475126')
+
+    return wgs84_geod
+
+
 # ====================================================================
 # Calculate the area and perimeter information for a given grid 
-# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string
-# Returns: Structure containing grid area and perimeter in miles and kilometers
+# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string or a packed grid code
+# Returns: Structure containing grid area and perimeter in miles and kilometers.
+#          Raises ValueError for an invalid grid ID or grid code.
 def grid_location_size(gl_id):
 
-    # Define WGS84 as Coordinate Reference Systems (CRS)
-    geod = Geod('+a=6378137 +f=0.0033528106647475126')
-    
+    # Pack a grid ID, or check a grid code, before the cache is read so that
+    # an invalid one is never given the size of a valid grid in its row
+    found = _grid_code_and_type(gl_id)
+    if not found:
+        raise ValueError('invalid grid ID or grid code, given %r' % (gl_id,))
+
+    # The precision and latitude row, the pairs and lat_cell of the grid code,
+    # identify the size of a grid square
+    row_key = (found[0] >> grid_code_pairs_shift, found[0] & grid_code_cell_mask)
+
+    grid_size = grid_size_cache.get(row_key)
+    if grid_size is not None:
+        grid_size_cache.move_to_end(row_key)
+        return dict(grid_size)
+
+    grid_size = _grid_location_size(gl_id)
+    grid_size_cache[row_key] = grid_size
+    if len(grid_size_cache) > grid_size_cache_max:
+        grid_size_cache.popitem(last=False)
+
+    return dict(grid_size)
+
+
+# ====================================================================
+# Calculate the area and perimeter information for a given grid without
+# using the grid size cache
+# Input parameter: 2, 4, 6, 8 or 10 character grid locator character string or a packed grid code
+# Returns: The same structure as grid_location_size
+def _grid_location_size(gl_id):
+
     # Get corner coordinates of grid square
     Grid_Bounds = grid_location_ID_bounds(gl_id)
     
-    # Create arrary of lat/lon corner boundary data for requested grid ID
-    coordinates = np.array([
-    [Grid_Bounds['NE']['lon'], Grid_Bounds['NE']['lat']], 
-    [Grid_Bounds['SE']['lon'], Grid_Bounds['SE']['lat']], 
-    [Grid_Bounds['SW']['lon'], Grid_Bounds['SW']['lat']], 
-    [Grid_Bounds['NW']['lon'], Grid_Bounds['NW']['lat']]])
-    lats = coordinates[:,1]
-    lons = coordinates[:,0]
+    # Lists of lat/lon corner boundary data for requested grid ID
+    lons = [Grid_Bounds['NE']['lon'], Grid_Bounds['SE']['lon'], Grid_Bounds['SW']['lon'], Grid_Bounds['NW']['lon']]
+    lats = [Grid_Bounds['NE']['lat'], Grid_Bounds['SE']['lat'], Grid_Bounds['SW']['lat'], Grid_Bounds['NW']['lat']]
 
     # Retrieve grid square area and perimeter in square meters
-    area, perim = geod.polygon_area_perimeter(lons, lats)
+    area, perim = get_wgs84_geod().polygon_area_perimeter(lons, lats)
 
     # Convert sqare meters into square miles
     sq_mi = abs(area) * 0.00000038610215854245
@@ -299,30 +678,25 @@ def grid_location_size(gl_id):
 # ====================================================================
 # Calculates the distance between two lat/lon coordinates
 # Input parameters: lat/lon of a start point and end point
-# Returns: Structure containing the distance between the two point in kilometers, statue miles and nautical miles
-def lat_lon_distance(slat,slon,elat,elon):
+#                   errors, handling of out of range input (see error_modes)
+# Returns: Structure containing the distance between the two point in kilometers, statue miles and nautical miles,
+#          NaN distances in the 'nan' mode for out of range input
+def lat_lon_distance(slat,slon,elat,elon, errors='print'):
+
+    _check_errors(errors)
 
     # Check that latitude and longitude values given are within required range
     if not (-90 <= slat <= 90):
-        print('latitude must be -90<=lat<90, given %f\n'%slat)
-        return False
+        return _input_error(errors, 'lat_lon_distance', lat_error, slat, dict.fromkeys(meters_per_unit, math.nan))
 
     if not (-180 <= slon <= 180):
-        print('longitude must be -180<=lon<180, given %f\n'%slon)
-        return False
-    
+        return _input_error(errors, 'lat_lon_distance', lon_error, slon, dict.fromkeys(meters_per_unit, math.nan))
+
     if not (-90 <= elat <= 90):
-        print('latitude must be -90<=lat<90, given %f\n'%elat)
-        return False
+        return _input_error(errors, 'lat_lon_distance', end_lat_error, elat, dict.fromkeys(meters_per_unit, math.nan))
 
     if not (-180 <= elon <= 180):
-        print('longitude must be -180<=lon<180, given %f\n'%elon)
-        return False
-
-    # Scale multipliers for different units of distance
-    kilometers = 6371.0210
-    statute_miles = 3958.7613
-    nautical_miles = 3437.8675
+        return _input_error(errors, 'lat_lon_distance', end_lon_error, elon, dict.fromkeys(meters_per_unit, math.nan))
 
     # Convert lats and lons to radians
     r_start_lat = math.radians(slat)
@@ -345,8 +719,11 @@ def lat_lon_distance(slat,slon,elat,elon):
 # ====================================================================
 # Calculates distance between center points of two grid ID values
 # Input parameters: Grid ID of a start point and end point
+#                   model, 'sphere' (default) or 'wgs84' for the WGS84 ellipsoid geodesic
 # Returns: Structure containing the distance between the two point in kilometer, statue miles and nautical miles
-def grid_location_distance(gl_id1, gl_id2):
+def grid_location_distance(gl_id1, gl_id2, model='sphere'):
+
+    _check_earth_model(model)
 
     # Get conter lat/lon coordinate for gl_id1
     coords_1 = grid_location_ID_bounds(gl_id1)
@@ -358,32 +735,36 @@ def grid_location_distance(gl_id1, gl_id2):
     cen_lat_coord_2 = coords_2['CEN']['lat']
     cen_lon_coord_2 = coords_2['CEN']['lon']
 
+    if model == 'wgs84':
+        az12, az21, meters = get_wgs84_geod().inv(cen_lon_coord_1, cen_lat_coord_1, cen_lon_coord_2, cen_lat_coord_2)
+        return {'km': meters/meters_per_unit['km'], 'smi': meters/meters_per_unit['smi'], 'nmi': meters/meters_per_unit['nmi']}
+
     return lat_lon_distance(cen_lat_coord_1, cen_lon_coord_1, cen_lat_coord_2, cen_lon_coord_2)
 
 
 # ====================================================================
 # Calculate bearing from start location to end location using lat/lon values
 # Input parameters: Lat/Lon of a start point and end point
-# Returns: Integer value between 0 and 360 degrees of initial bearing angle at start point
-def angle_from_coordinates(slat,slon,elat,elon):
-    
+#                   errors, handling of out of range input (see error_modes)
+# Returns: Integer value between 0 and 360 degrees of initial bearing angle at start point,
+#          NaN in the 'nan' mode for out of range input
+def angle_from_coordinates(slat,slon,elat,elon, errors='print'):
+
+    _check_errors(errors)
+
     # Check that latitude and longitude values given are within required range
     if not (-90 <= slat <= 90):
-        print('latitude must be -90<=lat<90, given %f\n'%slat)
-        return False
+        return _input_error(errors, 'angle_from_coordinates', lat_error, slat, math.nan)
 
     if not (-180 <= slon <= 180):
-        print('longitude must be -180<=lon<180, given %f\n'%slon)
-        return False
-    
+        return _input_error(errors, 'angle_from_coordinates', lon_error, slon, math.nan)
+
     if not (-90 <= elat <= 90):
-        print('latitude must be -90<=lat<90, given %f\n'%elat)
-        return False
+        return _input_error(errors, 'angle_from_coordinates', end_lat_error, elat, math.nan)
 
     if not (-180 <= elon <= 180):
-        print('longitude must be -180<=lon<180, given %f\n'%elon)
-        return False
-        
+        return _input_error(errors, 'angle_from_coordinates', end_lon_error, elon, math.nan)
+
     # Convert Lat/lon values from degreees to radians
     slat_r = math.radians(slat)
     slon_r = math.radians(slon)
@@ -405,9 +786,12 @@ def angle_from_coordinates(slat,slon,elat,elon):
 # ====================================================================
 # Calculate bearing from start location to end location using either grid ID values
 # Input parameters: Grid IDs for the start point and end point 
+#                   model, 'sphere' (default) or 'wgs84' for the WGS84 ellipsoid geodesic
 # Returns: Float value between 0 and 360 degrees of initial bearing angle at start point
-def angle_from_grid_location_IDs(gl_id1, gl_id2):
-    
+def angle_from_grid_location_IDs(gl_id1, gl_id2, model='sphere'):
+
+    _check_earth_model(model)
+
     # Get gl_id1 lat/lon center
     coords_1 = grid_location_ID_bounds(gl_id1)
     cen_lat_coord_1 = coords_1['CEN']['lat']
@@ -418,5 +802,17 @@ def angle_from_grid_location_IDs(gl_id1, gl_id2):
     cen_lat_coord_2 = coords_2['CEN']['lat']
     cen_lon_coord_2 = coords_2['CEN']['lon']
     
+    # Initial geodesic azimuth, rounded and in 360 deg format like angle_from_coordinates
+    if model == 'wgs84':
+        az12, az21, meters = get_wgs84_geod().inv(cen_lon_coord_1, cen_lat_coord_1, cen_lon_coord_2, cen_lat_coord_2)
+        return round(az12 % 360)
+
     # Get distance between centers of gl_id1 and gl_id2 
     return angle_from_coordinates(cen_lat_coord_1, cen_lon_coord_1, cen_lat_coord_2, cen_lon_coord_2)
+
+
+# ====================================================================
+# Check that an earth model name is one of earth_models
+def _check_earth_model(model):
+    if model not in earth_models:
+        raise ValueError("model must be 'sphere' or 'wgs84', given %r" % (model,))
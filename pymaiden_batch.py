@@ -0,0 +1,910 @@
+'''
+This module contains NumPy array versions of the pymaiden functions. Each
+function works on whole arrays of lat/lon coordinates or grid IDs at once so
+that large sets of spot data can be processed without a Python loop over the
+scalar pymaiden functions. Refer to the readme.md file for information on the
+Maidenhead Grid Locator System and the usage of the pymaiden modules.
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import numpy as np
+import gridtables # Used for converting between Lat/Lon and grid formats.
+import pymaiden # Used for the Earth radius scale multipliers.
+
+
+# ====================================================================
+# Number of divisions at each pair level from the Field down to the Super
+# extended square. E.g. 18 Fields, 10 Squares, 24 Subsquares, ...
+pair_divisions = pymaiden.grid_code_divisions
+
+# Number of Super extended squares across the globe in longitude and latitude
+# 18*10*24*10*24 = 1,036,800 for both directions
+lon_cells = pymaiden.grid_code_cells
+lat_cells = pymaiden.grid_code_cells
+
+# Byte value lookup arrays built from the gridtables letter tuples. Used to
+# turn pair indexes into grid ID characters with a single array index.
+field_bytes = np.frombuffer(''.join(gridtables.field).encode('ascii'), dtype=np.uint8)
+square_bytes = np.frombuffer(b'0123456789', dtype=np.uint8)
+subsquare_bytes = np.frombuffer(''.join(gridtables.subsquare).encode('ascii'), dtype=np.uint8)
+supextsquare_bytes = np.frombuffer(''.join(gridtables.supsextsubsquare).encode('ascii'), dtype=np.uint8)
+pair_bytes = (field_bytes, square_bytes, subsquare_bytes, square_bytes, supextsquare_bytes)
+
+# Byte value of the first character of each pair level, e.g. 'A', '0', 'a', ...
+pair_char_base = np.array(pymaiden.grid_code_char_base, dtype=np.int16)
+
+# Class of each byte value at each grid ID position, 0 for a null (no
+# character), 1 for an allowed character (e.g. A-R at position 0 and 1) and
+# 2 for any other byte
+char_classes = np.full((10, 256), 2, dtype=np.uint8)
+char_classes[:, 0] = 0
+for position, chars in enumerate(pair_bytes):
+    char_classes[2*position, chars] = 1
+    char_classes[2*position + 1, chars] = 1
+
+# State of each pair of grid ID characters, 3 * lon char class + lat char
+# class, indexed by level and by the two characters read as one native uint16
+pair_states = char_classes[0::2, :, None] * 3 + char_classes[1::2, None, :]
+if np.little_endian:
+    pair_states = pair_states.transpose(0, 2, 1)
+pair_state_tables = np.ascontiguousarray(pair_states).reshape(5, 65536).astype(np.int32)
+
+# Grid ID precision indexed by the row state of a grid ID, sum(pair_state * 9**pair)
+# where pair_state is 3 * lon char class + lat char class. Only rows with all
+# of their first pairs allowed and the rest null are valid, every other state is 0.
+precision_table = np.zeros(9**5, dtype=np.uint8)
+for pairs in range(1, 6):
+    precision_table[sum(4 * 9**level for level in range(pairs))] = 2 * pairs
+
+# gridtables boundary values in degrees indexed by the digit value of each
+# pair level, and indexed by the byte value of each grid ID character. Byte
+# tables hold NaN for bytes that are not a character of the level, gridtables
+# rejects NUL so it is set to 0 here for the bytes padding a shorter grid ID.
+lon_tables = [np.array(table, dtype=np.float64) for table in pymaiden.grid_code_lon_degrees]
+lat_tables = [np.array(table, dtype=np.float64) for table in pymaiden.grid_code_lat_degrees]
+lon_byte_tables = [np.array(table, dtype=np.float64) for table in gridtables.lon_degrees]
+lat_byte_tables = [np.array(table, dtype=np.float64) for table in gridtables.lat_degrees]
+for table in lon_byte_tables[1:] + lat_byte_tables[1:]:
+    table[0] = 0
+
+# Offset of the first character of each pair in a grid ID
+pair_offsets = np.arange(0, 10, 2, dtype=np.uint8)
+
+# Grid square size in degrees and SW corner to center offsets, indexed by
+# the number of pairs in the grid ID (index 0 is used for invalid grid IDs)
+lon_size = np.array((np.nan,) + pymaiden.grid_lon_size[1:])
+lat_size = np.array((np.nan,) + pymaiden.grid_lat_size[1:])
+lon_center = np.array((np.nan,) + pymaiden.grid_lon_center[1:])
+lat_center = np.array((np.nan,) + pymaiden.grid_lat_center[1:])
+
+# Number of Super extended squares in one grid square, indexed by pairs
+cell_units = np.array(pymaiden.grid_code_cell_units, dtype=np.int64)
+
+# Offsets in grid squares (lon, lat) of the eight neighbors of a grid square
+neighbor_offsets = np.array(pymaiden.grid_neighbor_offsets, dtype=np.int64)
+
+# Earth radius scale multipliers by unit name, the same values and unit
+# names used by pymaiden.lat_lon_distance
+distance_units = {'km': pymaiden.kilometers,
+                  'smi': pymaiden.statute_miles,
+                  'nmi': pymaiden.nautical_miles}
+
+# Record layout returned by grid_location_ID_bounds_array
+bounds_dtype = np.dtype([('sw_lat', np.float64), ('sw_lon', np.float64),
+                         ('cen_lat', np.float64), ('cen_lon', np.float64),
+                         ('dlat', np.float64), ('dlon', np.float64),
+                         ('precision', np.uint8)])
+
+
+# ====================================================================
+# Truncate a float array to int64, the array version of int used by pymaiden._grid_digits
+def _trunc(values):
+    return values.astype(np.int64)
+
+
+# ====================================================================
+# Find the pair digits of the grid square holding each of an array of lat/lon
+# locations, with the same arithmetic as the scalar lat_lon_to_grid_ID
+# Returns: Tuple of lists of five flat lon and lat digit arrays, Field first,
+#          a validity mask and the broadcast input shape
+def _lat_lon_digits(lat, lon):
+
+    lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+    shape = lat.shape
+    lat = lat.ravel()
+    lon = lon.ravel()
+
+    # Same open range check as the scalar lat_lon_to_grid_ID. NaN fails both compares.
+    valid = (lat > -90) & (lat < 90) & (lon > -180) & (lon < 180)
+
+    gls_lon = np.minimum(np.where(valid, lon, 0.0) + 180.0, pymaiden.grid_lon_offset_max)
+    gls_lat = np.minimum(np.where(valid, lat, 0.0) + 90.0, pymaiden.grid_lat_offset_max)
+    lon_digits = pymaiden._grid_digits(gls_lon, *pymaiden.grid_lon_steps, _trunc)
+    lat_digits = pymaiden._grid_digits(gls_lat, *pymaiden.grid_lat_steps, _trunc)
+
+    return list(lon_digits), list(lat_digits), valid, shape
+
+
+# ====================================================================
+# Combine one digit per pair level into cell indexes, the inverse of _cell_digits
+# Input parameters: List of five digit arrays, Field first, and the number
+#                   of pairs kept, the digits of lower pair levels are read as 0
+# Returns: int64 array of cell indexes
+def _digits_to_cells(digits, pairs=5):
+
+    cell = np.zeros(digits[0].shape, dtype=np.int64)
+    for level, divisions in enumerate(pair_divisions):
+        cell *= divisions
+        if level < pairs:
+            cell += digits[level]
+
+    return cell
+
+
+# ====================================================================
+# Split cell indexes into one digit per pair level
+# Returns: List of five digit arrays, Field first
+def _cell_digits(cell):
+
+    digits = []
+    for divisions in reversed(pair_divisions):
+        cell, digit = np.divmod(cell, divisions)
+        digits.append(digit)
+    digits.reverse()
+
+    return digits
+
+
+# ====================================================================
+# Build a fixed width grid ID array from pair digits
+# Returns: 'S' array of grid IDs with precision characters. Rows with fewer
+#          pairs than precision are null padded and read as shorter grid IDs.
+def _digits_to_grid_IDs(pairs, lon_digits, lat_digits, precision):
+
+    chars = np.zeros((pairs.size, precision), dtype=np.uint8)
+    for level in range(precision // 2):
+        in_id = level < pairs
+        chars[:, 2*level] = np.where(in_id, pair_bytes[level][lon_digits[level]], 0)
+        chars[:, 2*level + 1] = np.where(in_id, pair_bytes[level][lat_digits[level]], 0)
+
+    return chars.view('S%d' % precision).ravel()
+
+
+# ====================================================================
+# Check the precision and dtype arguments of the grid ID array functions
+def _check_precision(precision, dtype='S'):
+
+    if precision not in (2, 4, 6, 8, 10):
+        raise ValueError('precision must be 2, 4, 6, 8 or 10, given %r' % (precision,))
+    if dtype not in ('S', 'U'):
+        raise ValueError("dtype must be 'S' or 'U', given %r" % (dtype,))
+
+
+# ====================================================================
+# Check an errors argument, one of pymaiden.error_modes or a pymaiden.ErrorLog
+# ====================================================================
+# Find the pymaiden error codes of invalid rows of lat/lon inputs
+# Input parameters: Flat indexes of the invalid rows, the inputs (lat, lon) or
+#                   (slat, slon, elat, elon), and closed, True for the
+#                   -90<=lat<=90 range of the distance and bearing functions,
+#                   False for the -90<lat<90 range of the encoders
+# Returns: Tuple of a uint8 error code array and the first invalid value
+def _lat_lon_error_codes(rows, points, closed):
+
+    points = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in points))
+    index = np.unravel_index(rows, points[0].shape)
+    codes = np.zeros(len(rows), dtype=np.uint8)
+
+    # Later checks are applied first so the first failed check gives the code
+    for code in range(len(points), 0, -1):
+        values = points[code - 1][index]
+        limit = 90 if code % 2 else 180
+        in_range = ((values >= -limit) & (values <= limit)) if closed else ((values > -limit) & (values < limit))
+        codes[~in_range] = code
+
+    first = points[codes[0] - 1][tuple(axis[0] for axis in index)]
+    return codes, float(first)
+
+
+# ====================================================================
+# Handle the invalid rows of a batch call the way errors asks for. Nothing is
+# done per row: 'raise' and 'print' report the first invalid row and the
+# number of invalid rows once, and 'collect' adds one ErrorLog entry holding
+# the error codes and flat row indexes of all invalid rows.
+# Input parameters: errors, the function name, the validity mask and the
+#                   inputs and closed, the same as _lat_lon_error_codes
+def _batch_errors(errors, function, valid, points, closed):
+
+    if errors in ('nan', 'mask') or valid.all():
+        return
+
+    rows = np.flatnonzero(~valid)
+    codes, first = _lat_lon_error_codes(rows, points, closed)
+    if errors == 'collect':
+        pymaiden.error_log.add(function, codes, rows)
+    elif isinstance(errors, pymaiden.ErrorLog):
+        errors.add(function, codes, rows)
+    else:
+        error = pymaiden.InputError(function, int(codes[0]), first, int(rows[0]), len(rows))
+        if errors == 'raise':
+            raise error
+        print('%s\n' % error)
+
+
+# ====================================================================
+# Find cooresponding grid IDs for arrays of lat/lon locations
+# Input parameters: Arrays of latitude and longitude. (Use minus prefix for South and West)
+#                   precision, grid ID length of 2, 4, 6, 8 or 10 characters
+#                   dtype, 'S' for a bytes array or 'U' for a unicode string array
+#                   errors, handling of out of range input (see pymaiden.error_modes)
+# Returns: Tuple of a fixed width grid ID array and a boolean validity mask.
+#          Rows with out of range or non finite lat/lon are set to an empty ID.
+def lat_lon_to_grid_ID_array(lat, lon, precision=10, dtype='S', errors='nan'):
+
+    _check_precision(precision, dtype)
+    pymaiden._check_errors(errors)
+    lon_digits, lat_digits, valid, shape = _lat_lon_digits(lat, lon)
+    _batch_errors(errors, 'lat_lon_to_grid_ID_array', valid, (lat, lon), False)
+
+    pairs = np.where(valid, precision // 2, 0)
+    grid_IDs = _digits_to_grid_IDs(pairs, lon_digits, lat_digits, precision).reshape(shape)
+    if dtype == 'U':
+        grid_IDs = grid_IDs.astype('U%d' % precision)
+
+    return grid_IDs, valid.reshape(shape)
+
+
+# ====================================================================
+# Find cooresponding packed grid codes for arrays of lat/lon locations.
+# See pymaiden.lat_lon_to_grid_code for the grid code layout.
+# Input parameters: Arrays of latitude and longitude and the grid ID precision (2, 4, 6, 8 or 10)
+#                   errors, handling of out of range input (see pymaiden.error_modes)
+# Returns: Tuple of a uint64 grid code array and a boolean validity mask. Invalid rows are 0.
+def lat_lon_to_grid_code_array(lat, lon, precision=10, errors='nan'):
+
+    _check_precision(precision)
+    pymaiden._check_errors(errors)
+    lon_digits, lat_digits, valid, shape = _lat_lon_digits(lat, lon)
+    _batch_errors(errors, 'lat_lon_to_grid_code_array', valid, (lat, lon), False)
+
+    pairs = precision // 2
+    codes = _cells_to_codes(np.where(valid, pairs, 0), _digits_to_cells(lon_digits, pairs), _digits_to_cells(lat_digits, pairs))
+
+    return codes.reshape(shape), valid.reshape(shape)
+
+
+# ====================================================================
+# Combine pairs and cell indexes into packed grid codes
+# Returns: uint64 array of grid codes, 0 where pairs is 0
+def _cells_to_codes(pairs, lon_cell, lat_cell):
+
+    codes = ((pairs.astype(np.uint64) << np.uint64(pymaiden.grid_code_pairs_shift))
+             | (lon_cell.astype(np.uint64) << np.uint64(pymaiden.grid_code_lon_shift))
+             | lat_cell.astype(np.uint64))
+
+    return np.where(pairs > 0, codes, np.uint64(0))
+
+
+# ====================================================================
+# Convert a list of grid ID strings (str or bytes) into a byte matrix with one
+# 10 column, null padded row per grid ID. The strings are joined with NUL
+# separators into one buffer and each row is read from a 10 byte window at its
+# offset, which is much faster than building a NumPy string array from the list.
+# Returns: Tuple of the byte matrix and a boolean array that is True where a
+#          grid ID is longer than 10 characters or holds a NUL or a character
+#          above the byte range, or None when the list holds other objects
+def _list_grid_ID_bytes(gl_ids):
+
+    count = len(gl_ids)
+    try:
+        buffer = '\x00'.join(gl_ids).encode('latin-1')
+    except TypeError:
+        try:
+            buffer = b'\x00'.join(gl_ids)
+        except TypeError:
+            return None
+    except UnicodeEncodeError:
+        # Grid IDs with a character above the byte range are not valid, they
+        # are replaced with a NUL which marks them invalid below
+        gl_ids = ['\x00' if not gl_id.isascii() and max(gl_id) > '\xff' else gl_id for gl_id in gl_ids]
+        buffer = '\x00'.join(gl_ids).encode('latin-1')
+
+    data = np.frombuffer(buffer + bytes(10), dtype=np.uint8)
+    ends = np.flatnonzero(data == 0)
+    nul = len(ends) != count + 9
+    if nul:
+        # A grid ID holds a NUL, so the separators do not give the offsets
+        lengths = np.fromiter(map(len, gl_ids), dtype=np.int64, count=count)
+        starts = np.cumsum(lengths + 1) - lengths - 1
+    else:
+        starts = np.concatenate(([0], ends[:count - 1] + 1))
+        lengths = ends[:count] - starts
+
+    # Keep the pairs of each window that start in the grid ID. The second byte
+    # of a pair past an odd length grid ID is its NUL separator.
+    chars = np.lib.stride_tricks.sliding_window_view(data, 10)[starts]
+    pairs = chars.view(np.uint16)
+    np.multiply(pairs, np.minimum(lengths, 10).astype(np.uint8)[:, None] > pair_offsets, out=pairs, casting='unsafe')
+    invalid = lengths > 10
+    if nul:
+        invalid |= ((chars == 0) & (lengths[:, None] > np.arange(10))).any(axis=1)
+
+    return chars, invalid
+
+
+# ====================================================================
+# Convert an array or list of grid ID strings (str or bytes) into a byte
+# matrix with one 10 column, null padded row per grid ID
+# Returns: Tuple of the byte matrix, a boolean array that is True where a grid
+#          ID is longer than 10 characters or holds a character above the byte
+#          range, and the input shape. Grid IDs of a list or object array
+#          holding a NUL are also marked True, NumPy string arrays can not
+#          hold trailing NULs.
+def _grid_ID_bytes(gl_ids):
+
+    if isinstance(gl_ids, list):
+        found = _list_grid_ID_bytes(gl_ids)
+        if found is not None:
+            return found + ((len(gl_ids),),)
+        # Nested lists, or lists that mix str and bytes
+        gl_ids = np.array(gl_ids, dtype=object)
+    gl_ids = np.asarray(gl_ids)
+    if gl_ids.dtype.kind == 'O':
+        items = gl_ids.ravel().tolist()
+        found = _list_grid_ID_bytes(items)
+        if found is not None:
+            return found + (gl_ids.shape,)
+        nul = np.array([isinstance(item, (str, bytes)) and ('\x00' if isinstance(item, str) else b'\x00') in item
+                        for item in items], dtype=bool)
+        try:
+            gl_ids = gl_ids.astype('S11')
+        except UnicodeEncodeError:
+            gl_ids = gl_ids.astype('U11')
+    else:
+        nul = None
+    if gl_ids.size == 0:
+        gl_ids = gl_ids.astype('U')
+    if gl_ids.dtype.kind not in ('S', 'U'):
+        raise TypeError('grid IDs must be strings or bytes, given %s array' % gl_ids.dtype)
+
+    shape = gl_ids.shape
+    gl_ids = np.ascontiguousarray(gl_ids, dtype=gl_ids.dtype.newbyteorder('=')).reshape(-1)
+    unicode = gl_ids.dtype.kind == 'U'
+    width = max(gl_ids.dtype.itemsize // (4 if unicode else 1), 1)
+    chars = gl_ids.view(np.uint8).reshape(gl_ids.size, gl_ids.dtype.itemsize)
+    invalid = chars[:, (40 if unicode else 10):].any(axis=1)
+
+    if unicode:
+        # Use the low byte of each unicode code point. Code points above the byte
+        # range can never be valid grid ID characters.
+        code_points = gl_ids.view(np.uint32).reshape(gl_ids.size, width)
+        if gl_ids.size and code_points.max() > 255:
+            invalid |= (code_points > 255).any(axis=1)
+        chars = chars[:, (0 if np.little_endian else 3)::4]
+
+    if width != 10 or unicode:
+        padded = np.zeros((gl_ids.size, 10), dtype=np.uint8)
+        padded[:, :min(width, 10)] = chars[:, :10]
+        chars = padded
+
+    if nul is not None:
+        invalid |= nul
+    return chars, invalid, shape
+
+
+# ====================================================================
+# Find the precision of grid IDs in one pass over their characters. Each
+# pair of characters is read as one uint16 and looked up in pair_state_tables.
+# Input parameters: Byte matrix and invalid mask from _grid_ID_bytes
+# Returns: uint8 array of grid ID lengths, 0 where a grid ID is not valid
+def _grid_ID_precision(chars, invalid):
+
+    char_pairs = chars.view(np.uint16)
+    state = np.zeros(chars.shape[0], dtype=np.int32)
+    for level in reversed(range(5)):
+        state *= 9
+        state += np.take(pair_state_tables[level], char_pairs[:, level])
+
+    precision = np.take(precision_table, state)
+    precision[invalid] = 0
+
+    return precision
+
+
+# ====================================================================
+# Split an array or list of grid ID strings into pair digits
+# Returns: Tuple of the pairs array (0 for invalid grid IDs), lists of five
+#          lon and lat digit arrays, a validity mask and the input shape.
+#          Digits of pairs not in the grid ID are 0.
+def grid_ID_digits_array(gl_ids):
+
+    chars, invalid, shape = _grid_ID_bytes(gl_ids)
+    pairs = (_grid_ID_precision(chars, invalid) // 2).astype(np.int64)
+    valid = pairs > 0
+
+    lon_digits = []
+    lat_digits = []
+    for level in range(5):
+        in_id = level < pairs
+        lon_digits.append(np.where(in_id, chars[:, 2*level] - pair_char_base[level], 0))
+        lat_digits.append(np.where(in_id, chars[:, 2*level + 1] - pair_char_base[level], 0))
+
+    return pairs, lon_digits, lat_digits, valid, shape
+
+
+# ====================================================================
+# Validates the format of arrays of grid IDs. See pymaiden.grid_location_valid_ID.
+# NumPy string arrays run 15-20x faster than a loop of the regex check. Lists
+# run only about 6x faster, reading the strings out of a list takes most of the
+# time, so keep grid IDs that are validated again in a string array.
+# Input parameter: Array or list of grid ID strings (str or bytes) of any length
+# Returns: Tuple of a boolean validity mask and a uint8 array of the precision
+#          (2, 4, 6, 8 or 10) of each grid ID, 0 where it is not valid
+def grid_location_valid_ID_array(gl_ids):
+
+    chars, invalid, shape = _grid_ID_bytes(gl_ids)
+    precision = _grid_ID_precision(chars, invalid).reshape(shape)
+
+    return precision > 0, precision
+
+
+# ====================================================================
+# Split an array of packed grid codes into pair digits
+# Returns: The same as grid_ID_digits_array
+def grid_code_digits_array(codes):
+
+    codes = np.asarray(codes)
+    if codes.dtype.kind not in ('u', 'i'):
+        raise TypeError('grid codes must be integers, given %s array' % codes.dtype)
+    shape = codes.shape
+    codes = codes.astype(np.uint64).ravel()
+
+    pairs = (codes >> np.uint64(pymaiden.grid_code_pairs_shift)).astype(np.int64)
+    lon_cell = ((codes >> np.uint64(pymaiden.grid_code_lon_shift)) & np.uint64(pymaiden.grid_code_cell_mask)).astype(np.int64)
+    lat_cell = (codes & np.uint64(pymaiden.grid_code_cell_mask)).astype(np.int64)
+
+    # Same checks as pymaiden._grid_code_digits
+    valid = (pairs >= 1) & (pairs <= 5) & (lon_cell < lon_cells) & (lat_cell < lat_cells)
+    pairs = np.where(valid, pairs, 0)
+    unit = cell_units[np.where(valid, pairs, 5)]
+    valid &= (lon_cell % unit == 0) & (lat_cell % unit == 0)
+    pairs = np.where(valid, pairs, 0)
+    lon_cell = np.where(valid, lon_cell, 0)
+    lat_cell = np.where(valid, lat_cell, 0)
+
+    return pairs, _cell_digits(lon_cell), _cell_digits(lat_cell), valid, shape
+
+
+# ====================================================================
+# Pack arrays of grid IDs into grid codes. See pymaiden.pack_grid_ID.
+# Input parameter: Array or list of 2, 4, 6, 8 or 10 character grid IDs. Lengths may be mixed.
+# Returns: Tuple of a uint64 grid code array and a boolean validity mask. Invalid rows are 0.
+def pack_grid_ID_array(gl_ids):
+
+    pairs, lon_digits, lat_digits, valid, shape = grid_ID_digits_array(gl_ids)
+
+    lon_cell = np.zeros(pairs.size, dtype=np.int64)
+    lat_cell = np.zeros(pairs.size, dtype=np.int64)
+    for level, divisions in enumerate(pair_divisions):
+        lon_cell = lon_cell * divisions + lon_digits[level]
+        lat_cell = lat_cell * divisions + lat_digits[level]
+
+    return _cells_to_codes(pairs, lon_cell, lat_cell).reshape(shape), valid.reshape(shape)
+
+
+# ====================================================================
+# Unpack arrays of grid codes into grid IDs. See pymaiden.unpack_grid_ID.
+# Input parameters: Array of grid codes and dtype, 'S' for a bytes array or 'U' for a unicode string array
+# Returns: Tuple of a 10 character wide grid ID array and a boolean validity mask. Invalid rows are empty.
+def unpack_grid_ID_array(codes, dtype='S'):
+
+    _check_precision(10, dtype)
+    pairs, lon_digits, lat_digits, valid, shape = grid_code_digits_array(codes)
+
+    grid_IDs = _digits_to_grid_IDs(pairs, lon_digits, lat_digits, 10).reshape(shape)
+    if dtype == 'U':
+        grid_IDs = grid_IDs.astype('U10')
+
+    return grid_IDs, valid.reshape(shape)
+
+
+# ====================================================================
+# Calculates the SW corner, center and size of arrays of grid IDs
+# Input parameter: Array or list of 2, 4, 6, 8 or 10 character grid IDs, lengths may be
+#                  mixed, or an integer array of packed grid codes
+# Returns: Tuple of a bounds_dtype record array and a boolean validity mask.
+#          Records of invalid grid IDs hold NaN and precision 0.
+#          The other three corners are sw + dlat and/or sw + dlon.
+def grid_location_ID_bounds_array(gl_ids):
+
+    # Sum the table values in degrees in the same order as grid_location_ID_bounds.
+    # Grid codes look up the digits of each pair level, pairs not in the grid
+    # code have digit 0 and table value 0. Grid IDs look up the bytes of their
+    # characters directly, the NUL padding of a shorter grid ID has value 0.
+    if np.asarray(gl_ids).dtype.kind in ('u', 'i'):
+        pairs, lon_digits, lat_digits, valid, shape = grid_code_digits_array(gl_ids)
+        sw_lon = lon_tables[0][lon_digits[0]] + lon_tables[1][lon_digits[1]] + lon_tables[2][lon_digits[2]] + lon_tables[3][lon_digits[3]] + lon_tables[4][lon_digits[4]]
+        sw_lat = lat_tables[0][lat_digits[0]] + lat_tables[1][lat_digits[1]] + lat_tables[2][lat_digits[2]] + lat_tables[3][lat_digits[3]] + lat_tables[4][lat_digits[4]]
+    else:
+        chars, invalid, shape = _grid_ID_bytes(gl_ids)
+        pairs = (_grid_ID_precision(chars, invalid) // 2).astype(np.int64)
+        valid = pairs > 0
+        sw_lon = np.take(lon_byte_tables[0], chars[:, 0])
+        sw_lat = np.take(lat_byte_tables[0], chars[:, 1])
+        for level in range(1, 5):
+            sw_lon += np.take(lon_byte_tables[level], chars[:, 2*level])
+            sw_lat += np.take(lat_byte_tables[level], chars[:, 2*level + 1])
+    sw_lon[~valid] = np.nan
+    sw_lat[~valid] = np.nan
+
+    bounds = np.empty(pairs.size, dtype=bounds_dtype)
+    bounds['sw_lat'] = sw_lat
+    bounds['sw_lon'] = sw_lon
+    bounds['cen_lat'] = sw_lat + lat_center[pairs]
+    bounds['cen_lon'] = sw_lon + lon_center[pairs]
+    bounds['dlat'] = lat_size[pairs]
+    bounds['dlon'] = lon_size[pairs]
+    bounds['precision'] = pairs * 2
+
+    return bounds.reshape(shape), valid.reshape(shape)
+
+
+# ====================================================================
+# Get the grid codes and cell indexes of arrays of grid IDs or grid codes
+# Returns: Tuple of flat pairs, lon_cell and lat_cell int64 arrays, a validity
+#          mask and the input shape. Cells of invalid rows are 0.
+def _grid_code_cells(gl_ids):
+
+    if np.asarray(gl_ids).dtype.kind in ('u', 'i'):
+        codes = np.asarray(gl_ids)
+        valid = grid_code_digits_array(codes)[3]
+    else:
+        codes, valid = pack_grid_ID_array(gl_ids)
+    shape = codes.shape
+    codes = np.where(valid.ravel(), codes.astype(np.uint64).ravel(), np.uint64(0))
+
+    pairs = (codes >> np.uint64(pymaiden.grid_code_pairs_shift)).astype(np.int64)
+    lon_cell = ((codes >> np.uint64(pymaiden.grid_code_lon_shift)) & np.uint64(pymaiden.grid_code_cell_mask)).astype(np.int64)
+    lat_cell = (codes & np.uint64(pymaiden.grid_code_cell_mask)).astype(np.int64)
+
+    return pairs, lon_cell, lat_cell, valid.ravel(), shape
+
+
+# ====================================================================
+# Move arrays of grid squares by offsets in grid squares of their own precision.
+# Longitude wraps around at the antimeridian. See pymaiden._grid_code_offset.
+# Input parameters: Output of _grid_code_cells and 1-D arrays of lon and lat offsets
+# Returns: uint64 array of grid codes with one row per grid square and one
+#          column per offset. Squares past a pole and invalid rows are 0.
+def _offset_grid_codes(pairs, lon_cell, lat_cell, valid, lon_squares, lat_squares):
+
+    unit = cell_units[pairs][:, None]
+    lon_cell = (lon_cell[:, None] + lon_squares * unit) % lon_cells
+    lat_cell = lat_cell[:, None] + lat_squares * unit
+    inside = valid[:, None] & (lat_cell >= 0) & (lat_cell < lat_cells)
+
+    return _cells_to_codes(np.where(inside, pairs[:, None], 0), lon_cell, np.where(inside, lat_cell, 0))
+
+
+# ====================================================================
+# Find the grid squares next to arrays of grid squares. See pymaiden.grid_location_neighbors.
+# Input parameter: Array or list of grid IDs or an integer array of packed grid codes
+# Returns: Tuple of a uint64 grid code array with a last axis of 8 neighbors in
+#          compass order N, NE, E, SE, S, SW, W, NW and a boolean validity mask.
+#          Neighbors past a pole and all neighbors of invalid rows are 0.
+def grid_location_neighbors_array(gl_ids):
+
+    pairs, lon_cell, lat_cell, valid, shape = _grid_code_cells(gl_ids)
+    neighbors = _offset_grid_codes(pairs, lon_cell, lat_cell, valid,
+                                   neighbor_offsets[:, 0], neighbor_offsets[:, 1])
+
+    return neighbors.reshape(shape + (8,)), valid.reshape(shape)
+
+
+# ====================================================================
+# Find the grid squares within k squares of arrays of grid squares. See pymaiden.grid_location_k_ring.
+# Input parameters: Array or list of grid IDs or an integer array of packed grid
+#                   codes, and k, the number of squares (0 or more)
+# Returns: Tuple of a uint64 grid code array with a last axis of (2k+1)**2 grid
+#          squares, in rows from south to north and west to east along each row,
+#          and a boolean validity mask. Squares past a pole, squares repeated when
+#          the ring wraps all the way around in longitude and all squares of
+#          invalid rows are 0.
+def grid_location_k_ring_array(gl_ids, k=1):
+
+    if k < 0:
+        raise ValueError('k must be 0 or more, given %r' % (k,))
+    pairs, lon_cell, lat_cell, valid, shape = _grid_code_cells(gl_ids)
+
+    lat_squares, lon_squares = np.divmod(np.arange((2*k + 1)**2), 2*k + 1)
+    ring = _offset_grid_codes(pairs, lon_cell, lat_cell, valid, lon_squares - k, lat_squares - k)
+
+    # Squares more than once around the globe from the westmost column repeat earlier ones
+    lon_squares_around = lon_cells // cell_units[pairs]
+    ring[lon_squares[None, :] >= lon_squares_around[:, None]] = 0
+
+    return ring.reshape(shape + ((2*k + 1)**2,)), valid.reshape(shape)
+
+
+# ====================================================================
+# Check that arrays of latitude and longitude values are within the range
+# used by pymaiden.lat_lon_distance, -90<=lat<=90 and -180<=lon<=180
+# Returns: Boolean array, True where both values are in range
+def _lat_lon_in_range(lat, lon):
+    return (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)
+
+
+# ====================================================================
+# Calculates the great circle arc in radians between lat/lon points using
+# the haversine formula. Unlike the spherical law of cosines used by
+# pymaiden.lat_lon_distance, it keeps full precision for very short paths.
+# Input parameters: lat/lon in radians of the start points and end points and
+#                   the cosine of both latitudes. Arrays are broadcast together.
+# Returns: Array of arcs in radians
+def _haversine_arc(slat_r, slon_r, elat_r, elon_r, cos_slat, cos_elat):
+
+    a = np.sin((elat_r - slat_r)/2)**2 + cos_slat*cos_elat*np.sin((elon_r - slon_r)/2)**2
+    a = np.clip(a, 0.0, 1.0)
+
+    return 2*np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+# ====================================================================
+# Calculates the distance between arrays of lat/lon coordinates
+# Input parameters: lat/lon arrays of the start points and end points. Arrays are broadcast together.
+#                   unit, 'km', 'smi' or 'nmi' for kilometers, statute miles or nautical miles
+#                   errors, handling of out of range input (see pymaiden.error_modes)
+# Returns: Array of distances. Pairs with a lat/lon out of range are NaN. With
+#          errors='mask', a tuple of the distances and the validity mask.
+def lat_lon_distance_array(slat, slon, elat, elon, unit='km', errors='nan'):
+
+    if unit not in distance_units:
+        raise ValueError("unit must be 'km', 'smi' or 'nmi', given %r" % (unit,))
+    pymaiden._check_errors(errors)
+
+    slat, slon, elat, elon = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (slat, slon, elat, elon)))
+    valid = _lat_lon_in_range(slat, slon) & _lat_lon_in_range(elat, elon)
+    _batch_errors(errors, 'lat_lon_distance_array', valid, (slat, slon, elat, elon), True)
+
+    # Convert lats and lons to radians
+    slat_r = np.radians(slat)
+    slon_r = np.radians(slon)
+    elat_r = np.radians(elat)
+    elon_r = np.radians(elon)
+
+    distance = distance_units[unit] * _haversine_arc(slat_r, slon_r, elat_r, elon_r, np.cos(slat_r), np.cos(elat_r))
+    distance = np.where(valid, distance, np.nan)
+
+    return (distance, valid) if errors == 'mask' else distance
+
+
+# ====================================================================
+# Solves the WGS84 ellipsoid geodesic between arrays of lat/lon coordinates
+# in one pyproj Geod.inv call
+# Input parameters: lat/lon arrays of the start points and end points. Arrays are broadcast together.
+#                   unit, 'km', 'smi' or 'nmi' for kilometers, statute miles or nautical miles
+#                   errors, how out of range lat/lons are handled, see pymaiden.error_modes
+# Returns: Tuple of distance, initial azimuth and back azimuth (at the end point towards the
+#          start point) arrays. Azimuths are between 0 and 360 degrees. Pairs with a
+#          lat/lon out of range are NaN. With errors='mask' the validity mask is added
+#          to the tuple.
+def geodesic_inverse_array(slat, slon, elat, elon, unit='km', errors='nan'):
+
+    if unit not in distance_units:
+        raise ValueError("unit must be 'km', 'smi' or 'nmi', given %r" % (unit,))
+    pymaiden._check_errors(errors)
+
+    slat, slon, elat, elon = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (slat, slon, elat, elon)))
+    valid = _lat_lon_in_range(slat, slon) & _lat_lon_in_range(elat, elon)
+    _batch_errors(errors, 'geodesic_inverse_array', valid, (slat, slon, elat, elon), True)
+
+    # Geod.inv needs contiguous arrays of the same shape, and takes lon before lat
+    az12, az21, meters = pymaiden.get_wgs84_geod().inv(*(np.ascontiguousarray(np.where(valid, x, 0.0)).ravel()
+                                                          for x in (slon, slat, elon, elat)))
+
+    distance = np.where(valid.ravel(), meters / pymaiden.meters_per_unit[unit], np.nan).reshape(valid.shape)
+    azimuth = np.where(valid.ravel(), az12 % 360, np.nan).reshape(valid.shape)
+    back_azimuth = np.where(valid.ravel(), az21 % 360, np.nan).reshape(valid.shape)
+
+    return (distance, azimuth, back_azimuth, valid) if errors == 'mask' else (distance, azimuth, back_azimuth)
+
+
+# ====================================================================
+# Calculates distance between center points of arrays of grid IDs
+# Input parameters: Arrays of grid IDs of the start points and end points. Arrays are broadcast together.
+#                   unit, 'km', 'smi' or 'nmi' for kilometers, statute miles or nautical miles
+#                   model, 'sphere' (default) or 'wgs84' for the WGS84 ellipsoid geodesic
+# Returns: Array of distances. Pairs with an invalid grid ID are NaN.
+def grid_location_distance_array(gl_ids1, gl_ids2, unit='km', model='sphere'):
+
+    # Invalid grid IDs have NaN centers, which give NaN distances
+    pymaiden._check_earth_model(model)
+    bounds_1 = grid_location_ID_bounds_array(gl_ids1)[0]
+    bounds_2 = grid_location_ID_bounds_array(gl_ids2)[0]
+
+    if model == 'wgs84':
+        return geodesic_inverse_array(bounds_1['cen_lat'], bounds_1['cen_lon'], bounds_2['cen_lat'], bounds_2['cen_lon'], unit)[0]
+
+    return lat_lon_distance_array(bounds_1['cen_lat'], bounds_1['cen_lon'], bounds_2['cen_lat'], bounds_2['cen_lon'], unit)
+
+
+# ====================================================================
+# Calculate the initial bearing from the sines and cosines of the start and
+# end latitudes and of the longitude difference. Uses the same formula and
+# 180/-180 deg to 360 deg conversion as pymaiden.angle_from_coordinates.
+# Returns: Array of bearings in degrees between 0 and 360
+def _initial_bearing(sin_slat, cos_slat, sin_elat, cos_elat, sin_dlon, cos_dlon):
+
+    X = sin_dlon*cos_elat
+    Y = cos_slat*sin_elat - sin_slat*cos_elat*cos_dlon
+
+    return np.degrees(np.arctan2(X, Y) + 180*np.pi) % 360
+
+
+# ====================================================================
+# Calculate bearings between arrays of start and end lat/lon locations
+# Input parameters: lat/lon arrays of the start points and end points. Arrays are broadcast together.
+#                   rounded, True to round bearings to whole degrees like angle_from_coordinates
+#                   back, True to also return the back bearing at the end point towards the start point
+#                   errors, handling of out of range input (see pymaiden.error_modes)
+# Returns: Array of initial bearings between 0 and 360 degrees, or a tuple of the initial
+#          and back bearing arrays when back is True. Pairs with a lat/lon out of range are NaN.
+#          With errors='mask', the validity mask is added as the last item of a tuple.
+def angle_from_coordinates_array(slat, slon, elat, elon, rounded=False, back=False, errors='nan'):
+
+    pymaiden._check_errors(errors)
+    slat, slon, elat, elon = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (slat, slon, elat, elon)))
+    valid = _lat_lon_in_range(slat, slon) & _lat_lon_in_range(elat, elon)
+    _batch_errors(errors, 'angle_from_coordinates_array', valid, (slat, slon, elat, elon), True)
+
+    # Convert Lat/lon values from degreees to radians
+    slat_r = np.radians(slat)
+    slon_r = np.radians(slon)
+    elat_r = np.radians(elat)
+    elon_r = np.radians(elon)
+
+    # Sines and cosines are shared by the initial and back bearing
+    dlon_r = elon_r - slon_r
+    sin_dlon = np.sin(dlon_r)
+    cos_dlon = np.cos(dlon_r)
+    sin_slat = np.sin(slat_r)
+    cos_slat = np.cos(slat_r)
+    sin_elat = np.sin(elat_r)
+    cos_elat = np.cos(elat_r)
+
+    bearing = _initial_bearing(sin_slat, cos_slat, sin_elat, cos_elat, sin_dlon, cos_dlon)
+
+    if back:
+        # Bearing from the end point towards the start point, dlon reversed
+        back_bearing = _initial_bearing(sin_elat, cos_elat, sin_slat, cos_slat, -sin_dlon, cos_dlon)
+
+    if rounded:
+        bearing = np.rint(bearing)
+        if back:
+            back_bearing = np.rint(back_bearing)
+
+    bearing = np.where(valid, bearing, np.nan)
+    if back:
+        back_bearing = np.where(valid, back_bearing, np.nan)
+        return (bearing, back_bearing, valid) if errors == 'mask' else (bearing, back_bearing)
+
+    return (bearing, valid) if errors == 'mask' else bearing
+
+
+# ====================================================================
+# Calculate bearings between center points of arrays of grid IDs
+# Input parameters: Arrays of grid IDs for the start points and end points. Arrays are broadcast together.
+#                   rounded and back, the same as angle_from_coordinates_array
+#                   model, 'sphere' (default) or 'wgs84' for the WGS84 ellipsoid geodesic
+# Returns: The same as angle_from_coordinates_array. Pairs with an invalid grid ID are NaN.
+def angle_from_grid_location_IDs_array(gl_ids1, gl_ids2, rounded=False, back=False, model='sphere'):
+
+    # Invalid grid IDs have NaN centers, which give NaN bearings
+    pymaiden._check_earth_model(model)
+    bounds_1 = grid_location_ID_bounds_array(gl_ids1)[0]
+    bounds_2 = grid_location_ID_bounds_array(gl_ids2)[0]
+
+    if model == 'wgs84':
+        distance, bearing, back_bearing = geodesic_inverse_array(bounds_1['cen_lat'], bounds_1['cen_lon'], bounds_2['cen_lat'], bounds_2['cen_lon'])
+        if rounded:
+            bearing = np.rint(bearing)
+            back_bearing = np.rint(back_bearing)
+        return (bearing, back_bearing) if back else bearing
+
+    return angle_from_coordinates_array(bounds_1['cen_lat'], bounds_1['cen_lon'], bounds_2['cen_lat'], bounds_2['cen_lon'], rounded, back)
+
+
+# ====================================================================
+# Default number of rows and columns in each block of a distance or
+# bearing matrix. A 512 x 512 block of float64 values is 2 MB, which keeps
+# the temporary arrays of each block in cache.
+matrix_tile = 512
+
+
+# ====================================================================
+# Decode grid IDs once into center lat/lon in radians and their sines and cosines
+# Returns: Tuple of lat, lon, sin(lat) and cos(lat) arrays. Invalid grid IDs are NaN.
+def _center_radians(gl_ids):
+
+    bounds, valid = grid_location_ID_bounds_array(gl_ids)
+    lat_r = np.radians(bounds['cen_lat'].ravel())
+    lon_r = np.radians(bounds['cen_lon'].ravel())
+
+    return lat_r, lon_r, np.sin(lat_r), np.cos(lat_r)
+
+
+# ====================================================================
+# Check a caller supplied output matrix or create a new one
+# Returns: Output matrix with shape (rows, cols)
+def _matrix_out(out, rows, cols):
+
+    if out is None:
+        return np.empty((rows, cols), dtype=np.float64)
+    if out.shape != (rows, cols):
+        raise ValueError('out must have shape %r, given %r' % ((rows, cols), out.shape))
+
+    return out
+
+
+# ====================================================================
+# Calculates the distance between the center of every grid ID in a start
+# list and every grid ID in an end list. Each grid ID is decoded once and the
+# matrix is filled in blocks of tile x tile pairs, so only one block of
+# temporary arrays is held in memory at a time.
+# Input parameters: Start and end lists or arrays of grid IDs
+#                   unit, 'km', 'smi' or 'nmi' for kilometers, statute miles or nautical miles
+#                   out, optional output matrix of shape (len(start), len(end)), e.g. a np.memmap
+#                   tile, number of rows and columns in each block
+# Returns: Matrix of distances, out if given. Pairs with an invalid grid ID are NaN.
+def grid_location_distance_matrix(gl_ids1, gl_ids2, unit='km', out=None, tile=matrix_tile):
+
+    if unit not in distance_units:
+        raise ValueError("unit must be 'km', 'smi' or 'nmi', given %r" % (unit,))
+
+    slat_r, slon_r, sin_slat, cos_slat = _center_radians(gl_ids1)
+    elat_r, elon_r, sin_elat, cos_elat = _center_radians(gl_ids2)
+    out = _matrix_out(out, slat_r.size, elat_r.size)
+    radius = distance_units[unit]
+
+    for row in range(0, slat_r.size, tile):
+        rows = slice(row, row + tile)
+        for col in range(0, elat_r.size, tile):
+            cols = slice(col, col + tile)
+            arc = _haversine_arc(slat_r[rows, None], slon_r[rows, None], elat_r[cols], elon_r[cols],
+                                 cos_slat[rows, None], cos_elat[cols])
+            out[rows, cols] = radius * arc
+
+    return out
+
+
+# ====================================================================
+# Calculates the initial bearing from the center of every grid ID in a start
+# list to every grid ID in an end list, in blocks the same way as
+# grid_location_distance_matrix
+# Input parameters: Start and end lists or arrays of grid IDs
+#                   rounded, True to round bearings to whole degrees like angle_from_grid_location_IDs
+#                   out, optional output matrix of shape (len(start), len(end)), e.g. a np.memmap
+#                   tile, number of rows and columns in each block
+# Returns: Matrix of bearings between 0 and 360 degrees, out if given. Pairs with an invalid grid ID are NaN.
+def angle_from_grid_location_IDs_matrix(gl_ids1, gl_ids2, rounded=False, out=None, tile=matrix_tile):
+
+    slat_r, slon_r, sin_slat, cos_slat = _center_radians(gl_ids1)
+    elat_r, elon_r, sin_elat, cos_elat = _center_radians(gl_ids2)
+    out = _matrix_out(out, slat_r.size, elat_r.size)
+
+    for row in range(0, slat_r.size, tile):
+        rows = slice(row, row + tile)
+        for col in range(0, elat_r.size, tile):
+            cols = slice(col, col + tile)
+            dlon_r = elon_r[cols] - slon_r[rows, None]
+            bearing = _initial_bearing(sin_slat[rows, None], cos_slat[rows, None], sin_elat[cols], cos_elat[cols],
+                                       np.sin(dlon_r), np.cos(dlon_r))
+            if rounded:
+                bearing = np.rint(bearing)
+            out[rows, cols] = bearing
+
+    return out
@@ -0,0 +1,326 @@
+'''
+This module is a command line tool that runs the pymaiden_batch array
+functions over lines of text, so shell pipelines over millions of grid IDs
+or locations run at the speed of the array functions instead of one Python
+call per line. Input is read from files or stdin in chunks of rows, each
+chunk is converted with one array call and its output written before the
+next is read, so memory use stays the same however long the input is. With
+--workers N the chunks are parsed, converted and formatted by N worker
+processes, with at most 2*N chunks in flight, and written in input order.
+
+Commands and their input columns:
+    validate  grid ID                 -> True or False
+    encode    latitude, longitude     -> grid ID (--precision)
+    decode    grid ID                 -> sw_lat, sw_lon, cen_lat, cen_lon, dlat, dlon
+    distance  grid ID, grid ID        -> distance (--unit, --model)
+    bearing   grid ID, grid ID        -> initial bearing in degrees (--rounded, --model)
+Rows that are invalid or can not be parsed give empty output fields, so
+every input row gives one output row.
+
+Examples:
+    python pymaiden_cli.py encode --precision 6 < locations.txt
+    python pymaiden_cli.py distance --input-format csv --header --columns tx_loc,rx_loc \\
+        --keep --output-format csv --workers 8 spots.csv > spots_distance.csv
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import collections
+import csv
+import io
+import itertools
+import json
+import sys
+import numpy as np
+import pymaiden_batch
+import pymaiden_pipeline
+
+
+# ====================================================================
+# Default number of input rows converted per chunk
+chunk_rows = 100000
+
+input_formats = ('lines', 'csv', 'tsv')
+output_formats = ('lines', 'csv', 'tsv', 'jsonl')
+
+# Field delimiters of the delimited formats, 'lines' splits on whitespace and commas
+delimiters = {'csv': ',', 'tsv': '\t'}
+
+
+# ====================================================================
+# Commands. Each takes the list of input columns, each a list of strings, and
+# the command options, and returns a tuple of the list of output columns and
+# a bool array of the rows with a valid result.
+
+def _validate_command(columns, options):
+    valid = pymaiden_batch.grid_location_valid_ID_array([gl_id.strip() for gl_id in columns[0]])[0]
+    return [valid], np.ones(len(valid), dtype=bool)
+
+
+def _encode_command(columns, options):
+    lat = pymaiden_pipeline.float_column(columns[0])
+    lon = pymaiden_pipeline.float_column(columns[1])
+    grid_IDs, valid = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, options['precision'], 'U')
+    return [grid_IDs], valid
+
+
+def _decode_command(columns, options):
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array([gl_id.strip() for gl_id in columns[0]])
+    return [bounds[field] for field in command_outputs['decode']], valid
+
+
+def _distance_command(columns, options):
+    distance = pymaiden_batch.grid_location_distance_array([gl_id.strip() for gl_id in columns[0]],
+                                                           [gl_id.strip() for gl_id in columns[1]],
+                                                           options['unit'], options['model'])
+    return [distance], ~np.isnan(distance)
+
+
+def _bearing_command(columns, options):
+    bearing = pymaiden_batch.angle_from_grid_location_IDs_array([gl_id.strip() for gl_id in columns[0]],
+                                                                [gl_id.strip() for gl_id in columns[1]],
+                                                                options['rounded'], model=options['model'])
+    valid = ~np.isnan(bearing)
+    if options['rounded']:
+        bearing = np.where(valid, bearing, 0).astype(np.int64)
+    return [bearing], valid
+
+
+# Command name: (function, number of input columns)
+commands = {'validate': (_validate_command, 1),
+            'encode': (_encode_command, 2),
+            'decode': (_decode_command, 1),
+            'distance': (_distance_command, 2),
+            'bearing': (_bearing_command, 2)}
+
+# Output column names of each command
+command_outputs = {'validate': ('valid',),
+                   'encode': ('grid_ID',),
+                   'decode': ('sw_lat', 'sw_lon', 'cen_lat', 'cen_lon', 'dlat', 'dlon'),
+                   'distance': ('distance',),
+                   'bearing': ('bearing',)}
+
+
+# ====================================================================
+# Split lines of text into rows of fields
+# Returns: List of rows, each a list of strings
+def _split_rows(lines, input_format):
+
+    if input_format == 'lines':
+        return [line.replace(',', ' ').split() for line in lines]
+
+    return list(csv.reader(lines, delimiter=delimiters[input_format]))
+
+
+# ====================================================================
+# Turn an output column into strings, empty for invalid rows
+def _text_column(column, valid, float_format):
+
+    if column.dtype.kind == 'f':
+        values = [float_format % value for value in column.tolist()] if float_format else list(map(repr, column.tolist()))
+    else:
+        values = list(map(str, column.tolist()))
+
+    if not valid.all():
+        for i in np.flatnonzero(~valid).tolist():
+            values[i] = ''
+    return values
+
+
+# ====================================================================
+# Convert one chunk of input lines, run in this process or a worker process
+# Input parameters: List of lines and the settings dict made by main
+# Returns: Tuple of the output text and the number of rows of the chunk
+def process_chunk(lines, settings):
+
+    rows = _split_rows(lines, settings['input_format'])
+    columns = [pymaiden_pipeline.column_values(rows, i) for i in settings['columns']]
+    results, valid = commands[settings['command']][0](columns, settings['options'])
+
+    output_format = settings['output_format']
+    if output_format == 'jsonl':
+        names = command_outputs[settings['command']]
+        records = [dict.fromkeys(names) for row in rows]
+        for name, column in zip(names, results):
+            values = column.tolist()
+            for record, value, ok in zip(records, values, valid.tolist()):
+                if ok:
+                    record[name] = value
+        if settings['keep']:
+            for record, row in zip(records, rows):
+                record['input'] = row
+        return ''.join(json.dumps(record) + '\n' for record in records), len(rows)
+
+    text_columns = [_text_column(column, valid, settings['float_format']) for column in results]
+    out_rows = zip(*text_columns)
+    if settings['keep']:
+        out_rows = map(list.__add__, rows, map(list, out_rows))
+
+    return _format_rows(out_rows, output_format), len(rows)
+
+
+# ====================================================================
+# Join rows of string fields into lines of text in the lines, csv or tsv format
+def _format_rows(rows, output_format):
+
+    if output_format == 'lines':
+        lines = list(map(' '.join, rows))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    text = io.StringIO()
+    csv.writer(text, delimiter=delimiters[output_format], lineterminator='\n').writerows(rows)
+    return text.getvalue()
+
+
+# ====================================================================
+# Read the lines of the input files in chunks
+# Input parameters: List of open text files, rows per chunk and header, True
+#                   if each file starts with a header row
+# Returns: Tuple of the header line of the first file (or None) and a
+#          generator of lists of lines
+def read_line_chunks(files, rows=chunk_rows, header=False):
+
+    header_line = None
+    if header:
+        header_line = files[0].readline() if files else ''
+
+    def chunks():
+        for number, file in enumerate(files):
+            if header and number:
+                file.readline()
+            while True:
+                chunk = list(itertools.islice(file, rows))
+                if not chunk:
+                    break
+                yield chunk
+
+    return header_line, chunks()
+
+
+# ====================================================================
+# Convert chunks of lines in order
+# Input parameters: Generator of lists of lines, the settings dict and the
+#                   number of worker processes
+# Returns: Generator of the process_chunk output of each chunk, in input order. With
+#          workers, at most 2*workers chunks are read ahead of the output.
+def convert_chunks(chunks, settings, workers=1):
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield process_chunk(chunk, settings)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(process_chunk, chunk, settings))
+        while pending:
+            yield pending.popleft().result()
+
+
+# ====================================================================
+# Find the column indexes given by index or by header name
+def _column_indexes(columns, header_row, count):
+
+    if columns is None:
+        return list(range(count))
+
+    names = columns.split(',')
+    if len(names) != count:
+        raise ValueError('%d columns needed, given %r' % (count, columns))
+
+    return [pymaiden_pipeline.column_index(int(name) if name.strip().lstrip('-').isdigit() else name.strip(), header_row)
+            for name in names]
+
+
+# ====================================================================
+# Command line argument parser
+def _parser():
+
+    parser = argparse.ArgumentParser(description='Run pymaiden conversions over lines of text in chunks.')
+    parser.add_argument('command', choices=commands, help='conversion to run')
+    parser.add_argument('files', nargs='*', default=['-'], help="input files, '-' or none for stdin")
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout")
+    parser.add_argument('--input-format', choices=input_formats, default='lines',
+                        help='lines: fields separated by whitespace or commas, csv or tsv: delimited with quoting')
+    parser.add_argument('--output-format', choices=output_formats, default='lines',
+                        help='lines: fields separated by spaces, csv, tsv or jsonl: one JSON object per line')
+    parser.add_argument('--header', action='store_true', help='input files start with a header row, written to the output')
+    parser.add_argument('--columns', help='comma separated input column indexes or header names (default: the first columns)')
+    parser.add_argument('--keep', action='store_true', help='write the input fields before the results')
+    parser.add_argument('--precision', type=int, choices=(2, 4, 6, 8, 10), default=10, help='encode grid ID length')
+    parser.add_argument('--unit', choices=pymaiden_batch.distance_units, default='km', help='distance unit')
+    parser.add_argument('--model', choices=('sphere', 'wgs84'), default='sphere', help='earth model for distance and bearing')
+    parser.add_argument('--rounded', action='store_true', help='round bearings to whole degrees')
+    parser.add_argument('--float-format', help="%% format of float results, e.g. '%%.1f' (default: shortest exact)")
+    parser.add_argument('--chunk-rows', type=int, default=chunk_rows, help='input rows per chunk')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes converting chunks')
+    return parser
+
+
+# ====================================================================
+# Run the command line tool
+# Input parameter: List of arguments, sys.argv[1:] when None
+# Returns: Number of rows written
+def main(argv=None):
+
+    parser = _parser()
+    args = parser.parse_intermixed_args(argv)
+    if args.chunk_rows < 1 or args.workers < 1:
+        parser.error('--chunk-rows and --workers must be at least 1')
+
+    inputs = [sys.stdin if name == '-' else open(name, newline='') for name in args.files]
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        header_line, chunks = read_line_chunks(inputs, args.chunk_rows, args.header)
+        header_row = _split_rows([header_line], args.input_format)[0] if args.header else None
+        try:
+            columns = _column_indexes(args.columns, header_row, commands[args.command][1])
+        except ValueError as error:
+            parser.error(str(error))
+
+        settings = {'command': args.command,
+                    'input_format': args.input_format,
+                    'output_format': args.output_format,
+                    'columns': columns,
+                    'keep': args.keep,
+                    'float_format': args.float_format,
+                    'options': {'precision': args.precision, 'unit': args.unit,
+                                'model': args.model, 'rounded': args.rounded}}
+
+        if args.header and args.output_format != 'jsonl':
+            names = list(command_outputs[args.command])
+            if args.keep:
+                names = header_row + names
+            output.write(_format_rows([names], args.output_format))
+
+        count = 0
+        for text, rows in convert_chunks(chunks, settings, args.workers):
+            output.write(text)
+            count += rows
+        output.flush()
+        return count
+
+    finally:
+        for file in inputs:
+            if file is not sys.stdin:
+                file.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+# ====================================================================
+if __name__ == '__main__':
+
+    try:
+        main()
+    except BrokenPipeError:
+        # The reader of the output closed it early, e.g. head
+        sys.stderr.close()
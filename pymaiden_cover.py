@@ -0,0 +1,374 @@
+'''
+This module contains generators that find the grid squares covering an area
+of the Earth, such as all squares within a radius of a station or inside a
+county boundary. Only the latitude rows and longitude spans, or for boxes and
+polygons the larger squares, that can touch the area are walked, and grid IDs
+are yielded one at a time so large covers need not be held in memory.
+
+Example:
+    for gl_id in pymaiden_cover.grid_location_radius_cover(41.71, -72.73, 500, precision=4):
+        print(gl_id)
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import math
+import pymaiden
+
+
+# ====================================================================
+# Earth radius scale multipliers by unit name, the same values used by
+# pymaiden.lat_lon_distance
+distance_units = {'km': pymaiden.kilometers,
+                  'smi': pymaiden.statute_miles,
+                  'nmi': pymaiden.nautical_miles}
+
+
+# ====================================================================
+# Check the precision argument of the cover functions
+# Returns: Number of character pairs for the precision
+def _check_precision(precision):
+
+    if precision not in (2, 4, 6, 8, 10):
+        raise ValueError('precision must be 2, 4, 6, 8 or 10, given %r' % (precision,))
+
+    return precision // 2
+
+
+# ====================================================================
+# Grid squares of one precision are indexed by column and row. Column 0 is the
+# westmost column starting at 180 W and row 0 the southmost row.
+# Returns: Number of columns (and of rows) around the globe
+def _squares_around(pairs):
+    return pymaiden.grid_code_cells // pymaiden.grid_code_cell_units[pairs]
+
+
+# ====================================================================
+# Build the characters of one axis of a grid ID from a column or row index
+# Returns: String of one character for each pair, e.g. 'F3p2O' for a lon index
+def _index_chars(index, pairs):
+
+    digits = []
+    for level in range(pairs - 1, -1, -1):
+        index, digit = divmod(index, pymaiden.grid_code_divisions[level])
+        digits.append(chr(pymaiden.grid_code_char_base[level] + digit))
+
+    return ''.join(reversed(digits))
+
+
+# ====================================================================
+# Make the grid ID or packed grid code of the square at a column and row
+# Input parameters: column and row index, pairs, a dict cache of the characters
+#                   of each column, the characters of the row and codes, True
+#                   to return a packed grid code
+def _square(column, row, pairs, lon_chars, lat_chars, codes):
+
+    if codes:
+        unit = pymaiden.grid_code_cell_units[pairs]
+        return ((pairs << pymaiden.grid_code_pairs_shift) | (column * unit << pymaiden.grid_code_lon_shift)
+                | row * unit)
+
+    if column not in lon_chars:
+        lon_chars[column] = _index_chars(column, pairs)
+
+    return ''.join(lon + lat for lon, lat in zip(lon_chars[column], lat_chars))
+
+
+# ====================================================================
+# Half width in longitude (radians) of a spherical cap at one latitude
+# Input parameters: Latitude, cap center latitude and cap radius, all in radians
+# Returns: Half width from 0 to pi, or None if the cap does not reach the latitude
+def _cap_half_width(lat, center_lat, arc):
+
+    if abs(lat - center_lat) > arc:
+        return None
+    denominator = math.cos(lat) * math.cos(center_lat)
+    if denominator < 1e-15:
+        # At a pole, or a cap centered on a pole, every longitude is covered
+        return math.pi
+
+    cos_width = (math.cos(arc) - math.sin(lat) * math.sin(center_lat)) / denominator
+    return math.acos(max(-1.0, min(1.0, cos_width)))
+
+
+# ====================================================================
+# Largest longitude half width of a spherical cap between two latitudes
+# The half width grows toward the latitude where the cap is widest, so only
+# the band edges and that latitude need to be checked.
+# Returns: Half width in radians, or None if the cap does not reach the band
+def _cap_band_half_width(south, north, center_lat, arc):
+
+    south = max(south, center_lat - arc)
+    north = min(north, center_lat + arc)
+    if south > north:
+        return None
+
+    latitudes = [south, north]
+    if math.cos(arc) > 0:
+        widest = math.asin(max(-1.0, min(1.0, math.sin(center_lat) / math.cos(arc))))
+        if south < widest < north:
+            latitudes.append(widest)
+
+    widths = [_cap_half_width(lat, center_lat, arc) for lat in latitudes]
+    return max(width for width in widths if width is not None)
+
+
+# ====================================================================
+# Find the grid squares within a radius of a point
+# Input parameters: lat/lon of the center point, radius, grid ID precision (2, 4, 6, 8 or 10)
+#                   unit of the radius, 'km', 'smi' or 'nmi'
+#                   inside, False for every square that touches the circle or True
+#                   for only the squares entirely inside it
+#                   codes, True to yield packed grid codes instead of grid IDs
+# Returns: Generator of grid IDs in rows from south to north. Each row starts at
+#          the west end of the circle and wraps around at the antimeridian.
+def grid_location_radius_cover(lat, lon, radius, precision=4, unit='km', inside=False, codes=False):
+
+    pairs = _check_precision(precision)
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise ValueError('lat/lon must be -90<=lat<=90 and -180<=lon<=180, given %r, %r' % (lat, lon))
+    if radius < 0:
+        raise ValueError('radius must be 0 or more, given %r' % (radius,))
+
+    columns = rows = _squares_around(pairs)
+    lat_size = pymaiden.grid_lat_size[pairs]
+    lon_size = pymaiden.grid_lon_size[pairs]
+    center_lat = math.radians(lat)
+    center_lon = math.radians(lon)
+    arc = min(radius / distance_units[unit], math.pi)
+
+    # Latitude rows the circle reaches along the center meridian
+    first_row = max(int((math.degrees(center_lat - arc) + 90) // lat_size), 0)
+    last_row = min(int((math.degrees(center_lat + arc) + 90) // lat_size), rows - 1)
+
+    lon_chars = {}
+    for row in range(first_row, last_row + 1):
+        south = math.radians(row * lat_size - 90)
+        north = math.radians((row + 1) * lat_size - 90)
+        if inside:
+            # A square is inside the circle when it fits in the narrowest part of
+            # the circle in its row, which is at the south or north edge of the row
+            widths = [_cap_half_width(south, center_lat, arc), _cap_half_width(north, center_lat, arc)]
+            if None in widths:
+                continue
+            half_width = min(widths)
+        else:
+            half_width = _cap_band_half_width(south, north, center_lat, arc)
+            if half_width is None:
+                continue
+
+        # Columns from the west to the east extent of the circle in this row.
+        # Each of them holds a point of the circle, or for inside, lies in it.
+        if half_width >= math.pi:
+            first_column, span = 0, columns
+        else:
+            west = (math.degrees(center_lon - half_width) + 180) / lon_size
+            east = (math.degrees(center_lon + half_width) + 180) / lon_size
+            if inside:
+                first_column = math.ceil(west)
+                span = min(math.floor(east) - first_column, columns)
+            else:
+                first_column = math.floor(west)
+                span = min(math.floor(east) - first_column + 1, columns)
+
+        lat_chars = _index_chars(row, pairs)
+        for step in range(span):
+            yield _square((first_column + step) % columns, row, pairs, lon_chars, lat_chars, codes)
+
+
+# ====================================================================
+# Check a list of polygon vertices and unwrap their longitudes so that no edge
+# is more than 180 degrees long, which lets a polygon cross the antimeridian
+# with longitudes past 180 or -180
+# Input parameter: List of (lat, lon) vertices. The last vertex may repeat the first.
+# Returns: Polygon structure from _polygon_edges
+def _polygon(points):
+
+    points = [(float(lat), float(lon)) for lat, lon in points]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+    if len(points) < 3:
+        raise ValueError('a polygon needs at least 3 vertices, given %d' % len(points))
+    for lat, lon in points:
+        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+            raise ValueError('lat/lon must be -90<=lat<=90 and -180<=lon<=180, given %r, %r' % (lat, lon))
+
+    vertices = [(points[0][1], points[0][0])]
+    for lat, lon in points[1:]:
+        lon += 360 * round((vertices[-1][0] - lon) / 360)
+        vertices.append((lon, lat))
+
+    return _polygon_edges(vertices)
+
+
+# ====================================================================
+# Build the edge list and a latitude bin index of a polygon
+# Input parameter: List of (lon, lat) vertices with unwrapped longitudes
+# Returns: Structure with the edges as (lon1, lat1, lon2, lat2) tuples, the
+#          bounding box and the edges of each latitude bin
+def _polygon_edges(vertices):
+
+    edges = [vertices[i] + vertices[(i + 1) % len(vertices)] for i in range(len(vertices))]
+
+    west = min(lon for lon, lat in vertices)
+    east = max(lon for lon, lat in vertices)
+    south = min(lat for lon, lat in vertices)
+    north = max(lat for lon, lat in vertices)
+
+    # Edges by latitude bin for the point in polygon test
+    bin_count = min(len(edges), 1024)
+    bin_height = (north - south) / bin_count or 1.0
+    bins = [[] for i in range(bin_count)]
+    for edge in edges:
+        low = min(int((min(edge[1], edge[3]) - south) / bin_height), bin_count - 1)
+        high = min(int((max(edge[1], edge[3]) - south) / bin_height), bin_count - 1)
+        for i in range(low, high + 1):
+            bins[i].append(edge)
+
+    return {'edges': edges, 'west': west, 'east': east, 'south': south, 'north': north,
+            'bins': bins, 'bin_height': bin_height}
+
+
+# ====================================================================
+# Check if a point is inside a polygon by counting the edges crossed by a ray
+# from the point to the east
+def _point_in_polygon(lon, lat, polygon):
+
+    if not (polygon['south'] <= lat <= polygon['north']):
+        return False
+    i = min(int((lat - polygon['south']) / polygon['bin_height']), len(polygon['bins']) - 1)
+
+    inside = False
+    for lon1, lat1, lon2, lat2 in polygon['bins'][i]:
+        if (lat1 > lat) != (lat2 > lat):
+            if lon < lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1):
+                inside = not inside
+
+    return inside
+
+
+# ====================================================================
+# Check if an edge passes through the inside of a rectangle, not just along
+# or past its sides (Liang-Barsky clipping)
+def _edge_crosses(edge, west, south, east, north):
+
+    lon1, lat1, lon2, lat2 = edge
+    if max(lon1, lon2) <= west or min(lon1, lon2) >= east or max(lat1, lat2) <= south or min(lat1, lat2) >= north:
+        return False
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    start, end = 0.0, 1.0
+    for p, q in ((-dlon, lon1 - west), (dlon, east - lon1), (-dlat, lat1 - south), (dlat, north - lat1)):
+        if p == 0:
+            if q < 0:
+                return False
+        elif p < 0:
+            start = max(start, q / p)
+        else:
+            end = min(end, q / p)
+    if start > end:
+        return False
+
+    # The clipped piece of the edge is inside the rectangle unless it lies along a side
+    middle = (start + end) / 2
+    return west < lon1 + middle * dlon < east and south < lat1 + middle * dlat < north
+
+
+# ====================================================================
+# Walk the grid squares covering a polygon from the Fields down
+# Input parameters: Polygon structure, pairs of the requested precision,
+#                   mixed and codes options of grid_location_polygon_cover
+# Returns: Generator of grid IDs or packed grid codes
+def _polygon_cover(polygon, pairs, mixed, codes):
+
+    lon_chars = [{} for level in range(6)]
+
+    # Squares to check as (pairs, column, row, edges that may cross it). Columns
+    # count from 180 W and go past the last column for unwrapped longitudes.
+    lon_size = pymaiden.grid_lon_size[1]
+    lat_size = pymaiden.grid_lat_size[1]
+    first_column = math.floor((polygon['west'] + 180) / lon_size)
+    last_column = max(math.ceil((polygon['east'] + 180) / lon_size) - 1, first_column)
+    first_row = min(math.floor((polygon['south'] + 90) / lat_size), 17)
+    last_row = max(min(math.ceil((polygon['north'] + 90) / lat_size) - 1, 17), first_row)
+    squares = [(1, column, row, polygon['edges'])
+               for row in range(last_row, first_row - 1, -1) for column in range(last_column, first_column - 1, -1)]
+
+    while squares:
+        level, column, row, edges = squares.pop()
+        lon_size = pymaiden.grid_lon_size[level]
+        lat_size = pymaiden.grid_lat_size[level]
+        west = column * lon_size - 180
+        south = row * lat_size - 90
+        east = west + lon_size
+        north = south + lat_size
+
+        crossing = [edge for edge in edges if _edge_crosses(edge, west, south, east, north)]
+        if not crossing:
+            # The whole square is either inside or outside of the polygon
+            if not _point_in_polygon(west + lon_size / 2, south + lat_size / 2, polygon):
+                continue
+            if mixed or level == pairs:
+                yield _square(column % _squares_around(level), row, level, lon_chars[level], _index_chars(row, level), codes)
+                continue
+
+            # All squares of the requested precision in this square
+            scale = pymaiden.grid_code_cell_units[level] // pymaiden.grid_code_cell_units[pairs]
+            columns = _squares_around(pairs)
+            for sub_row in range(row * scale, (row + 1) * scale):
+                lat_chars = _index_chars(sub_row, pairs)
+                for sub_column in range(column * scale, (column + 1) * scale):
+                    yield _square(sub_column % columns, sub_row, pairs, lon_chars[pairs], lat_chars, codes)
+
+        elif level == pairs:
+            yield _square(column % _squares_around(level), row, level, lon_chars[level], _index_chars(row, level), codes)
+
+        else:
+            # Check the squares of the next pair level, south west first
+            divisions = pymaiden.grid_code_divisions[level]
+            squares.extend((level + 1, column * divisions + i, row * divisions + j, crossing)
+                           for j in range(divisions - 1, -1, -1) for i in range(divisions - 1, -1, -1))
+
+
+# ====================================================================
+# Find the grid squares covering a polygon
+# Input parameters: points, list of (lat, lon) vertices of a simple polygon. Edges
+#                   are straight lines in lat/lon and an edge between two
+#                   longitudes more than 180 degrees apart crosses the antimeridian.
+#                   precision, grid ID precision (2, 4, 6, 8 or 10)
+#                   mixed, True to yield the largest square entirely inside the
+#                   polygon in place of all of its smaller squares
+#                   codes, True to yield packed grid codes instead of grid IDs
+# Returns: Generator of grid IDs of the squares that overlap the polygon, square
+#          by square from the Fields down, south west first within each square
+def grid_location_polygon_cover(points, precision=6, mixed=False, codes=False):
+
+    pairs = _check_precision(precision)
+    return _polygon_cover(_polygon(points), pairs, mixed, codes)
+
+
+# ====================================================================
+# Find the grid squares covering a lat/lon box
+# Input parameters: south, west, north, east edges of the box. A box with west > east
+#                   crosses the antimeridian.
+#                   precision, mixed and codes, the same as grid_location_polygon_cover
+# Returns: The same as grid_location_polygon_cover
+def grid_location_bbox_cover(south, west, north, east, precision=6, mixed=False, codes=False):
+
+    pairs = _check_precision(precision)
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180) or not (-180 <= east <= 180):
+        raise ValueError('box must be -90<=south<=north<=90 and -180<=west,east<=180, given %r, %r, %r, %r'
+                         % (south, west, north, east))
+    if west > east:
+        east += 360
+
+    # South edge west to east and north edge back, with vertices at most 90
+    # degrees apart so that a box around the whole globe keeps its width
+    lons = [west + (east - west) * i / 4 for i in range(5)]
+    polygon = _polygon_edges([(lon, south) for lon in lons] + [(lon, north) for lon in reversed(lons)])
+
+    return _polygon_cover(polygon, pairs, mixed, codes)
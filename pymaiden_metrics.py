@@ -0,0 +1,203 @@
+'''
+This module is an opt-in instrumentation layer for the pymaiden modules.
+enable() replaces each public function of the instrumented modules with a
+wrapper that records its call count, element count and a latency histogram.
+disable() puts the original functions back, so when instrumentation is off
+there is no wrapper and no overhead at all. snapshot() returns the counters
+as plain dicts and lists to export to a metrics system, reset() clears them.
+
+The wrappers are module attributes, so calls made through the module (e.g.
+pymaiden.grid_location_ID_bounds(...)), including the calls the pymaiden
+modules make to each other, are recorded. Names imported with
+"from pymaiden import ..." before enable() keep the original function.
+Nested calls are recorded too, so a latency includes the functions it calls.
+Only calls in this process are recorded, not calls in pymaiden_parallel workers.
+
+Example:
+    pymaiden_metrics.enable()
+    ...
+    stats = pymaiden_metrics.snapshot()
+    stats['pymaiden.lat_lon_to_grid_ID']['calls']
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import functools
+import importlib
+import inspect
+import math
+import threading
+import time
+
+
+# ====================================================================
+# Modules instrumented by enable() when no modules are given
+default_modules = ('pymaiden', 'pymaiden_batch', 'pymaiden_cover', 'pymaiden_rollup',
+                   'pymaiden_parallel', 'pymaiden_npy', 'pymaiden_pipeline')
+
+# Modules whose functions take one location or grid ID per call. Their calls
+# count one element without looking at the arguments.
+scalar_modules = ('pymaiden',)
+
+# Latency histogram bucket upper bounds in nanoseconds, powers of two from
+# 256 ns to about 17 seconds. A last bucket holds slower calls.
+histogram_shift = 8
+histogram_bounds_ns = tuple(1 << bits for bits in range(histogram_shift, 35))
+histogram_last = len(histogram_bounds_ns)
+
+# Statistics of each instrumented function by 'module.function' name:
+# [calls, elements, errors, total ns, max ns, histogram counts]
+_stats = {}
+_lock = threading.Lock()
+
+# Original functions replaced by enable(), by (module, function name)
+_originals = {}
+
+
+# ====================================================================
+# Number of elements of a call: the size of its largest array, list or
+# tuple positional argument, 1 for a call with only scalar arguments
+def _elements(args):
+
+    elements = 1
+    for arg in args:
+        size = getattr(arg, 'size', None)
+        if size is None and isinstance(arg, (list, tuple)):
+            size = len(arg)
+        if isinstance(size, int) and size > elements:
+            elements = size
+    return elements
+
+
+# ====================================================================
+# Add one call to the statistics of a function
+def _record(stats, elements, elapsed, failed):
+
+    bucket = elapsed.bit_length() - histogram_shift
+    if bucket < 0:
+        bucket = 0
+    elif bucket > histogram_last:
+        bucket = histogram_last
+    with _lock:
+        stats[0] += 1
+        stats[1] += elements
+        stats[2] += failed
+        stats[3] += elapsed
+        if elapsed > stats[4]:
+            stats[4] = elapsed
+        stats[5][bucket] += 1
+
+
+# ====================================================================
+# Create the recording wrapper of a function. A generator function is timed
+# over the steps of its generator and its elements are the items yielded.
+def _wrap(function, stats, scalar=False):
+
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def generator_wrapper(*args, **kwargs):
+            elapsed = 0
+            items = 0
+            failed = True
+            try:
+                start = time.perf_counter_ns()
+                iterator = function(*args, **kwargs)
+                elapsed += time.perf_counter_ns() - start
+                while True:
+                    start = time.perf_counter_ns()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        failed = False
+                        return
+                    finally:
+                        elapsed += time.perf_counter_ns() - start
+                    items += 1
+                    yield item
+            except GeneratorExit:
+                # Closed by its consumer before the end
+                failed = False
+                raise
+            finally:
+                _record(stats, items, elapsed, failed)
+        return generator_wrapper
+
+    perf_counter_ns = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        failed = True
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _record(stats, 1 if scalar else _elements(args), perf_counter_ns() - start, failed)
+    return wrapper
+
+
+# ====================================================================
+# Start recording the public functions of modules
+# Input parameter: Iterable of module names or modules, default_modules when None
+def enable(modules=None):
+
+    for module in default_modules if modules is None else modules:
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        for name, function in list(vars(module).items()):
+            if (name.startswith('_') or not inspect.isfunction(function)
+                    or function.__module__ != module.__name__ or (module.__name__, name) in _originals):
+                continue
+            with _lock:
+                stats = _stats.setdefault('%s.%s' % (module.__name__, name),
+                                          [0, 0, 0, 0, 0, [0] * (len(histogram_bounds_ns) + 1)])
+            _originals[(module.__name__, name)] = (module, function)
+            setattr(module, name, _wrap(function, stats, module.__name__ in scalar_modules))
+
+
+# ====================================================================
+# Stop recording and put the original functions back. The statistics are
+# kept until reset().
+def disable():
+
+    for (module_name, name), (module, function) in list(_originals.items()):
+        setattr(module, name, function)
+        del _originals[(module_name, name)]
+
+
+# ====================================================================
+# Returns: True while functions are instrumented
+def is_enabled():
+    return bool(_originals)
+
+
+# ====================================================================
+# Returns: Dict by 'module.function' name of the functions called at least
+#          once: calls, elements, errors (calls that raised), total_seconds,
+#          max_seconds and histogram, a list of (upper bound in seconds, calls)
+#          pairs, the last bound math.inf
+def snapshot():
+
+    bounds = [bound / 1e9 for bound in histogram_bounds_ns] + [math.inf]
+    with _lock:
+        return {name: {'calls': calls,
+                       'elements': elements,
+                       'errors': errors,
+                       'total_seconds': total / 1e9,
+                       'max_seconds': largest / 1e9,
+                       'histogram': list(zip(bounds, histogram))}
+                for name, (calls, elements, errors, total, largest, histogram) in _stats.items() if calls}
+
+
+# ====================================================================
+# Clear the statistics of every function
+def reset():
+
+    with _lock:
+        for stats in _stats.values():
+            stats[:5] = [0, 0, 0, 0, 0]
+            stats[5][:] = [0] * len(stats[5])
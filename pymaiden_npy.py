@@ -0,0 +1,146 @@
+'''
+This module runs the pymaiden_batch array functions on data larger than
+memory. Inputs and outputs may be .npy file paths, which are opened with
+np.load(mmap_mode='r') and np.lib.format.open_memmap, np.memmap arrays or
+ordinary arrays. The rows are processed in fixed windows of chunk_rows rows,
+each window of the inputs converted with one array call and written into the
+same rows of the outputs, so only one window of results is held in memory.
+Output files are flushed after every window so their pages can be dropped.
+
+Example:
+    grid_IDs, valid = pymaiden_npy.lat_lon_to_grid_ID_npy('lat.npy', 'lon.npy',
+                                                          'grid_IDs.npy', 'valid.npy', precision=6)
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import os
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_parallel
+
+
+# ====================================================================
+# Default number of rows in each window
+chunk_rows = 1000000
+
+
+# ====================================================================
+# Open an input of a batch job
+# Input parameter: .npy file path, np.memmap or array
+# Returns: 1-D array, memory mapped read only for a file path
+def open_input(source):
+
+    if isinstance(source, (str, os.PathLike)):
+        source = np.load(source, mmap_mode='r')
+    else:
+        source = np.asanyarray(source)
+
+    if source.ndim != 1:
+        raise ValueError('inputs must be 1-D, given shape %r' % (source.shape,))
+    return source
+
+
+# ====================================================================
+# Open an output of a batch job
+# Input parameters: .npy file path, created or overwritten, an array or
+#                   np.memmap of the right dtype and length, or None for a new
+#                   array in memory. The dtype and number of rows of the output.
+# Returns: 1-D array, memory mapped read/write for a file path
+def open_output(target, dtype, rows):
+
+    dtype = np.dtype(dtype)
+    if target is None:
+        return np.empty(rows, dtype=dtype)
+    if isinstance(target, (str, os.PathLike)):
+        return np.lib.format.open_memmap(target, mode='w+', dtype=dtype, shape=(rows,))
+
+    if not isinstance(target, np.ndarray) or target.shape != (rows,) or target.dtype != dtype:
+        raise ValueError('output must be a %s array of shape (%d,)' % (dtype, rows))
+    return target
+
+
+# ====================================================================
+# Run a pymaiden_parallel kernel over windows of rows
+# Input parameters: kernel name, list of 1-D input arrays and list of 1-D
+#                   output arrays of the same length, kernel keyword arguments,
+#                   chunk_rows and progress, called with (rows done, total rows)
+#                   after each window
+# Returns: List of output arrays
+def run_windows(kernel, inputs, outputs, kwargs=None, chunk_rows=chunk_rows, progress=None):
+
+    kwargs = kwargs or {}
+    if chunk_rows < 1:
+        raise ValueError('chunk_rows must be at least 1, given %r' % (chunk_rows,))
+    rows = len(inputs[0])
+    if any(len(array) != rows for array in inputs + outputs):
+        raise ValueError('input and output arrays must all have the same length')
+
+    for start in range(0, rows, chunk_rows):
+        stop = min(start + chunk_rows, rows)
+        pymaiden_parallel.kernels[kernel]([array[start:stop] for array in inputs],
+                                          [array[start:stop] for array in outputs], **kwargs)
+        # Written pages of an output file are clean after a flush, so the
+        # operating system can drop them instead of keeping the file resident
+        for array in outputs:
+            if isinstance(array, np.memmap):
+                array.flush()
+        if progress is not None:
+            progress(stop, rows)
+
+    return outputs
+
+
+# ====================================================================
+# Check a distance unit before any output file is created
+def _check_unit(unit):
+    if unit not in pymaiden_batch.distance_units:
+        raise ValueError("unit must be 'km', 'smi' or 'nmi', given %r" % (unit,))
+
+
+# ====================================================================
+# Windowed versions of the pymaiden_batch array functions. Each takes the
+# inputs of the pymaiden_batch function as 1-D arrays or .npy file paths,
+# the outputs to write (see open_output) and the run_windows options:
+#   chunk_rows, number of rows in each window
+#   progress, function called with (rows done, total rows) after each window
+# and returns the outputs of the pymaiden_batch function.
+
+def lat_lon_to_grid_ID_npy(lat, lon, grid_IDs=None, valid=None, precision=10, chunk_rows=chunk_rows, progress=None):
+
+    pymaiden_batch._check_precision(precision)
+    inputs = [open_input(lat), open_input(lon)]
+    outputs = [open_output(grid_IDs, 'S%d' % precision, len(inputs[0])), open_output(valid, bool, len(inputs[0]))]
+
+    return tuple(run_windows('encode', inputs, outputs, {'precision': precision}, chunk_rows, progress))
+
+
+def grid_location_ID_bounds_npy(gl_ids, bounds=None, valid=None, chunk_rows=chunk_rows, progress=None):
+
+    inputs = [open_input(gl_ids)]
+    outputs = [open_output(bounds, pymaiden_batch.bounds_dtype, len(inputs[0])), open_output(valid, bool, len(inputs[0]))]
+
+    return tuple(run_windows('decode', inputs, outputs, None, chunk_rows, progress))
+
+
+def lat_lon_distance_npy(slat, slon, elat, elon, distance=None, unit='km', chunk_rows=chunk_rows, progress=None):
+
+    _check_unit(unit)
+    inputs = [open_input(array) for array in (slat, slon, elat, elon)]
+    outputs = [open_output(distance, np.float64, len(inputs[0]))]
+
+    return run_windows('distance', inputs, outputs, {'unit': unit}, chunk_rows, progress)[0]
+
+
+def grid_location_distance_npy(gl_ids1, gl_ids2, distance=None, unit='km', model='sphere', chunk_rows=chunk_rows, progress=None):
+
+    _check_unit(unit)
+    pymaiden._check_earth_model(model)
+    inputs = [open_input(gl_ids1), open_input(gl_ids2)]
+    outputs = [open_output(distance, np.float64, len(inputs[0]))]
+
+    return run_windows('grid_distance', inputs, outputs, {'unit': unit, 'model': model}, chunk_rows, progress)[0]
@@ -0,0 +1,263 @@
+'''
+This module runs the pymaiden_batch array functions on many CPU cores. The
+input arrays are split into shards of chunk_rows rows and each shard is
+processed by a worker in a process pool. Inputs and outputs are passed
+through shared memory blocks (np.memmap inputs are re-opened from their
+file by each worker) instead of being pickled, and every shard writes its
+own rows of the output, so results are returned in input order.
+
+Example:
+    grid_IDs, valid = pymaiden_parallel.lat_lon_to_grid_ID_parallel(lat, lon, workers=8)
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import mmap
+import multiprocessing
+import os
+import numpy as np
+import pymaiden_batch
+
+
+# ====================================================================
+# Shard sizes used when chunk_rows is not given. Each worker gets one shard of
+# rows / workers rows, at most max_chunk_rows and at least min_chunk_rows rows,
+# so jobs of min_chunk_rows rows or less run in the calling process.
+max_chunk_rows = 1000000
+min_chunk_rows = 10000
+
+
+# ====================================================================
+# Kernels run by the workers. Each kernel takes lists of input and output
+# array views holding the rows of one shard and fills the outputs in place.
+def _encode_kernel(inputs, outputs, precision=10):
+    outputs[0][:], outputs[1][:] = pymaiden_batch.lat_lon_to_grid_ID_array(inputs[0], inputs[1], precision)
+
+def _decode_kernel(inputs, outputs):
+    outputs[0][:], outputs[1][:] = pymaiden_batch.grid_location_ID_bounds_array(inputs[0])
+
+def _distance_kernel(inputs, outputs, unit='km'):
+    outputs[0][:] = pymaiden_batch.lat_lon_distance_array(*inputs, unit=unit)
+
+def _bearing_kernel(inputs, outputs, rounded=False):
+    outputs[0][:] = pymaiden_batch.angle_from_coordinates_array(*inputs, rounded=rounded)
+
+def _grid_distance_kernel(inputs, outputs, unit='km', model='sphere'):
+    outputs[0][:] = pymaiden_batch.grid_location_distance_array(inputs[0], inputs[1], unit, model)
+
+def _grid_bearing_kernel(inputs, outputs, rounded=False, model='sphere'):
+    outputs[0][:] = pymaiden_batch.angle_from_grid_location_IDs_array(inputs[0], inputs[1], rounded, model=model)
+
+kernels = {'encode': _encode_kernel,
+           'decode': _decode_kernel,
+           'distance': _distance_kernel,
+           'bearing': _bearing_kernel,
+           'grid_distance': _grid_distance_kernel,
+           'grid_bearing': _grid_bearing_kernel}
+
+
+# ====================================================================
+# Open the array described by a spec in a worker process
+# Input parameter: ('shm', name, dtype, shape) or ('memmap', filename, dtype, offset, shape)
+# Returns: Tuple of the array and the shared memory block to close, or None
+def _attach(spec):
+
+    if spec[0] == 'memmap':
+        kind, filename, dtype, offset, shape = spec
+        return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape), None
+
+    kind, name, dtype, shape = spec
+    block = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf), block
+
+
+# ====================================================================
+# Process one shard of rows in a worker process
+def _run_shard(kernel, in_specs, out_specs, start, stop, kwargs):
+
+    blocks = []
+    views = []
+    try:
+        for spec in in_specs + out_specs:
+            array, block = _attach(spec)
+            views.append(array[start:stop])
+            if block is not None:
+                blocks.append(block)
+            del array
+        kernels[kernel](views[:len(in_specs)], views[len(in_specs):], **kwargs)
+    finally:
+        # Views into a shared memory block must be released before it is closed
+        del views[:]
+        for block in blocks:
+            block.close()
+
+    return stop - start
+
+
+# ====================================================================
+# Create a shared memory block holding an array, or a spec that lets a
+# worker re-open a np.memmap input from its file without copying it
+# Returns: Tuple of the spec and the shared memory block, or None for a memmap
+def _share(array=None, dtype=None, shape=None):
+
+    if _is_file_mapped(array):
+        return ('memmap', array.filename, array.dtype, array.offset, array.shape), None
+
+    if array is not None:
+        dtype = array.dtype
+        shape = array.shape
+    block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    if array is not None:
+        np.ndarray(shape, dtype=dtype, buffer=block.buf)[:] = array
+
+    return ('shm', block.name, dtype, shape), block
+
+
+# ====================================================================
+# Run a kernel over 1-D input arrays of the same length in a process pool
+# Input parameters: kernel name, list of input arrays, list of output dtypes,
+#                   kernel keyword arguments, workers, chunk_rows (default: rows
+#                   split evenly over the workers, see max_chunk_rows) and start_method
+# Returns: List of output arrays in input order
+def run_parallel(kernel, inputs, out_dtypes, kwargs=None, workers=None, chunk_rows=None, start_method=None):
+
+    kwargs = kwargs or {}
+    workers = workers or os.cpu_count() or 1
+    if chunk_rows is not None and chunk_rows < 1:
+        raise ValueError('chunk_rows must be at least 1, given %r' % (chunk_rows,))
+    rows = len(inputs[0])
+    if any(len(array) != rows for array in inputs):
+        raise ValueError('input arrays must all have the same length')
+    if chunk_rows is None:
+        chunk_rows = max(min(-(-rows // workers), max_chunk_rows), min_chunk_rows)
+
+    # Small jobs run in this process without the cost of starting a pool
+    if workers == 1 or rows <= chunk_rows:
+        outputs = [np.empty(rows, dtype=dtype) for dtype in out_dtypes]
+        kernels[kernel](inputs, outputs, **kwargs)
+        return outputs
+
+    blocks = []
+    try:
+        in_specs = []
+        for array in inputs:
+            spec, block = _share(array)
+            in_specs.append(spec)
+            blocks.append(block)
+        out_specs = []
+        for dtype in out_dtypes:
+            spec, block = _share(dtype=np.dtype(dtype), shape=(rows,))
+            out_specs.append(spec)
+            blocks.append(block)
+
+        context = multiprocessing.get_context(start_method)
+        with ProcessPoolExecutor(min(workers, -(-rows // chunk_rows)), mp_context=context) as pool:
+            shards = [pool.submit(_run_shard, kernel, in_specs, out_specs, start, min(start + chunk_rows, rows), kwargs)
+                      for start in range(0, rows, chunk_rows)]
+            for shard in shards:
+                shard.result()
+
+        outputs = []
+        for spec in out_specs:
+            kind, name, dtype, shape = spec
+            block = blocks[len(in_specs) + len(outputs)]
+            outputs.append(np.ndarray(shape, dtype=dtype, buffer=block.buf).copy())
+        return outputs
+
+    finally:
+        for block in blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+
+# ====================================================================
+# Check for an np.memmap that maps its whole file region directly. Slices of a
+# memmap keep the offset of their parent, so only the memmap itself (whose
+# base is the mmap object) can be re-opened from filename and offset.
+def _is_file_mapped(array):
+    return isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.ndim == 1
+
+
+# ====================================================================
+# Flatten broadcast inputs for run_parallel. 1-D memmap inputs of the right
+# dtype are passed through so the workers can read them from their file.
+# Returns: Tuple of the list of flat arrays and the broadcast shape
+def _flat_inputs(*arrays, dtype=None):
+
+    if all(_is_file_mapped(array) and (dtype is None or array.dtype == dtype) for array in arrays):
+        if len(set(len(array) for array in arrays)) == 1:
+            return list(arrays), arrays[0].shape
+
+    arrays = [np.asarray(array, dtype=dtype) for array in arrays]
+    arrays = [array.astype('U') if array.dtype.kind == 'O' else array for array in arrays]
+    arrays = np.broadcast_arrays(*arrays)
+
+    return [np.ascontiguousarray(array).ravel() for array in arrays], arrays[0].shape
+
+
+# ====================================================================
+# Process pool versions of the pymaiden_batch array functions. Each takes the
+# same arguments and returns the same results as the pymaiden_batch function
+# plus the run_parallel options:
+#   workers, number of worker processes (default: number of CPUs)
+#   chunk_rows, number of rows in each shard (default: rows / workers, between
+#               min_chunk_rows and max_chunk_rows)
+#   start_method, multiprocessing start method, 'fork', 'spawn' or 'forkserver'
+
+def lat_lon_to_grid_ID_parallel(lat, lon, precision=10, workers=None, chunk_rows=None, start_method=None):
+
+    pymaiden_batch._check_precision(precision)
+    inputs, shape = _flat_inputs(lat, lon, dtype=np.float64)
+    grid_IDs, valid = run_parallel('encode', inputs, ['S%d' % precision, bool], {'precision': precision},
+                                   workers, chunk_rows, start_method)
+
+    return grid_IDs.reshape(shape), valid.reshape(shape)
+
+
+def grid_location_ID_bounds_parallel(gl_ids, workers=None, chunk_rows=None, start_method=None):
+
+    inputs, shape = _flat_inputs(gl_ids)
+    bounds, valid = run_parallel('decode', inputs, [pymaiden_batch.bounds_dtype, bool], None,
+                                 workers, chunk_rows, start_method)
+
+    return bounds.reshape(shape), valid.reshape(shape)
+
+
+def lat_lon_distance_parallel(slat, slon, elat, elon, unit='km', workers=None, chunk_rows=None, start_method=None):
+
+    inputs, shape = _flat_inputs(slat, slon, elat, elon, dtype=np.float64)
+    distance, = run_parallel('distance', inputs, [np.float64], {'unit': unit}, workers, chunk_rows, start_method)
+
+    return distance.reshape(shape)
+
+
+def angle_from_coordinates_parallel(slat, slon, elat, elon, rounded=False, workers=None, chunk_rows=None, start_method=None):
+
+    inputs, shape = _flat_inputs(slat, slon, elat, elon, dtype=np.float64)
+    bearing, = run_parallel('bearing', inputs, [np.float64], {'rounded': rounded}, workers, chunk_rows, start_method)
+
+    return bearing.reshape(shape)
+
+
+def grid_location_distance_parallel(gl_ids1, gl_ids2, unit='km', model='sphere', workers=None, chunk_rows=None, start_method=None):
+
+    inputs, shape = _flat_inputs(gl_ids1, gl_ids2)
+    distance, = run_parallel('grid_distance', inputs, [np.float64], {'unit': unit, 'model': model},
+                             workers, chunk_rows, start_method)
+
+    return distance.reshape(shape)
+
+
+def angle_from_grid_location_IDs_parallel(gl_ids1, gl_ids2, rounded=False, model='sphere', workers=None, chunk_rows=None, start_method=None):
+
+    inputs, shape = _flat_inputs(gl_ids1, gl_ids2)
+    bearing, = run_parallel('grid_bearing', inputs, [np.float64], {'rounded': rounded, 'model': model},
+                            workers, chunk_rows, start_method)
+
+    return bearing.reshape(shape)
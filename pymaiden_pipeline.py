@@ -0,0 +1,205 @@
+'''
+This module contains a generator based pipeline for adding distance and
+bearing columns to large CSV spot archives such as the monthly WSPR dumps.
+Rows are read, enriched and written in chunks with the pymaiden_batch array
+functions, so memory use stays the same however large the file is.
+
+Example:
+    pymaiden_pipeline.enrich_spot_csv('wsprspots.csv', 'enriched.csv',
+                                      start=7, end=3, header=False)
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import contextlib
+import csv
+import itertools
+import numpy as np
+import pymaiden
+import pymaiden_batch
+
+
+# ====================================================================
+# Default number of CSV rows processed per chunk
+chunk_rows = 100000
+
+
+# ====================================================================
+# Read a CSV file in chunks of rows
+# Input parameters: An open text file (or any iterable of lines), the number of
+#                   rows per chunk and csv.reader format parameters, e.g. delimiter='\t'
+# Returns: Generator of lists of rows, each row a list of strings
+def read_csv_chunks(csv_file, rows=chunk_rows, **fmtparams):
+
+    reader = csv.reader(csv_file, **fmtparams)
+    while True:
+        chunk = list(itertools.islice(reader, rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ====================================================================
+# Convert a list of strings to floats
+# Returns: Float array, NaN where a string is not a number
+def float_column(values):
+
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        column = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except ValueError:
+                column[i] = np.nan
+        return column
+
+
+# ====================================================================
+# Check the unit and earth model arguments the way the pymaiden functions do
+def _check_unit_model(unit, model):
+
+    if unit not in pymaiden_batch.distance_units:
+        raise ValueError("unit must be 'km', 'smi' or 'nmi', given %r" % (unit,))
+    pymaiden._check_earth_model(model)
+
+
+# ====================================================================
+# Get one column of a list of rows
+# Returns: List of strings, '' for blank rows and rows too short to have the column
+def column_values(chunk, column):
+
+    width = column + 1 if column >= 0 else -column
+    return [row[column] if len(row) >= width else '' for row in chunk]
+
+
+# ====================================================================
+# Get the lat/lon of each row of a chunk
+# Input parameters: List of rows and a column index of a grid ID column, or a
+#                   tuple of latitude and longitude column indexes
+# Returns: Tuple of latitude and longitude arrays. Grid IDs give their center
+#          point, invalid values and missing fields are NaN.
+def _chunk_points(chunk, column):
+
+    if isinstance(column, tuple):
+        lat_column, lon_column = column
+        return (float_column(column_values(chunk, lat_column)),
+                float_column(column_values(chunk, lon_column)))
+
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array([gl_id.strip() for gl_id in column_values(chunk, column)])
+    return bounds['cen_lat'], bounds['cen_lon']
+
+
+# ====================================================================
+# Add distance and bearing columns to chunks of rows
+# Input parameters: Generator or list of row chunks
+#                   start, end, column index of a grid ID column, or a tuple of
+#                   latitude and longitude column indexes, for the start and end points
+#                   unit, 'km', 'smi' or 'nmi', and model, 'sphere' or 'wgs84'
+#                   distance_format, % format string for the distance column
+# Returns: Generator of the same chunks with the distance and the rounded initial
+#          bearing appended to each row. Both are empty strings for invalid rows,
+#          including blank rows and rows without the start or end columns.
+#          unit and model are checked when the first chunk is requested.
+def enrich_spot_chunks(chunks, start, end, unit='km', model='sphere', distance_format='%.1f'):
+
+    _check_unit_model(unit, model)
+    for chunk in chunks:
+        if not chunk:
+            continue
+        slat, slon = _chunk_points(chunk, start)
+        elat, elon = _chunk_points(chunk, end)
+
+        if model == 'wgs84':
+            distance, bearing, back_bearing = pymaiden_batch.geodesic_inverse_array(slat, slon, elat, elon, unit)
+            bearing = np.rint(bearing)
+        else:
+            distance = pymaiden_batch.lat_lon_distance_array(slat, slon, elat, elon, unit)
+            bearing = pymaiden_batch.angle_from_coordinates_array(slat, slon, elat, elon, rounded=True)
+
+        valid = ~np.isnan(distance)
+        for row, row_valid, row_distance, row_bearing in zip(chunk, valid.tolist(), distance.tolist(), bearing.tolist()):
+            if row_valid:
+                row.append(distance_format % row_distance)
+                row.append('%d' % row_bearing)
+            else:
+                row.append('')
+                row.append('')
+
+        yield chunk
+
+
+# ====================================================================
+# Write chunks of rows to a CSV file
+# Input parameters: Generator or list of row chunks, an open text file and csv.writer format parameters
+# Returns: Number of rows written
+def write_csv_chunks(chunks, csv_file, **fmtparams):
+
+    writer = csv.writer(csv_file, **fmtparams)
+    count = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        count += len(chunk)
+
+    return count
+
+
+# ====================================================================
+# Find the index of a column given by name or index, or of each column of a lat/lon tuple
+def column_index(column, header):
+
+    if isinstance(column, tuple):
+        return tuple(column_index(c, header) for c in column)
+    if isinstance(column, int):
+        return column
+    if header is None:
+        raise ValueError('column %r given by name but the file has no header' % (column,))
+
+    return header.index(column)
+
+
+# ====================================================================
+# Add distance and bearing columns to a CSV spot file
+# Input parameters: Input and output file paths or open text files
+#                   start, end, name or index of a grid ID column, or a tuple of
+#                   latitude and longitude columns, for the start and end points
+#                   header, True if the first row of the input is a header row
+#                   rows, number of rows per chunk
+#                   unit, model and distance_format, the same as enrich_spot_chunks
+#                   delimiter, the CSV field delimiter for both files
+# Returns: Number of data rows written
+def enrich_spot_csv(in_file, out_file, start, end, header=True, rows=chunk_rows,
+                    unit='km', model='sphere', distance_format='%.1f', delimiter=','):
+
+    # Checked before the output file is created
+    _check_unit_model(unit, model)
+
+    with _open_text(in_file, 'r') as source, _open_text(out_file, 'w') as target:
+        chunks = read_csv_chunks(source, rows, delimiter=delimiter)
+
+        header_row = None
+        if header:
+            first = next(chunks, [])
+            header_row = first[0] if first else []
+            chunks = itertools.chain([first[1:]], chunks)
+            csv.writer(target, delimiter=delimiter).writerow(header_row + ['distance_' + unit, 'bearing'])
+
+        start = column_index(start, header_row)
+        end = column_index(end, header_row)
+
+        return write_csv_chunks(enrich_spot_chunks(chunks, start, end, unit, model, distance_format), target, delimiter=delimiter)
+
+
+# ====================================================================
+# Open a file path as a text file for the csv module, or pass an open file
+# through without closing it on exit
+def _open_text(file, mode):
+
+    if hasattr(file, 'read') or hasattr(file, 'write'):
+        return contextlib.nullcontext(file)
+
+    return open(file, mode, newline='')
@@ -0,0 +1,160 @@
+'''
+This module aggregates spot data by grid square. Counts, sums or maxima of
+arrays of grid IDs or packed grid codes are found at several precision levels
+in one call with bincount style array reductions. The Field and Square levels
+use dense arrays of 324 and 32,400 cells in grid ID order, deeper levels a
+sparse layout holding only the grid squares that have spots.
+
+Example:
+    levels = pymaiden_rollup.grid_location_rollup(grid_IDs, precisions=(2, 4, 6))
+    field_counts = levels[2]            # 324 counts, field_counts[0] is AA
+    subsquare_IDs, subsquare_counts = levels[6]
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import numpy as np
+import pymaiden_batch
+
+
+# ====================================================================
+# Precisions returned in the dense layout and the supported reductions
+dense_precisions = (2, 4)
+reductions = ('count', 'sum', 'max')
+
+# Number of grid squares at each number of pairs, e.g. 324 Fields and 32,400
+# Squares. A grid square's key is its index in grid ID order at its precision.
+level_squares = (1,) + tuple(np.cumprod([divisions**2 for divisions in pymaiden_batch.pair_divisions]).tolist())
+
+
+# ====================================================================
+# Find the key of each grid square at a number of pairs
+# Input parameters: Lists of lon and lat digit arrays and the number of pairs
+# Returns: int64 array of keys, the index of each grid square in grid ID order
+def grid_keys(lon_digits, lat_digits, pairs):
+
+    keys = np.zeros(lon_digits[0].size, dtype=np.int64)
+    for level in range(pairs):
+        divisions = pymaiden_batch.pair_divisions[level]
+        keys = (keys * divisions + lon_digits[level]) * divisions + lat_digits[level]
+
+    return keys
+
+
+# ====================================================================
+# Find the grid IDs of keys at a precision
+# Input parameters: Precision (2, 4, 6, 8 or 10), an array of keys (default: every
+#                   grid square of the dense layout) and dtype, 'S' or 'U'
+# Returns: Grid ID array in the same order as the keys
+def rollup_grid_IDs(precision, keys=None, dtype='S'):
+
+    pymaiden_batch._check_precision(precision, dtype)
+    pairs = precision // 2
+    if keys is None:
+        keys = np.arange(level_squares[pairs], dtype=np.int64)
+    keys = np.asarray(keys, dtype=np.int64)
+
+    lon_digits = [np.zeros(keys.size, dtype=np.int64)] * 5
+    lat_digits = [np.zeros(keys.size, dtype=np.int64)] * 5
+    for level in range(pairs - 1, -1, -1):
+        divisions = pymaiden_batch.pair_divisions[level]
+        keys, lat_digits[level] = np.divmod(keys, divisions)
+        keys, lon_digits[level] = np.divmod(keys, divisions)
+
+    grid_IDs = pymaiden_batch._digits_to_grid_IDs(np.full(lon_digits[0].size, pairs), lon_digits, lat_digits, precision)
+    if dtype == 'U':
+        grid_IDs = grid_IDs.astype('U%d' % precision)
+
+    return grid_IDs
+
+
+# ====================================================================
+# Reduce values by key
+# Input parameters: Keys, values (None to count the keys), reduction and the
+#                   number of dense cells, or None for the sparse layout
+# Returns: Tuple of the sorted unique keys (all cells for dense) and the values
+def _reduce(keys, values, how, size):
+
+    if size is None:
+        keys, index = np.unique(keys, return_inverse=True)
+        size = keys.size
+    else:
+        index = keys
+        keys = np.arange(size, dtype=np.int64)
+
+    if how == 'max':
+        # Cells without a value stay NaN
+        reduced = np.full(size, np.nan)
+        np.fmax.at(reduced, index, values)
+    elif values is None:
+        reduced = np.bincount(index, minlength=size)
+    else:
+        reduced = np.bincount(index, weights=values, minlength=size)
+        if how == 'count':
+            # The values are the whole counts of the next finer level
+            reduced = reduced.astype(np.int64)
+
+    return keys, reduced
+
+
+# ====================================================================
+# Aggregate arrays of grid IDs or grid codes at several precisions
+# Input parameters: gl_ids, array or list of grid IDs, lengths may be mixed, or an
+#                   integer array of packed grid codes
+#                   weights, array of values for each grid ID (required for 'sum' and
+#                   'max', not allowed for 'count')
+#                   precisions, precisions (2, 4, 6, 8 or 10) to aggregate at
+#                   how, 'count', 'sum' or 'max'
+#                   dtype, 'S' or 'U' for the grid IDs of the sparse layout
+# Returns: Dict keyed by precision. Precisions 2 and 4 hold an array of 324 or
+#          32,400 values in grid ID order (see rollup_grid_IDs), deeper precisions
+#          a tuple of the sorted grid IDs that have values and their values. Counts
+#          are int64, sums and maxima float64 with NaN maxima for empty dense cells.
+#          Invalid grid IDs, and grid IDs less precise than a level, are left out of it.
+def grid_location_rollup(gl_ids, weights=None, precisions=(2, 4, 6), how='count', dtype='S'):
+
+    if how not in reductions:
+        raise ValueError('how must be one of %s, given %r' % (', '.join(reductions), how))
+    if how != 'count' and weights is None:
+        raise ValueError("weights are required for how=%r" % (how,))
+    if how == 'count' and weights is not None:
+        raise ValueError("weights are not used by how='count', use how='sum' to add them up")
+    for precision in precisions:
+        pymaiden_batch._check_precision(precision, dtype)
+
+    if np.asarray(gl_ids).dtype.kind in ('u', 'i'):
+        pairs, lon_digits, lat_digits, valid, shape = pymaiden_batch.grid_code_digits_array(gl_ids)
+    else:
+        pairs, lon_digits, lat_digits, valid, shape = pymaiden_batch.grid_ID_digits_array(gl_ids)
+    if weights is not None:
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), shape).ravel()
+
+    # Each grid ID is reduced once, at the deepest level it reaches. Coarser
+    # levels reduce the results of the next finer level plus the grid IDs that
+    # stop between the two levels.
+    results = {}
+    finer = None
+    levels = sorted(set(precision // 2 for precision in precisions), reverse=True)
+    for i, level in enumerate(levels):
+        rows = pairs >= level
+        if i:
+            rows &= pairs < levels[i - 1]
+        keys = grid_keys([digits[rows] for digits in lon_digits], [digits[rows] for digits in lat_digits], level)
+        values = None if weights is None else weights[rows]
+
+        if finer is not None:
+            finer_level, finer_keys, finer_values = finer
+            if values is None:
+                values = np.ones(keys.size, dtype=np.int64)
+            keys = np.concatenate([keys, finer_keys // (level_squares[finer_level] // level_squares[level])])
+            values = np.concatenate([values, finer_values])
+
+        dense = level * 2 in dense_precisions
+        keys, values = _reduce(keys, values, how, level_squares[level] if dense else None)
+        results[level * 2] = values if dense else (rollup_grid_IDs(level * 2, keys, dtype), values)
+        finer = (level, keys, values)
+
+    return {precision: results[precision] for precision in precisions}
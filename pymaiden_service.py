@@ -0,0 +1,420 @@
+'''
+This module is a local HTTP/JSON service over the pymaiden functions, so
+tools can share one running interpreter instead of starting Python for
+each call. It uses only asyncio from the standard library. Requests to the
+same endpoint that arrive within max_wait seconds of each other are
+coalesced into one pymaiden_batch array call of up to max_batch items.
+
+Every endpoint takes a POST with a JSON object holding a list of items and
+returns the results in the same order:
+    POST /validate  {"items": ["FN31pr", ...]}                -> [true, ...]
+    POST /encode    {"items": [[41.7, -72.7], ...], "precision": 6}  -> ["FN31pr", ...]
+    POST /decode    {"items": ["FN31pr", ...]}                -> [{"sw_lat": ..., ...}, ...]
+    POST /size      {"items": ["FN31pr", ...]}                -> [{"sqkm": ..., ...}, ...]
+    POST /distance  {"items": [["FN31pr", "JO62qm"], ...], "unit": "km"}  -> [6311.9, ...]
+    POST /bearing   {"items": [["FN31pr", "JO62qm"], ...]}    -> [49.5, ...]
+    GET  /stats     queue depth and batch size statistics
+Invalid grid IDs and locations give null results.
+
+Run from the command line:
+    python pymaiden_service.py --port 8750 --max-batch 4096 --max-wait 0.002
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import math
+import numpy as np
+import pymaiden
+import pymaiden_batch
+
+
+# ====================================================================
+# Default service settings. max_batch is the number of items run in one
+# batch call (a larger single request runs alone), max_wait the seconds the
+# first queued request waits for others to join its batch.
+default_host = '127.0.0.1'
+default_port = 8750
+max_batch = 4096
+max_wait = 0.002
+
+# Largest request body accepted, in bytes
+max_body = 64 * 1024 * 1024
+
+# Batch size histogram bucket upper bounds, the last bucket holds larger batches
+batch_size_buckets = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+# ====================================================================
+# Turn a float array into a list with None for NaN
+def _float_list(values):
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+# ====================================================================
+# Batch functions. Each takes the list of items of a batch, as returned by
+# the endpoint's item parser, and returns the list of JSON results.
+
+def _validate_batch(items):
+    return pymaiden_batch.grid_location_valid_ID_array(items)[0].tolist()
+
+
+def _encode_batch(items):
+
+    # Lower precision grid IDs are the leading characters of the 10 character grid ID
+    lat, lon, precision = (np.array(column) for column in zip(*items))
+    grid_IDs, valid = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 10, 'U')
+    return [grid_ID[:p] if ok else None for grid_ID, ok, p in zip(grid_IDs.tolist(), valid.tolist(), precision.tolist())]
+
+
+def _decode_batch(items):
+
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array(items)
+    fields = ('sw_lat', 'sw_lon', 'cen_lat', 'cen_lon', 'dlat', 'dlon')
+    columns = [bounds[field].tolist() for field in fields]
+    return [dict(zip(fields, row)) if ok else None for row, ok in zip(zip(*columns), valid.tolist())]
+
+
+def _size_batch(items):
+
+    # Grid squares of the same precision and latitude row have the same size,
+    # so the size is calculated once for each row in the batch. The row is the
+    # grid code without its lon_cell bits.
+    codes, valid = pymaiden_batch.pack_grid_ID_array(items)
+    codes = codes[valid]
+    rows = codes & ~np.uint64(pymaiden.grid_code_cell_mask << pymaiden.grid_code_lon_shift)
+    rows, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    sizes = [pymaiden.grid_location_size(code) for code in codes[first].tolist()]
+
+    results = [None] * len(items)
+    for index, row in zip(np.flatnonzero(valid).tolist(), inverse.tolist()):
+        results[index] = sizes[row]
+    return results
+
+
+def _distance_batch(items):
+
+    gl_ids1, gl_ids2, units = (np.array(column) for column in zip(*items))
+    distances = np.empty(len(items))
+    for unit in set(units.tolist()):
+        rows = units == unit
+        distances[rows] = pymaiden_batch.grid_location_distance_array(gl_ids1[rows], gl_ids2[rows], unit)
+    return _float_list(distances)
+
+
+def _bearing_batch(items):
+
+    gl_ids1, gl_ids2 = (np.array(column) for column in zip(*items))
+    return _float_list(pymaiden_batch.angle_from_grid_location_IDs_array(gl_ids1, gl_ids2))
+
+
+# ====================================================================
+# Item parsers. Each checks a request body and returns its list of items
+# for the batch function, raising ValueError for a malformed request.
+
+def _strings(body):
+    items = body.get('items')
+    if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+        raise ValueError('items must be a list of grid ID strings')
+    return items
+
+
+def _string_pairs(body):
+    items = body.get('items')
+    if not isinstance(items, list) or not all(isinstance(item, list) and len(item) == 2 and all(isinstance(gl_id, str) for gl_id in item) for item in items):
+        raise ValueError('items must be a list of [grid ID, grid ID] pairs')
+    return items
+
+
+def _encode_items(body):
+    items = body.get('items')
+    precision = body.get('precision', 10)
+    if type(precision) is not int or precision not in (2, 4, 6, 8, 10):
+        raise ValueError('precision must be 2, 4, 6, 8 or 10')
+    if not isinstance(items, list) or not all(isinstance(item, list) and len(item) == 2 and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in item) for item in items):
+        raise ValueError('items must be a list of [lat, lon] pairs')
+    return [(lat, lon, precision) for lat, lon in items]
+
+
+def _distance_items(body):
+    unit = body.get('unit', 'km')
+    if unit not in pymaiden_batch.distance_units:
+        raise ValueError("unit must be 'km', 'smi' or 'nmi'")
+    return [(gl_id1, gl_id2, unit) for gl_id1, gl_id2 in _string_pairs(body)]
+
+
+# Endpoint name: (item parser, batch function)
+endpoints = {'validate': (_strings, _validate_batch),
+             'encode': (_encode_items, _encode_batch),
+             'decode': (_strings, _decode_batch),
+             'size': (_strings, _size_batch),
+             'distance': (_distance_items, _distance_batch),
+             'bearing': (_string_pairs, _bearing_batch)}
+
+
+# ====================================================================
+# Coalesces the requests to one endpoint into batch calls
+class Batcher:
+
+    def __init__(self, function, executor, max_batch=max_batch, max_wait=max_wait):
+
+        self.function = function
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = []
+        self.pending_items = 0
+        self.running_items = 0
+        self.running_batches = 0
+        self.timer = None
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self.largest = 0
+        self.histogram = [0] * (len(batch_size_buckets) + 1)
+
+    # ====================================================================
+    # Queue the items of one request
+    # Returns: List of results once the batch holding the request has run
+    async def submit(self, items):
+
+        if not items:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((items, future))
+        self.pending_items += len(items)
+        self.requests += 1
+
+        if self.pending_items >= self.max_batch:
+            self._flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+        return await future
+
+    # ====================================================================
+    # Start a batch call with the queued requests, up to max_batch items. A
+    # single request larger than max_batch is run on its own.
+    def _flush(self):
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        while self.pending:
+            batch = [self.pending.pop(0)]
+            size = len(batch[0][0])
+            while self.pending and size + len(self.pending[0][0]) <= self.max_batch:
+                size += len(self.pending[0][0])
+                batch.append(self.pending.pop(0))
+            self.pending_items -= size
+            self.running_items += size
+            self.running_batches += 1
+            asyncio.get_running_loop().create_task(self._run(batch, size))
+
+            # A partial batch waits for more requests
+            if self.pending and self.pending_items < self.max_batch:
+                self.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+                break
+
+    async def _run(self, batch, size):
+
+        self.batches += 1
+        self.items += size
+        self.largest = max(self.largest, size)
+        bucket = 0
+        while bucket < len(batch_size_buckets) and size > batch_size_buckets[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+        loop = asyncio.get_running_loop()
+        items = [item for request_items, future in batch for item in request_items]
+        try:
+            try:
+                results = await loop.run_in_executor(self.executor, self.function, items)
+            except Exception as error:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(error)
+                    return
+
+                # Run each request on its own so that one bad request only
+                # fails itself and not the others coalesced with it
+                for request_items, future in batch:
+                    try:
+                        results = await loop.run_in_executor(self.executor, self.function, request_items)
+                    except Exception as request_error:
+                        if not future.done():
+                            future.set_exception(request_error)
+                    else:
+                        if not future.done():
+                            future.set_result(results)
+                return
+        finally:
+            self.running_items -= size
+            self.running_batches -= 1
+
+        start = 0
+        for request_items, future in batch:
+            if not future.done():
+                future.set_result(results[start:start + len(request_items)])
+            start += len(request_items)
+
+    # ====================================================================
+    # Returns: Dict of the queue depth and batch size statistics. queue_depth
+    #          counts the items waiting for a batch and the items of the
+    #          batches started but not finished.
+    def stats(self):
+
+        return {'queue_depth': self.pending_items + self.running_items,
+                'queued_requests': len(self.pending),
+                'running_batches': self.running_batches,
+                'requests': self.requests,
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': self.items / self.batches if self.batches else 0,
+                'max_batch_size': self.largest,
+                'batch_size_histogram': {('<=%d' % bound): count for bound, count in zip(batch_size_buckets, self.histogram)}
+                                        | {'>%d' % batch_size_buckets[-1]: self.histogram[-1]}}
+
+
+# ====================================================================
+# The HTTP/JSON service
+class MaidenheadService:
+
+    # ====================================================================
+    # Input parameters: max_batch items per batch call and max_wait seconds
+    #                   for a batch to fill
+    def __init__(self, max_batch=max_batch, max_wait=max_wait):
+
+        if max_batch < 1 or max_wait < 0:
+            raise ValueError('max_batch must be at least 1 and max_wait at least 0')
+        # Batch calls run on one worker thread so the event loop keeps
+        # accepting requests while a batch is computed
+        self.executor = ThreadPoolExecutor(1)
+        self.batchers = {name: Batcher(function, self.executor, max_batch, max_wait)
+                         for name, (parser, function) in endpoints.items()}
+        self.server = None
+
+    # ====================================================================
+    # Handle one request
+    # Returns: Tuple of the HTTP status and the JSON response object
+    async def handle(self, method, path, body):
+
+        name = path.strip('/').split('?')[0]
+        if name == 'stats' and method == 'GET':
+            return 200, self.stats()
+        if name not in endpoints:
+            return 404, {'error': 'unknown endpoint %s' % path}
+        if method != 'POST':
+            return 405, {'error': 'use POST for %s' % path}
+
+        try:
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+            items = endpoints[name][0](request)
+        except ValueError as error:
+            return 400, {'error': str(error)}
+
+        return 200, {'results': await self.batchers[name].submit(items)}
+
+    # ====================================================================
+    # Returns: Dict of the statistics of every endpoint
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+    # ====================================================================
+    # Serve HTTP/1.1 requests on one connection until it is closed
+    async def _connection(self, reader, writer):
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path = request_line.decode('latin-1').split()[:2]
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, value = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > max_body:
+                    status, response = 413, {'error': 'request body larger than %d bytes' % max_body}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, response = await self.handle(method, path, body)
+                    except Exception as error:
+                        status, response = 500, {'error': '%s: %s' % (type(error).__name__, error)}
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+
+                payload = json.dumps(response).encode()
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n'
+                             % (status, http_reasons.get(status, 'Error').encode(), len(payload), b'keep-alive' if keep_alive else b'close')
+                             + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # ====================================================================
+    # Start listening
+    # Returns: The asyncio server. port 0 picks a free port, see server.sockets.
+    async def start(self, host=default_host, port=default_port):
+
+        self.server = await asyncio.start_server(self._connection, host, port)
+        return self.server
+
+    async def close(self):
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+
+http_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+# ====================================================================
+# Run the service until interrupted
+async def serve(host=default_host, port=default_port, max_batch=max_batch, max_wait=max_wait):
+
+    service = MaidenheadService(max_batch, max_wait)
+    server = await service.start(host, port)
+    print('pymaiden service on http://%s:%d' % server.sockets[0].getsockname()[:2])
+    async with server:
+        await server.serve_forever()
+
+
+# ====================================================================
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON service over the pymaiden functions.')
+    parser.add_argument('--host', default=default_host, help='address to listen on')
+    parser.add_argument('--port', type=int, default=default_port, help='port to listen on')
+    parser.add_argument('--max-batch', type=int, default=max_batch, help='most items run in one batch call')
+    parser.add_argument('--max-wait', type=float, default=max_wait, help='seconds a request waits for its batch to fill')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait))
+    except KeyboardInterrupt:
+        pass
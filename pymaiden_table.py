@@ -0,0 +1,203 @@
+'''
+This module builds and reads a precomputed table of the distance and
+bearing between the centers of every pair of the 32,400 4 character grid
+squares. The table is two 32,400 x 32,400 uint16 .npy files (about 2.1 GB
+each) opened with np.memmap, so a lookup is an index calculation and every
+process on the host shares the same pages of the file.
+
+Distances are whole kilometers on the mean radius sphere used by
+lat_lon_distance, bearings hundredths of a degree (0 to 35999). Grid IDs
+longer than 4 characters are looked up by the square that holds them.
+
+Example:
+    pymaiden_table.build_square_table('squares', workers=8)    # once, resumable
+    table = pymaiden_table.SquareTable('squares')
+    table.distance("FN31pr", "JO62qm")
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import numpy as np
+import pymaiden_batch
+import pymaiden_rollup
+import pymaiden_worked
+
+
+# ====================================================================
+# Table layout. Rows and columns are squares in grid ID order (see
+# pymaiden_rollup.rollup_grid_IDs). The progress file holds one byte per
+# block of rows, set once the block's rows are written to both tables.
+square_count = pymaiden_rollup.level_squares[2]
+bearing_scale = 100
+table_files = {'distance': 'square_distance.npy', 'bearing': 'square_bearing.npy'}
+progress_file = 'square_progress.npy'
+
+# Default number of rows computed by a worker at a time
+block_rows = 128
+
+
+# ====================================================================
+# Find the center lat/lon of every 4 character grid square in grid ID order
+# Returns: Tuple of latitude and longitude arrays
+def _square_centers():
+
+    bounds = pymaiden_batch.grid_location_ID_bounds_array(pymaiden_rollup.rollup_grid_IDs(4))[0]
+    return bounds['cen_lat'], bounds['cen_lon']
+
+
+# ====================================================================
+# Compute one block of rows of the tables in a worker process
+# Returns: The block number
+def _build_block(directory, block, rows_per_block):
+
+    lat, lon = _square_centers()
+    rows = slice(block * rows_per_block, min((block + 1) * rows_per_block, square_count))
+    slat = lat[rows, None]
+    slon = lon[rows, None]
+
+    distance = np.lib.format.open_memmap(os.path.join(directory, table_files['distance']), mode='r+')
+    distance[rows] = np.rint(pymaiden_batch.lat_lon_distance_array(slat, slon, lat, lon))
+    distance.flush()
+    bearing = np.lib.format.open_memmap(os.path.join(directory, table_files['bearing']), mode='r+')
+    bearing[rows] = np.rint(pymaiden_batch.angle_from_coordinates_array(slat, slon, lat, lon) * bearing_scale) % (360 * bearing_scale)
+    bearing.flush()
+    del distance, bearing
+
+    # Only mark the block done once its rows are on disk
+    progress = np.lib.format.open_memmap(os.path.join(directory, progress_file), mode='r+')
+    progress[block] = 1
+    progress.flush()
+
+    return block
+
+
+# ====================================================================
+# Build the square table files in a directory. An interrupted build picks up
+# with the blocks not yet done when it is run again with the same rows_per_block.
+# Input parameters: directory, created if needed
+#                   workers, number of worker processes (default: number of CPUs)
+#                   rows_per_block, rows computed by a worker at a time
+#                   blocks, optional list of block numbers to build, 0 to the number
+#                   of blocks - 1 (default: all)
+#                   start_method, multiprocessing start method
+#                   report, optional function called with (blocks done, total blocks)
+# Returns: Number of blocks of the table still to be built, 0 once complete
+def build_square_table(directory, workers=None, rows_per_block=block_rows, blocks=None, start_method=None, report=None):
+
+    workers = workers or os.cpu_count() or 1
+    if rows_per_block < 1:
+        raise ValueError('rows_per_block must be at least 1, given %r' % (rows_per_block,))
+    total = -(-square_count // rows_per_block)
+    if blocks is not None:
+        blocks = list(blocks)
+        for block in blocks:
+            if not isinstance(block, (int, np.integer)) or not 0 <= block < total:
+                raise ValueError('blocks must be 0 to %d for rows_per_block %d, given %r' % (total - 1, rows_per_block, block))
+
+    os.makedirs(directory, exist_ok=True)
+    progress_path = os.path.join(directory, progress_file)
+    if os.path.exists(progress_path):
+        progress = np.load(progress_path)
+        if progress.size != total:
+            raise ValueError('table in %s was started with %d blocks, rows_per_block gives %d' % (directory, progress.size, total))
+    else:
+        # Table files are created sparse and filled in block by block
+        for name in table_files.values():
+            table = np.lib.format.open_memmap(os.path.join(directory, name), mode='w+', dtype=np.uint16, shape=(square_count, square_count))
+            del table
+        progress = np.zeros(total, dtype=np.uint8)
+        np.save(progress_path, progress)
+
+    todo = [block for block in (range(total) if blocks is None else blocks) if not progress[block]]
+    done = int(progress.sum())
+    if workers == 1 or len(todo) <= 1:
+        for block in todo:
+            _build_block(directory, block, rows_per_block)
+            done += 1
+            if report:
+                report(done, total)
+    else:
+        context = multiprocessing.get_context(start_method)
+        with ProcessPoolExecutor(min(workers, len(todo)), mp_context=context) as pool:
+            for block in pool.map(_build_block, [directory] * len(todo), todo, [rows_per_block] * len(todo)):
+                done += 1
+                if report:
+                    report(done, total)
+
+    return total - done
+
+
+# ====================================================================
+# Find the square keys of grid IDs or grid codes
+# Returns: Tuple of the key array (0 for invalid rows) and the valid mask
+def _square_keys(gl_ids):
+
+    if np.asarray(gl_ids).dtype.kind in ('u', 'i'):
+        pairs, lon_digits, lat_digits, valid, shape = pymaiden_batch.grid_code_digits_array(gl_ids)
+    else:
+        pairs, lon_digits, lat_digits, valid, shape = pymaiden_batch.grid_ID_digits_array(gl_ids)
+    valid = pairs >= 2
+    keys = np.where(valid, pymaiden_rollup.grid_keys(lon_digits, lat_digits, 2), 0)
+
+    return keys.reshape(shape), valid.reshape(shape)
+
+
+# ====================================================================
+# Read only view of a built square table
+class SquareTable:
+
+    # ====================================================================
+    # Input parameters: directory of build_square_table and partial, True to
+    #                   open a table that is not completely built
+    def __init__(self, directory, partial=False):
+
+        progress = np.load(os.path.join(directory, progress_file))
+        if not partial and not progress.all():
+            raise ValueError('square table in %s is incomplete, %d of %d blocks built' % (directory, progress.sum(), progress.size))
+        self.distance_table = np.load(os.path.join(directory, table_files['distance']), mmap_mode='r')
+        self.bearing_table = np.load(os.path.join(directory, table_files['bearing']), mmap_mode='r')
+
+    # ====================================================================
+    # Look up the distance or bearing between two grid squares
+    # Input parameters: Two grid IDs or packed grid codes of at least 4 characters
+    # Returns: Distance in km (int) or bearing in degrees, False for an invalid grid ID
+    def distance(self, gl_id1, gl_id2):
+
+        key1 = pymaiden_worked.grid_key(gl_id1, 2)
+        key2 = pymaiden_worked.grid_key(gl_id2, 2)
+        if key1 is None or key2 is None:
+            return False
+        return int(self.distance_table[key1, key2])
+
+    def bearing(self, gl_id1, gl_id2):
+
+        key1 = pymaiden_worked.grid_key(gl_id1, 2)
+        key2 = pymaiden_worked.grid_key(gl_id2, 2)
+        if key1 is None or key2 is None:
+            return False
+        return int(self.bearing_table[key1, key2]) / bearing_scale
+
+    # ====================================================================
+    # Look up distances or bearings between arrays of grid IDs or grid codes
+    # Input parameters: Arrays of grid IDs or grid codes. Arrays are broadcast together.
+    # Returns: float64 array of km or degrees. Pairs with an invalid grid ID are NaN.
+    def distance_array(self, gl_ids1, gl_ids2):
+        return self._lookup(self.distance_table, gl_ids1, gl_ids2, 1)
+
+    def bearing_array(self, gl_ids1, gl_ids2):
+        return self._lookup(self.bearing_table, gl_ids1, gl_ids2, bearing_scale)
+
+    def _lookup(self, table, gl_ids1, gl_ids2, scale):
+
+        keys1, valid1 = _square_keys(gl_ids1)
+        keys2, valid2 = _square_keys(gl_ids2)
+        keys1, keys2, valid1, valid2 = np.broadcast_arrays(keys1, keys2, valid1, valid2)
+        values = table[keys1, keys2] / scale
+
+        return np.where(valid1 & valid2, values, np.nan)
@@ -0,0 +1,261 @@
+'''
+This module tracks the grid squares worked in a log, e.g. for contest
+multipliers and award progress. A WorkedGrids set holds the grid squares of
+one precision. 2 and 4 character squares are kept in a bitmap of 324 or
+32,400 bits, deeper precisions in a sparse set of the squares worked.
+Grid IDs longer than the set's precision count for the square that holds them.
+
+Example:
+    worked = pymaiden_worked.WorkedGrids(4)
+    worked.add("FN31pr")
+    "FN31" in worked                    # True
+    needed = len(rover_log - worked)
+
+Bits and keys are in grid ID order, the same cell order as the dense
+arrays of pymaiden_rollup.
+
+Written by: Kevin Hallquist, WB7BGJ
+'''
+
+
+# ====================================================================
+# Module imports:
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_rollup
+
+
+# ====================================================================
+# Serialized form: magic, precision byte, then the bitmap bytes or the
+# sorted keys as little endian uint32 (uint64 for 10 characters)
+worked_magic = b'WG'
+
+
+# ====================================================================
+# Key of each character pair at each pair level, e.g. pair_keys[1]['31'] == 31
+pair_keys = [{chr(base + lon) + chr(base + lat): lon * divisions + lat
+              for lon in range(divisions) for lat in range(divisions)}
+             for divisions, base in zip(pymaiden.grid_code_divisions, pymaiden.grid_code_char_base)]
+pair_squares = [divisions**2 for divisions in pymaiden.grid_code_divisions]
+
+
+# ====================================================================
+# Find the key of a grid ID or grid code at a number of pairs
+# Returns: Key, the index of the grid square in grid ID order, or None for an
+#          invalid grid ID or code, or one less precise than pairs
+def grid_key(gl_id, pairs):
+
+    key = 0
+    if isinstance(gl_id, str):
+        # The pair lookups validate a grid ID of exactly this precision, longer ones
+        # are checked in full
+        if len(gl_id) < 2 * pairs or (len(gl_id) > 2 * pairs and not pymaiden.grid_location_valid_ID(gl_id)):
+            return None
+        for level in range(pairs):
+            pair_key = pair_keys[level].get(gl_id[2*level:2*level + 2])
+            if pair_key is None:
+                return None
+            key = key * pair_squares[level] + pair_key
+        return key
+
+    digits = pymaiden._grid_code_digits(int(gl_id))
+    if not digits or digits[0] < pairs:
+        return None
+    divisions = pymaiden.grid_code_divisions
+    for level in range(pairs):
+        key = (key * divisions[level] + digits[1][level]) * divisions[level] + digits[2][level]
+    return key
+
+
+# ====================================================================
+# Set of worked grid squares of one precision
+class WorkedGrids:
+
+    # ====================================================================
+    # Input parameters: precision, 2, 4, 6, 8 or 10, and optional grid IDs or grid codes to add
+    def __init__(self, precision=4, gl_ids=None):
+
+        pymaiden_batch._check_precision(precision)
+        self.precision = precision
+        self.pairs = precision // 2
+        self.dense = precision in pymaiden_rollup.dense_precisions
+        if self.dense:
+            self.bits = bytearray((pymaiden_rollup.level_squares[self.pairs] + 7) // 8)
+        else:
+            self.keys = set()
+        if gl_ids is not None:
+            self.update(gl_ids)
+
+    # ====================================================================
+    # Add a grid square
+    # Input parameter: Grid ID or packed grid code, at least as precise as the set
+    # Returns: True if the square was not worked before
+    def add(self, gl_id):
+
+        key = grid_key(gl_id, self.pairs)
+        if key is None:
+            raise ValueError('invalid grid ID for a %d character set: %r' % (self.precision, gl_id))
+
+        if self.dense:
+            bit = 1 << (key & 7)
+            new = not self.bits[key >> 3] & bit
+            self.bits[key >> 3] |= bit
+            return new
+        new = key not in self.keys
+        self.keys.add(key)
+        return new
+
+    # ====================================================================
+    # Check if a grid square is worked
+    # Input parameter: Grid ID or packed grid code
+    # Returns: True if worked, False if not or for an invalid grid ID
+    def test(self, gl_id):
+
+        key = grid_key(gl_id, self.pairs)
+        if key is None:
+            return False
+        if self.dense:
+            return bool(self.bits[key >> 3] & (1 << (key & 7)))
+        return key in self.keys
+
+    __contains__ = test
+
+    # ====================================================================
+    # Find the keys of arrays of grid IDs or grid codes
+    # Returns: Tuple of the keys of the valid rows and the valid mask
+    def _keys_array(self, gl_ids):
+
+        if np.asarray(gl_ids).dtype.kind in ('u', 'i'):
+            pairs, lon_digits, lat_digits, valid, shape = pymaiden_batch.grid_code_digits_array(gl_ids)
+        else:
+            pairs, lon_digits, lat_digits, valid, shape = pymaiden_batch.grid_ID_digits_array(gl_ids)
+        valid = pairs >= self.pairs
+        keys = pymaiden_rollup.grid_keys([digits[valid] for digits in lon_digits], [digits[valid] for digits in lat_digits], self.pairs)
+
+        return keys, valid.reshape(shape)
+
+    # ====================================================================
+    # Add arrays of grid IDs or grid codes. Invalid and less precise rows are skipped.
+    # Returns: Boolean array, True for the rows added
+    def update(self, gl_ids):
+
+        keys, valid = self._keys_array(gl_ids)
+        if self.dense:
+            worked = self._worked_mask()
+            worked[keys] = True
+            self.bits = bytearray(np.packbits(worked, bitorder='little').tobytes())
+        else:
+            self.keys.update(keys.tolist())
+
+        return valid
+
+    # ====================================================================
+    # Check arrays of grid IDs or grid codes
+    # Returns: Boolean array, True for worked squares
+    def test_array(self, gl_ids):
+
+        keys, valid = self._keys_array(gl_ids)
+        if self.dense:
+            found = self._worked_mask()[keys]
+        else:
+            found = np.isin(keys, self._sorted_keys())
+        worked = np.zeros(valid.shape, dtype=bool)
+        worked[valid] = found
+
+        return worked
+
+    def _worked_mask(self):
+        return np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8), count=pymaiden_rollup.level_squares[self.pairs], bitorder='little').astype(bool)
+
+    def _sorted_keys(self):
+        return np.sort(np.fromiter(self.keys, dtype=np.int64, count=len(self.keys)))
+
+    # ====================================================================
+    # Number of worked squares and the worked squares in grid ID order
+    def __len__(self):
+
+        if self.dense:
+            return int(np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8)).sum())
+        return len(self.keys)
+
+    def grid_IDs(self, dtype='U'):
+
+        keys = np.flatnonzero(self._worked_mask()) if self.dense else self._sorted_keys()
+        return pymaiden_rollup.rollup_grid_IDs(self.precision, keys, dtype)
+
+    def __iter__(self):
+        return iter(self.grid_IDs().tolist())
+
+    def __repr__(self):
+        return 'WorkedGrids(%d, %d worked)' % (self.precision, len(self))
+
+    # ====================================================================
+    # Set operations between logs of the same precision
+    # Returns: New WorkedGrids set
+    def _combine(self, other, dense_op, sparse_op):
+
+        if not isinstance(other, WorkedGrids):
+            return NotImplemented
+        if other.precision != self.precision:
+            raise ValueError('precisions differ: %d and %d' % (self.precision, other.precision))
+
+        result = WorkedGrids(self.precision)
+        if self.dense:
+            result.bits = bytearray(dense_op(np.frombuffer(self.bits, dtype=np.uint8), np.frombuffer(other.bits, dtype=np.uint8)).tobytes())
+        else:
+            result.keys = sparse_op(self.keys, other.keys)
+        return result
+
+    def __or__(self, other):
+        return self._combine(other, np.bitwise_or, set.union)
+
+    def __and__(self, other):
+        return self._combine(other, np.bitwise_and, set.intersection)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b, set.difference)
+
+    union = __or__
+    intersection = __and__
+    difference = __sub__
+
+    def __eq__(self, other):
+        if not isinstance(other, WorkedGrids):
+            return NotImplemented
+        return self.precision == other.precision and (self.bits == other.bits if self.dense else self.keys == other.keys)
+
+    # ====================================================================
+    # Serialize to bytes and back
+    def to_bytes(self):
+
+        header = worked_magic + bytes((self.precision,))
+        if self.dense:
+            return header + bytes(self.bits)
+        return header + self._sorted_keys().astype(self._key_dtype(self.pairs)).tobytes()
+
+    @staticmethod
+    def _key_dtype(pairs):
+        return '<u4' if pymaiden_rollup.level_squares[pairs] <= 2**32 else '<u8'
+
+    @classmethod
+    def from_bytes(cls, data):
+
+        data = bytes(data)
+        if data[:2] != worked_magic or len(data) < 3:
+            raise ValueError('not a serialized WorkedGrids set')
+        worked = cls(data[2])
+        payload = data[3:]
+        if worked.dense:
+            if len(payload) != len(worked.bits):
+                raise ValueError('bitmap is %d bytes, expected %d' % (len(payload), len(worked.bits)))
+            worked.bits = bytearray(payload)
+        else:
+            dtype = np.dtype(cls._key_dtype(worked.pairs))
+            if len(payload) % dtype.itemsize:
+                raise ValueError('truncated key list')
+            keys = np.frombuffer(payload, dtype=dtype)
+            if keys.size and keys.max() >= pymaiden_rollup.level_squares[worked.pairs]:
+                raise ValueError('key out of range')
+            worked.keys = set(keys.tolist())
+        return worked
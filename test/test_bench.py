@@ -0,0 +1,54 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+
+import json
+import numpy as np
+import bench_pymaiden
+import pymaiden_parallel
+
+
+# -------------------------------------------------------------------
+# Synthetic data must be the same for the same seed so runs can be compared
+def test_generators_reproducible():
+    np.testing.assert_array_equal(bench_pymaiden.random_points(100)[1], bench_pymaiden.random_points(100)[1])
+    np.testing.assert_array_equal(bench_pymaiden.random_grid_IDs(50, 6), bench_pymaiden.random_grid_IDs(50, 6))
+    assert len(bench_pymaiden.random_spot_pairs(10)) == 4
+    assert not np.array_equal(bench_pymaiden.random_points(10, 1)[0], bench_pymaiden.random_points(10, 2)[0])
+
+
+# grid_location_size is timed on grid IDs that never share a cached row
+def test_distinct_row_grid_IDs():
+    gl_ids = bench_pymaiden.distinct_row_grid_IDs(5000)
+    assert len(set(gl_id[1::2] for gl_id in gl_ids.tolist())) == 5000
+
+
+def test_run_and_compare(monkeypatch):
+    # Parallel benchmarks are not run below parallel_workers elements, which
+    # depends on the host, so the test sets it
+    monkeypatch.setattr(bench_pymaiden, 'parallel_workers', 2)
+    run = bench_pymaiden.run_benchmarks(sizes=(1, 20), repeats=1)
+    names = set(result['name'] for result in run['results'])
+    parallel = sum(kind == 'parallel' for name, kind, setup in bench_pymaiden.benchmarks)
+    assert len(run['results']) == 2 * len(bench_pymaiden.benchmarks) - parallel
+    assert 'lat_lon_to_grid_ID' in names and 'lat_lon_to_grid_ID_parallel' in names
+    run = json.loads(json.dumps(run))
+    rows = bench_pymaiden.compare_runs(run, run)
+    assert len(rows) == len(run['results'])
+    assert all(row[-1] == 1.0 for row in rows)
+
+
+# Parallel benchmarks go through the process pool, also below the default chunk_rows
+def test_parallel_uses_pool(monkeypatch):
+    pools = []
+    class CountingPool(pymaiden_parallel.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(args)
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(pymaiden_parallel, 'ProcessPoolExecutor', CountingPool)
+    run = bench_pymaiden.run_benchmarks(sizes=(1000,), kinds=('parallel',), match='lat_lon_distance', repeats=1)
+    assert len(run['results']) == 1 and len(pools) == 1
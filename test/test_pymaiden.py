@@ -6,7 +6,9 @@ pymaiden_path = test_path.removesuffix('\\test')
 sys.path.insert(0, pymaiden_path)
 
 import pymaiden 
+import math
 import pytest
+import subprocess
 
 # Location data used:
 # Tokyo, Japan, NE : 35.6815740250241, 139.76715986657285, PM95vq23BN
@@ -23,7 +25,9 @@ grid_loc_ID_valid_testlist = [("DN",True),("dn",False),("Dn",False),("dN",False)
                               ("DN55ic",True),("DN55Ic",False),("DN55iC",False),("DN55IC",False), # Thrid pair group must be all lower case
                               ("DN55ax",True),("DN55ay",False),("DN55az",False), # Thrid pair group with lower case letter between a to x (24 Ranges)
                               ("DN55ax55",True),("DN55ax09",True),("DN55az0A",False), ("DN55azA9",False), ("DN55axAz",False), # Fourth pair group must numbers 0 through 9
-                              ("DN55ax55",True),("DN55ax09",True),("DN55az0A",False), ("DN55azA9",False), ("DN55axAz",False)] # Fifth pair group with capital letter range between A to X (24 Ranges)
+                              ("DN55ax55",True),("DN55ax09",True),("DN55az0A",False), ("DN55azA9",False), ("DN55axAz",False), # Fifth pair group with capital letter range between A to X (24 Ranges)
+                              ("DN55ax55AX",True),("DN55ax55SA",True),("DN55ax55AY",False),("DN55ax55aa",False), # Fifth pair group
+                              ("",False),("D",False),("DN5",False),("DN55ax55AXA",False),("DN55ax55AX\n",False),("DN\n",False),("DN55é5",False),("ŃN",False)] # Length and non-ASCII characters
 @pytest.mark.parametrize("gridID, result", grid_loc_ID_valid_testlist)
 def test_grid_loc_ID_valid(gridID, result):
     assert result == pymaiden.grid_location_valid_ID(gridID)
@@ -158,3 +162,269 @@ test_GridLocSize_testlist = [("FN31pr21ON", {'sqmi': 0.0002151300054755712, 'sqk
 @pytest.mark.parametrize("gl_id, size", test_GridLocSize_testlist)
 def test_GridLocSize(gl_id, size):
     assert size == pymaiden.grid_location_size(gl_id)
+
+
+# -------------------------------------------------------------------
+# Packed grid code tests
+grid_code_testlist = [("FN", (1 << 40) | (5*57600 << 20) | (13*57600)),
+                      ("FN31pr21ON", None),
+                      ("AA00aa00AA", (5 << 40)),
+                      ("RR99xx99XX", (5 << 40) | (1036799 << 20) | 1036799),
+                      ("PM95vq23BN", None),
+                      ("JJ00aa", None)]
+@pytest.mark.parametrize("gl_id, code", grid_code_testlist)
+def test_pack_grid_ID(gl_id, code):
+    packed = pymaiden.pack_grid_ID(gl_id)
+    if code is not None:
+        assert packed == code
+    assert packed < 2**64
+    assert pymaiden.unpack_grid_ID(packed) == gl_id
+    assert pymaiden.grid_location_ID_bounds(packed) == pymaiden.grid_location_ID_bounds(gl_id)
+
+
+@pytest.mark.parametrize("gl_id", ["", "fn", "FN3", "FN31pr21ONX", "FN31ay"])
+def test_pack_grid_ID_invalid(gl_id):
+    assert pymaiden.pack_grid_ID(gl_id) == False
+
+
+@pytest.mark.parametrize("code", [0, 1, 6 << 40, (1 << 40) | 1, (2 << 40) | (1036800 << 20)])
+def test_unpack_grid_ID_invalid(code):
+    assert pymaiden.unpack_grid_ID(code) == False
+    assert pymaiden.grid_location_ID_bounds(code) == False
+
+
+lat_lon_to_grid_code_testlist = [(35.6815740250241, 139.76715986657285, 10, "PM95vq23BN"),
+                                 (40.75065390774735, -73.99349806969549, 8, "FN30as00"),
+                                 (-31.949433295017, 115.8602175557753, 6, "OF78wb"),
+                                 (-33.45302146354265, -70.67975036211871, 4, "FF46"),
+                                 (0, 0, 2, "JJ")]
+@pytest.mark.parametrize("lat, lon, precision, gl_id", lat_lon_to_grid_code_testlist)
+def test_lat_lon_to_grid_code(lat, lon, precision, gl_id):
+    assert pymaiden.lat_lon_to_grid_code(lat, lon, precision) == pymaiden.pack_grid_ID(gl_id)
+
+
+# Grid codes unpack to the grid IDs of lat_lon_to_grid_ID, including on square boundaries
+@pytest.mark.parametrize("lat, lon", [(-63.85, -127.7), (0.3, 0.3), (-0.3, 12.35), (45.125, -93.2),
+                                      (math.nextafter(90, 0), math.nextafter(180, 0)), (math.nextafter(-90, 0), -179.99)])
+@pytest.mark.parametrize("precision", [2, 4, 6, 8, 10])
+def test_lat_lon_to_grid_code_matches_grid_ID(lat, lon, precision):
+    code = pymaiden.lat_lon_to_grid_code(lat, lon, precision)
+    assert pymaiden.unpack_grid_ID(code) == pymaiden.lat_lon_to_grid_ID(lat, lon)[:precision]
+
+
+@pytest.mark.parametrize("precision", [0, 3, 12, -2])
+def test_lat_lon_to_grid_code_bad_precision(precision, capsys):
+    assert pymaiden.lat_lon_to_grid_code(10, 10, precision) is False
+    assert pymaiden.error_messages[pymaiden.precision_error] in capsys.readouterr().out
+    assert pymaiden.lat_lon_to_grid_code(10, 10, precision, errors='nan') == 0
+    with pytest.raises(pymaiden.InputError) as error:
+        pymaiden.lat_lon_to_grid_code(10, 10, precision, errors='raise')
+    assert error.value.code == pymaiden.precision_error and error.value.value == precision
+
+
+# -------------------------------------------------------------------
+# Grid size cache tests
+def test_GridLocSize_cache_by_row():
+    pymaiden.grid_size_cache.clear()
+    first = pymaiden.grid_location_size("FN31pr")
+    # Same precision and latitude row, different longitude
+    assert pymaiden.grid_location_size("AN01ar") == first
+    assert pymaiden._grid_location_size("AN01ar") == pytest.approx(first, rel=1e-12)
+    assert len(pymaiden.grid_size_cache) == 1
+    # Grid codes share the row key of their grid ID
+    assert pymaiden.grid_location_size(pymaiden.pack_grid_ID("RN91xr")) == first
+    assert len(pymaiden.grid_size_cache) == 1
+
+
+def test_GridLocSize_cache_eviction(monkeypatch):
+    monkeypatch.setattr(pymaiden, "grid_size_cache_max", 3)
+    pymaiden.grid_size_cache.clear()
+    for gl_id in ["FN31", "FN32", "FN33", "FN34"]:
+        pymaiden.grid_location_size(gl_id)
+    assert list(pymaiden.grid_size_cache) == [(2, pymaiden.pack_grid_ID(gl_id) & pymaiden.grid_code_cell_mask) for gl_id in ["FN32", "FN33", "FN34"]]
+
+
+# Invalid grid IDs and codes raise before the cache is read, also when a valid
+# grid ID of the same row is cached
+@pytest.mark.parametrize("gl_id", ['ZN31', 'fN31', 'FNx1', 'FN3', '', 'FN31\n', 0, 6 << 40])
+def test_GridLocSize_invalid(gl_id):
+    pymaiden.grid_size_cache.clear()
+    pymaiden.grid_location_size('FN31')
+    with pytest.raises(ValueError):
+        pymaiden.grid_location_size(gl_id)
+    assert len(pymaiden.grid_size_cache) == 1
+
+
+# -------------------------------------------------------------------
+# WGS84 earth model tests
+wgs84_distance_testlist = [("FN31pr", "KI88jr", 11715.328853762046), # Newington, CT to Nairobi, Kenya
+                           ("JJ00aa00AA", "JJ00aa00AA", 0.0)]
+@pytest.mark.parametrize("gl_id1, gl_id2, km", wgs84_distance_testlist)
+def test_GridLocDistance_wgs84(gl_id1, gl_id2, km):
+    distance = pymaiden.grid_location_distance(gl_id1, gl_id2, model='wgs84')
+    assert distance['km'] == pytest.approx(km, abs=1e-6)
+    assert distance['smi'] == pytest.approx(distance['km'] / 1.609344)
+    assert distance['nmi'] == pytest.approx(distance['km'] / 1.852)
+
+
+def test_AngleFromGridLocIDs_wgs84():
+    assert pymaiden.angle_from_grid_location_IDs("FN31pr", "KI88jr", model='wgs84') == 78
+    assert pymaiden.angle_from_grid_location_IDs("PM95vq23BN", "FN30as00SD", model='wgs84') == 25
+
+
+def test_earth_model_invalid():
+    with pytest.raises(ValueError):
+        pymaiden.grid_location_distance("FN31pr", "KI88jr", model='flat')
+
+
+# -------------------------------------------------------------------
+# Grid square neighbor tests
+grid_neighbors_testlist = [("FN31pr", ['FN31ps', 'FN31qs', 'FN31qr', 'FN31qq', 'FN31pq', 'FN31oq', 'FN31or', 'FN31os']),
+                           ("AA", ['AB', 'BB', 'BA', 'RA', 'RB']), # Wraps west, clamped at the south pole
+                           ("RR", ['AR', 'AQ', 'RQ', 'QQ', 'QR']), # Wraps east, clamped at the north pole
+                           ("JJ00aa00AA", ['JJ00aa00AB', 'JJ00aa00BB', 'JJ00aa00BA', 'JI09ax09BX', 'JI09ax09AX',
+                                           'II99xx99XX', 'IJ90xa90XA', 'IJ90xa90XB']),
+                           ("FN3", False)]
+@pytest.mark.parametrize("gl_id, result", grid_neighbors_testlist)
+def test_grid_location_neighbors(gl_id, result):
+    assert pymaiden.grid_location_neighbors(gl_id) == result
+
+
+def test_grid_location_neighbors_code():
+    neighbors = pymaiden.grid_location_neighbors(pymaiden.pack_grid_ID("RR"))
+    assert [pymaiden.unpack_grid_ID(code) for code in neighbors] == ['AR', 'AQ', 'RQ', 'QQ', 'QR']
+    assert pymaiden.grid_location_neighbors(0) == False
+
+
+grid_k_ring_testlist = [("FN31", 0, ['FN31']),
+                        ("FN31", 1, ['FN20', 'FN30', 'FN40', 'FN21', 'FN31', 'FN41', 'FN22', 'FN32', 'FN42']),
+                        ("JA", 1, ['IA', 'JA', 'KA', 'IB', 'JB', 'KB']),
+                        ("RR99", 1, ['RR88', 'RR98', 'AR08', 'RR89', 'RR99', 'AR09'])] # Wraps east, clamped at the north pole
+@pytest.mark.parametrize("gl_id, k, result", grid_k_ring_testlist)
+def test_grid_location_k_ring(gl_id, k, result):
+    assert pymaiden.grid_location_k_ring(gl_id, k) == result
+
+
+def test_grid_location_k_ring_wraps_once():
+    # 18 Fields around the globe, a ring of 2*9+1 columns must not repeat any
+    ring = pymaiden.grid_location_k_ring("JJ", 9)
+    assert len(ring) == len(set(ring)) == 18 * 18
+    assert pymaiden.grid_location_k_ring("zz", 1) == False
+    with pytest.raises(ValueError):
+        pymaiden.grid_location_k_ring("JJ", -1)
+
+
+# -------------------------------------------------------------------
+# Import time budget. The scalar encode, validate and distance path must not
+# load numpy or pyproj. Each run is a fresh interpreter; the first one writes
+# the bytecode cache and the best of the rest is checked against the budget.
+import_budget_ms = 20
+import_check = """
+import sys, time
+start = time.perf_counter()
+import pymaiden
+elapsed = time.perf_counter() - start
+pymaiden.lat_lon_to_grid_ID(41.714, -72.728)
+pymaiden.grid_location_valid_ID("FN31pr")
+pymaiden.grid_location_distance("FN31pr", "JO62qm")
+pymaiden.pack_grid_ID("FN31pr")
+print(elapsed * 1000, 'numpy' in sys.modules, 'pyproj' in sys.modules)
+"""
+
+def test_import_time():
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    runs = []
+    for run in range(4):
+        output = subprocess.run([sys.executable, '-c', import_check], cwd=os.path.dirname(os.path.abspath(pymaiden.__file__)), env=env,
+                                capture_output=True, text=True, check=True).stdout.split()
+        assert output[1:] == ['False', 'False']
+        runs.append(float(output[0]))
+    assert min(runs[1:]) < import_budget_ms
+
+
+# -------------------------------------------------------------------
+# gridtables byte indexed degree tables hold the dict values converted to degrees
+def test_gridtables_degrees():
+    import gridtables
+    lon_dicts = (gridtables.lon_field, gridtables.lon_square, gridtables.lon_subsquare, gridtables.lon_extendedsquare, gridtables.lon_supextsquare)
+    lat_dicts = (gridtables.lat_field, gridtables.lat_square, gridtables.lat_subsquare, gridtables.lat_extendedsquare, gridtables.lat_supextsquare)
+    per_degree = (1, 1, 60, 3600, 3600)
+    for level in range(5):
+        assert len(lon_dicts[level]) == len(gridtables.pair_chars[level])
+        for c in gridtables.pair_chars[level]:
+            assert gridtables.lon_degrees[level][ord(c)] == lon_dicts[level][c] / per_degree[level]
+            assert gridtables.lat_degrees[level][ord(c)] == lat_dicts[level][c] / per_degree[level]
+        assert sum(value is not None for value in gridtables.lon_degrees[level]) == len(lon_dicts[level])
+    assert gridtables.lat_field['R'] == 80 and gridtables.lon_subsquare['x'] == 115 and gridtables.lat_supextsquare['X'] == 14.375
+
+
+# -------------------------------------------------------------------
+# Characters outside their pair level raise the KeyError of the character dictionaries
+@pytest.mark.parametrize("gl_id", ['zz', 'FN3z', 'FNé1', 'FN31PR00aa', 'FN31pr00az', 'FN\x001', 'FN31\x00r', 'FN31pr\x00\x00'])
+def test_GridLocBoundsBadChars(gl_id):
+    with pytest.raises(KeyError):
+        pymaiden.grid_location_ID_bounds(gl_id)
+
+
+# -------------------------------------------------------------------
+# Out of range input is handled as the errors mode asks for, without printing
+@pytest.mark.parametrize("function, args, code, fill", [
+    (pymaiden.lat_lon_to_grid_ID, (95, 0), pymaiden.lat_error, ''),
+    (pymaiden.lat_lon_to_grid_ID, (0, 180), pymaiden.lon_error, ''),
+    (pymaiden.lat_lon_to_grid_code, (float('nan'), 0), pymaiden.lat_error, 0),
+    (pymaiden.lat_lon_distance, (0, 0, 0, -181), pymaiden.end_lon_error, {'km': math.nan, 'smi': math.nan, 'nmi': math.nan}),
+    (pymaiden.lat_lon_distance, (0, 200, 95, 0), pymaiden.lon_error, {'km': math.nan, 'smi': math.nan, 'nmi': math.nan}),
+    (pymaiden.angle_from_coordinates, (0, 0, -91, 0), pymaiden.end_lat_error, math.nan),
+    ])
+def test_error_modes(function, args, code, fill, capsys):
+    kwargs = {'precision': 4} if function is pymaiden.lat_lon_to_grid_code else {}
+    assert function(*args, **kwargs, errors='mask') is False
+    assert repr(function(*args, **kwargs, errors='nan')) == repr(fill)
+    with pytest.raises(pymaiden.InputError) as error:
+        function(*args, **kwargs, errors='raise')
+    assert error.value.code == code and error.value.function == function.__name__
+    assert capsys.readouterr().out == ''
+
+    log = pymaiden.ErrorLog()
+    assert repr(function(*args, **kwargs, errors=log)) == repr(fill)
+    assert list(log.entries) == [(function.__name__, code, None)] and log.counts() == {code: 1}
+    pymaiden.error_log.clear()
+    function(*args, **kwargs, errors='collect')
+    assert len(pymaiden.error_log) == 1
+    pymaiden.error_log.clear()
+
+    assert function(*args, **kwargs) is False
+    assert pymaiden.print_messages[code] in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        function(*args, **kwargs, errors='ignore')
+
+
+# The 'print' mode prints the messages the functions always printed, also for the end point
+def test_print_messages(capsys):
+    pymaiden.lat_lon_distance(0, 0, 95, 0)
+    assert capsys.readouterr().out == 'latitude must be -90<=lat<90, given 95.000000\n\n'
+    pymaiden.angle_from_coordinates(0, 0, 0, 200)
+    assert capsys.readouterr().out == 'longitude must be -180<=lon<180, given 200.000000\n\n'
+
+
+# A bad errors mode is rejected also when the input is in range
+@pytest.mark.parametrize("function, args", [
+    (pymaiden.lat_lon_to_grid_ID, (0, 0)),
+    (pymaiden.lat_lon_to_grid_code, (0, 0)),
+    (pymaiden.lat_lon_distance, (0, 0, 1, 1)),
+    (pymaiden.angle_from_coordinates, (0, 0, 1, 1)),
+    ])
+def test_bad_errors_mode(function, args):
+    with pytest.raises(ValueError):
+        function(*args, errors='bogus')
+
+
+# ErrorLogs keep only their last maxlen calls
+def test_error_log_maxlen():
+    assert pymaiden.error_log.entries.maxlen == pymaiden.error_log_max
+    log = pymaiden.ErrorLog(maxlen=3)
+    for lat in range(91, 96):
+        pymaiden.lat_lon_to_grid_ID(lat, 0, errors=log)
+    assert len(log) == 3 and log.counts() == {pymaiden.lat_error: 3}
+    assert pymaiden.ErrorLog(maxlen=None).entries.maxlen is None
@@ -0,0 +1,363 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pytest
+
+# Location data used:
+# Tokyo, Japan, NE : 35.6815740250241, 139.76715986657285, PM95vq23BN
+# New York City, USA, NW : 40.75065390774735, -73.99349806969549, FN30as00SD
+# Perth, Australia, SE : -31.949433295017, 115.8602175557753, OF78wb32FD
+# Santiago, Chile, SW : -33.45302146354265, -70.67975036211871, FF46pn81KG
+lats = np.array([35.6815740250241, 40.75065390774735, -31.949433295017, -33.45302146354265, 0, 0, 90])
+lons = np.array([139.76715986657285, -73.99349806969549, 115.8602175557753, -70.67975036211871, 0, 180, 0])
+
+
+# -------------------------------------------------------------------
+# Lat/Lat array to Grid ID array tests
+lat_lon_to_grid_ID_array_testlist = [(10, 'S', [b'PM95vq23BN', b'FN30as00SD', b'OF78wb32FD', b'FF46pn81KG', b'JJ00aa00AA', b'', b'']),
+                                     (10, 'U', ['PM95vq23BN', 'FN30as00SD', 'OF78wb32FD', 'FF46pn81KG', 'JJ00aa00AA', '', '']),
+                                     (6, 'U', ['PM95vq', 'FN30as', 'OF78wb', 'FF46pn', 'JJ00aa', '', '']),
+                                     (2, 'S', [b'PM', b'FN', b'OF', b'FF', b'JJ', b'', b''])]
+@pytest.mark.parametrize("precision, dtype, result", lat_lon_to_grid_ID_array_testlist)
+def test_lat_lon_to_grid_ID_array(precision, dtype, result):
+    grid_IDs, valid = pymaiden_batch.lat_lon_to_grid_ID_array(lats, lons, precision, dtype)
+    assert grid_IDs.tolist() == result
+    assert valid.tolist() == [True, True, True, True, True, False, False]
+
+
+def test_lat_lon_to_grid_ID_array_matches_scalar():
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(-90, 90, 10000)
+    lon = rng.uniform(-180, 180, 10000)
+    grid_IDs, valid = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, dtype='U')
+    assert valid.all()
+    assert grid_IDs.tolist() == [pymaiden.lat_lon_to_grid_ID(a, o) for a, o in zip(lat, lon)]
+
+
+def _boundary_values(rng, limit, cells, size):
+    # Round decimal values, Super extended square boundaries and the floats on
+    # either side of them, and the floats just inside the range
+    values = [np.round(rng.uniform(-limit, limit, size), decimals) for decimals in range(0, 6)]
+    edges = rng.integers(1, cells, size) * (2 * limit / cells) - limit
+    values += [edges, np.nextafter(edges, -np.inf), np.nextafter(edges, np.inf)]
+    values.append(np.array([np.nextafter(-limit, 0), np.nextafter(limit, 0), 0.3, -0.3]))
+    values = np.concatenate(values)
+    return rng.permutation(values[(values > -limit) & (values < limit)])
+
+
+def test_lat_lon_to_grid_ID_array_matches_scalar_boundaries():
+    rng = np.random.default_rng(2)
+    lat = _boundary_values(rng, 90, pymaiden.grid_code_cells, 2000)
+    lon = _boundary_values(rng, 180, pymaiden.grid_code_cells, 2000)
+    lat, lon = np.append(lat[:lon.size], -63.85), np.append(lon[:lat.size], -127.7)
+    grid_IDs, valid = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, dtype='U')
+    assert valid.all()
+    assert grid_IDs.tolist() == [pymaiden.lat_lon_to_grid_ID(a, o) for a, o in zip(lat.tolist(), lon.tolist())]
+    assert grid_IDs[-1] == 'CC66dd55XX'
+
+
+# -------------------------------------------------------------------
+# Grid ID array validation tests
+grid_location_valid_ID_array_testlist = ["DN", "dn", "AS", "DN55", "DN0A", "DN55ax", "DN55ay", "DN55ax09", "DN55az0A",
+                                         "DN55ax55AX", "DN55ax55AY", "", "D", "DN5", "DN55ax55AXA", "DN\n", "DN55é5", "ŃN"]
+@pytest.mark.parametrize("gl_ids", [grid_location_valid_ID_array_testlist,
+                                    np.array(grid_location_valid_ID_array_testlist),
+                                    np.array(grid_location_valid_ID_array_testlist, dtype='>U12'),
+                                    np.array(grid_location_valid_ID_array_testlist, dtype=object)])
+def test_grid_location_valid_ID_array(gl_ids):
+    valid, precision = pymaiden_batch.grid_location_valid_ID_array(gl_ids)
+    expected = [pymaiden.grid_location_valid_ID(gl_id) for gl_id in grid_location_valid_ID_array_testlist]
+    assert valid.tolist() == expected
+    assert precision.tolist() == [len(gl_id) if ok else 0 for gl_id, ok in zip(grid_location_valid_ID_array_testlist, expected)]
+
+
+def test_grid_location_valid_ID_array_bytes():
+    gl_ids = np.array([b"FN31pr", b"FN31p", b"FN31PR", b"JJ00aa00AA"]).reshape(2, 2)
+    valid, precision = pymaiden_batch.grid_location_valid_ID_array(gl_ids)
+    assert valid.tolist() == [[True, False], [False, True]]
+    assert precision.tolist() == [[6, 0], [0, 10]]
+
+
+# NumPy drops trailing NULs from string arrays, so NULs are found in the list
+nul_grid_IDs = ['RA\x00', 'FN31pr\x00\x00', 'FN\x001', '\x00', 'FN31pr', 'JO62', '']
+
+@pytest.mark.parametrize("gl_ids", [
+    nul_grid_IDs,
+    [gl_id.encode() for gl_id in nul_grid_IDs],
+    nul_grid_IDs[:-1] + [b''],
+    np.array(nul_grid_IDs, dtype=object),
+    [nul_grid_IDs[:-1] + ['FN31pr00AA\x00', 'FN3\u0100']],
+    ])
+def test_grid_location_valid_ID_array_NUL(gl_ids):
+    valid, precision = pymaiden_batch.grid_location_valid_ID_array(gl_ids)
+    expected = [pymaiden.grid_location_valid_ID(gl_id.decode() if isinstance(gl_id, bytes) else gl_id)
+                for gl_id in np.ravel(np.array(gl_ids, dtype=object)).tolist()]
+    assert valid.ravel().tolist() == expected
+    assert valid.shape == np.shape(np.array(gl_ids, dtype=object))
+
+
+def test_grid_location_valid_ID_array_random():
+    # Random grid IDs of random length with one character replaced in half of them
+    rng = np.random.default_rng(5)
+    grid_IDs = pymaiden_batch.lat_lon_to_grid_ID_array(rng.uniform(-90, 90, 5000), rng.uniform(-180, 180, 5000))[0]
+    chars = grid_IDs.view(np.uint8).reshape(5000, 10).copy()
+    alphabet = np.frombuffer(b"ADRSX09ax yz", dtype=np.uint8)
+    rows = np.arange(0, 5000, 2)
+    chars[rows, rng.integers(0, 10, rows.size)] = alphabet[rng.integers(0, alphabet.size, rows.size)]
+    gl_ids = [gl_id[:length] for gl_id, length in zip(chars.view('S10').ravel().tolist(), rng.integers(1, 6, 5000) * 2)]
+    valid, precision = pymaiden_batch.grid_location_valid_ID_array(gl_ids)
+    assert valid.tolist() == [pymaiden.grid_location_valid_ID(gl_id.decode()) for gl_id in gl_ids]
+    assert 2000 < valid.sum() < 5000
+
+
+# -------------------------------------------------------------------
+# Grid ID array location boundaries tests
+grid_location_ID_bounds_array_testlist = ["FN", "FN31", "FN31pr", "FN31pr21", "FN31pr21ON"]
+def test_grid_location_ID_bounds_array():
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array(grid_location_ID_bounds_array_testlist)
+    assert valid.all()
+    for gl_id, record in zip(grid_location_ID_bounds_array_testlist, bounds):
+        result = pymaiden.grid_location_ID_bounds(gl_id)
+        assert record['precision'] == len(gl_id)
+        assert (record['sw_lat'], record['sw_lon']) == (result['SW']['lat'], result['SW']['lon'])
+        assert (record['cen_lat'], record['cen_lon']) == (result['CEN']['lat'], result['CEN']['lon'])
+        assert (record['sw_lat'] + record['dlat'], record['sw_lon'] + record['dlon']) == (result['NE']['lat'], result['NE']['lon'])
+
+
+grid_location_ID_bounds_array_invalid_testlist = [["fn31", "FN3", "", "FN31pr21ONX", "FN31pr2é", "FN31ay"],
+                                                  [b"fn31", b"FN3", b"", b"FN31pr21ONX"]]
+@pytest.mark.parametrize("gl_ids", grid_location_ID_bounds_array_invalid_testlist)
+def test_grid_location_ID_bounds_array_invalid(gl_ids):
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array(gl_ids)
+    assert not valid.any()
+    assert np.isnan(bounds['cen_lat']).all()
+    assert (bounds['precision'] == 0).all()
+
+
+def test_grid_location_ID_bounds_array_roundtrip():
+    rng = np.random.default_rng(2)
+    lat = rng.uniform(-90, 90, 10000)
+    lon = rng.uniform(-180, 180, 10000)
+    grid_IDs, valid = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon)
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array(grid_IDs)
+    assert valid.all()
+    assert ((bounds['sw_lat'] <= lat + 1e-9) & (lat < bounds['sw_lat'] + bounds['dlat'] + 1e-9)).all()
+    assert ((bounds['sw_lon'] <= lon + 1e-9) & (lon < bounds['sw_lon'] + bounds['dlon'] + 1e-9)).all()
+
+
+# -------------------------------------------------------------------
+# Distance between arrays of Lat/Lon locations tests
+@pytest.mark.parametrize("unit", ['km', 'smi', 'nmi'])
+def test_lat_lon_distance_array_matches_scalar(unit):
+    slat, slon = np.meshgrid(lats[:5], lons[:5], indexing='ij')
+    distance = pymaiden_batch.lat_lon_distance_array(slat, slon, lats[:5, None], lons[:5, None], unit)
+    for i in range(5):
+        for j in range(5):
+            if i == j:
+                # The scalar law of cosines formula can fail with a math domain error for identical points
+                assert distance[i, j] == 0
+                continue
+            result = pymaiden.lat_lon_distance(slat[i, j], slon[i, j], lats[i], lons[i])
+            assert distance[i, j] == pytest.approx(result[unit], abs=1e-6)
+
+
+lat_lon_distance_array_invalid_testlist = [(90.01, 0, 0, 0), (-90.01, 0, 0, 0), (0, 180.01, 0, 0), (0, -180.010, 0, 0),
+                                           (0, 0, 90.01, 0), (0, 0, -90.01, 0), (0, 0, 0, 180.01), (0, 0, 0, -180.01),
+                                           (np.nan, 0, 0, 0)]
+@pytest.mark.parametrize("slat1, slon1, elat2, elon2", lat_lon_distance_array_invalid_testlist)
+def test_lat_lon_distance_array_invalid(slat1, slon1, elat2, elon2):
+    assert np.isnan(pymaiden_batch.lat_lon_distance_array(slat1, slon1, elat2, elon2))
+
+
+def test_lat_lon_distance_array_short_path():
+    # Neighbouring 10 character squares along the equator, 1.25 seconds of longitude apart
+    distance = pymaiden_batch.lat_lon_distance_array(0, 0, 0, 1.25/3600)
+    assert distance == pytest.approx(pymaiden.kilometers * np.radians(1.25/3600), rel=1e-12)
+
+
+def test_grid_location_distance_array():
+    distance = pymaiden_batch.grid_location_distance_array(["PM95vq23BN", "FN30as00SD", "bad"], "FF46pn81KG", 'nmi')
+    assert distance[0] == pytest.approx(pymaiden.grid_location_distance("PM95vq23BN", "FF46pn81KG")['nmi'], abs=1e-6)
+    assert distance[1] == pytest.approx(pymaiden.grid_location_distance("FN30as00SD", "FF46pn81KG")['nmi'], abs=1e-6)
+    assert np.isnan(distance[2])
+
+
+# -------------------------------------------------------------------
+# Initial and back bearing between arrays of Lat/Lon locations tests
+def test_angle_from_coordinates_array_matches_scalar():
+    slat, slon = np.meshgrid(lats[:4], lons[:4], indexing='ij')
+    bearing, back_bearing = pymaiden_batch.angle_from_coordinates_array(slat, slon, lats[:4, None], lons[:4, None], rounded=True, back=True)
+    for i in range(4):
+        for j in range(4):
+            if i == j:
+                continue
+            assert bearing[i, j] == pymaiden.angle_from_coordinates(slat[i, j], slon[i, j], lats[i], lons[i])
+            assert back_bearing[i, j] == pymaiden.angle_from_coordinates(lats[i], lons[i], slat[i, j], slon[i, j])
+
+
+def test_angle_from_coordinates_array_float():
+    bearing = pymaiden_batch.angle_from_coordinates_array(0, 0, [1, 0, -1, 0, 91], [0, 1, 0, -1, 0])
+    assert bearing[:4] == pytest.approx([0, 90, 180, 270])
+    assert np.isnan(bearing[4])
+
+
+AngleFromGridLocIDs_array_testlist = [("PM95vq23BN", "FN30as00SD", 25), ("FN30as00SD", "PM95vq23BN", 333),
+                                      ("OF78wb32FD", "FF46pn81KG", 174), ("FF46pn81KG", "OF78wb32FD", 186)]
+def test_angle_from_grid_location_IDs_array():
+    gl_ids1, gl_ids2, angles = zip(*AngleFromGridLocIDs_array_testlist)
+    bearing = pymaiden_batch.angle_from_grid_location_IDs_array(list(gl_ids1), list(gl_ids2), rounded=True)
+    assert bearing.tolist() == list(angles)
+
+
+# -------------------------------------------------------------------
+# Distance and bearing matrix tests
+matrix_start_IDs = ["PM95vq23BN", "FN30as00SD", "OF78wb32FD", "FF46pn81KG", "FN31", "bad"]
+matrix_end_IDs = ["FN31pr", "KI88jr", "CN87uo", "JJ00aa00AA", "PM95"]
+@pytest.mark.parametrize("tile", [2, 512])
+def test_grid_location_distance_matrix(tile):
+    matrix = pymaiden_batch.grid_location_distance_matrix(matrix_start_IDs, matrix_end_IDs, 'smi', tile=tile)
+    result = pymaiden_batch.grid_location_distance_array(np.array(matrix_start_IDs)[:, None], matrix_end_IDs, 'smi')
+    np.testing.assert_allclose(matrix, result, rtol=1e-12)
+    assert np.isnan(matrix[5]).all()
+
+
+@pytest.mark.parametrize("tile", [3, 512])
+def test_angle_from_grid_location_IDs_matrix(tile):
+    matrix = pymaiden_batch.angle_from_grid_location_IDs_matrix(matrix_start_IDs, matrix_end_IDs, rounded=True, tile=tile)
+    result = pymaiden_batch.angle_from_grid_location_IDs_array(np.array(matrix_start_IDs)[:, None], matrix_end_IDs, rounded=True)
+    np.testing.assert_array_equal(matrix, result)
+
+
+def test_grid_location_distance_matrix_memmap(tmp_path):
+    out = np.lib.format.open_memmap(str(tmp_path / 'distance.npy'), mode='w+', dtype=np.float32, shape=(6, 5))
+    pymaiden_batch.grid_location_distance_matrix(matrix_start_IDs, matrix_end_IDs, out=out, tile=4)
+    out.flush()
+    result = pymaiden_batch.grid_location_distance_matrix(matrix_start_IDs, matrix_end_IDs)
+    np.testing.assert_allclose(np.load(str(tmp_path / 'distance.npy')), result, rtol=1e-6)
+    with pytest.raises(ValueError):
+        pymaiden_batch.grid_location_distance_matrix(matrix_start_IDs, matrix_end_IDs, out=np.empty((5, 6)))
+
+
+# -------------------------------------------------------------------
+# Packed grid code array tests
+grid_code_array_IDs = ["FN", "FN31", "FN31pr", "FN31pr21", "FN31pr21ON", "PM95vq23BN", "bad"]
+def test_pack_grid_ID_array():
+    codes, valid = pymaiden_batch.pack_grid_ID_array(grid_code_array_IDs)
+    assert codes.dtype == np.uint64
+    assert valid.tolist() == [True] * 6 + [False]
+    assert codes.tolist() == [pymaiden.pack_grid_ID(gl_id) or 0 for gl_id in grid_code_array_IDs]
+
+    grid_IDs, valid = pymaiden_batch.unpack_grid_ID_array(codes, 'U')
+    assert grid_IDs.tolist() == grid_code_array_IDs[:6] + ['']
+
+
+def test_grid_location_ID_bounds_array_from_codes():
+    codes, valid = pymaiden_batch.pack_grid_ID_array(grid_code_array_IDs)
+    from_codes, valid_codes = pymaiden_batch.grid_location_ID_bounds_array(codes)
+    from_IDs, valid_IDs = pymaiden_batch.grid_location_ID_bounds_array(grid_code_array_IDs)
+    assert valid_codes.tolist() == valid_IDs.tolist()
+    np.testing.assert_array_equal(from_codes['cen_lat'], from_IDs['cen_lat'])
+    np.testing.assert_array_equal(from_codes['sw_lon'], from_IDs['sw_lon'])
+
+
+def test_lat_lon_to_grid_code_array():
+    codes, valid = pymaiden_batch.lat_lon_to_grid_code_array(lats, lons, 6)
+    grid_IDs, valid_IDs = pymaiden_batch.lat_lon_to_grid_ID_array(lats, lons, 6)
+    assert valid.tolist() == valid_IDs.tolist()
+    assert codes.tolist() == pymaiden_batch.pack_grid_ID_array(grid_IDs)[0].tolist()
+
+
+# -------------------------------------------------------------------
+# WGS84 geodesic array tests
+def test_geodesic_inverse_array():
+    distance, azimuth, back_azimuth = pymaiden_batch.geodesic_inverse_array(0, 0, [0, 1, 91], [1, 0, 0])
+    assert distance[0] == pytest.approx(111.31949079327, abs=1e-9)
+    assert azimuth[:2].tolist() == [90, 0]
+    assert back_azimuth[:2].tolist() == [270, 180]
+    assert np.isnan([distance[2], azimuth[2], back_azimuth[2]]).all()
+
+
+def test_grid_location_distance_array_wgs84():
+    distance = pymaiden_batch.grid_location_distance_array(["FN31pr", "bad"], "KI88jr", 'smi', model='wgs84')
+    assert distance[0] == pytest.approx(pymaiden.grid_location_distance("FN31pr", "KI88jr", model='wgs84')['smi'])
+    assert np.isnan(distance[1])
+
+
+def test_angle_from_grid_location_IDs_array_wgs84():
+    gl_ids1, gl_ids2, angles = zip(*AngleFromGridLocIDs_array_testlist)
+    bearing = pymaiden_batch.angle_from_grid_location_IDs_array(list(gl_ids1), list(gl_ids2), rounded=True, model='wgs84')
+    assert bearing.tolist() == [pymaiden.angle_from_grid_location_IDs(a, b, model='wgs84') for a, b in zip(gl_ids1, gl_ids2)]
+
+
+# -------------------------------------------------------------------
+# Grid square neighbor array tests
+def test_grid_location_neighbors_array():
+    gl_ids = ["FN31pr", "AA", "RR", "JJ00aa00AA", "FN3", "RR99"]
+    neighbors, valid = pymaiden_batch.grid_location_neighbors_array(gl_ids)
+    assert neighbors.shape == (6, 8)
+    assert valid.tolist() == [True, True, True, True, False, True]
+    for gl_id, row in zip(gl_ids, neighbors):
+        result = pymaiden.grid_location_neighbors(gl_id)
+        assert [pymaiden.unpack_grid_ID(int(code)) for code in row if code] == (result or [])
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 9])
+def test_grid_location_k_ring_array(k):
+    rng = np.random.default_rng(k)
+    codes = np.concatenate([pymaiden_batch.lat_lon_to_grid_code_array(rng.uniform(-90, 90, 40), rng.uniform(-180, 180, 40), precision)[0]
+                            for precision in (2, 4, 6, 8, 10)])
+    codes = np.append(codes, np.array([pymaiden.pack_grid_ID("AA"), pymaiden.pack_grid_ID("RR99xx99XX"), 0], dtype=np.uint64)).reshape(-1, 1)
+    ring, valid = pymaiden_batch.grid_location_k_ring_array(codes, k)
+    assert ring.shape == (codes.size, 1, (2*k + 1)**2)
+    assert valid[:-1].all() and not valid[-1]
+    for code, row in zip(codes.ravel().tolist(), ring[:, 0]):
+        assert [int(square) for square in row if square] == (pymaiden.grid_location_k_ring(code, k) or [])
+
+
+# -------------------------------------------------------------------
+# Batch error modes give the same error codes as the scalar functions
+dirty_lats = np.array([[10, 95, np.nan], [-90, 45, 0]])
+dirty_lons = np.array([[20, 0, 0], [0, 200, -180]])
+
+@pytest.mark.parametrize("function, args, scalar", [
+    (pymaiden_batch.lat_lon_to_grid_ID_array, (dirty_lats, dirty_lons, 6), pymaiden.lat_lon_to_grid_ID),
+    (pymaiden_batch.lat_lon_to_grid_code_array, (dirty_lats, dirty_lons, 6), pymaiden.lat_lon_to_grid_code),
+    (pymaiden_batch.lat_lon_distance_array, (0, 0, dirty_lats, dirty_lons), pymaiden.lat_lon_distance),
+    (pymaiden_batch.geodesic_inverse_array, (0, 0, dirty_lats, dirty_lons), pymaiden.lat_lon_distance),
+    (pymaiden_batch.angle_from_coordinates_array, (dirty_lats, dirty_lons, 0, 0), pymaiden.angle_from_coordinates),
+    ])
+def test_batch_error_modes(function, args, scalar, capsys):
+    log = pymaiden.ErrorLog()
+    result = function(*args, errors=log)
+    function_name, codes, rows = log.entries[0]
+    assert function_name == function.__name__
+    points = args[:2] if len(args) == 3 else args
+    scalar_args = [np.broadcast_to(arg, dirty_lats.shape).ravel() for arg in points]
+    expected = []
+    for row, values in enumerate(zip(*scalar_args)):
+        try:
+            scalar(*map(float, values), errors='raise')
+        except pymaiden.InputError as error:
+            expected.append((row, error.code))
+    assert list(zip(rows.tolist(), codes.tolist())) == expected
+
+    assert repr(function(*args)) == repr(result)
+    with pytest.raises(pymaiden.InputError) as error:
+        function(*args, errors='raise')
+    assert (error.value.row, error.value.code, error.value.count) == (expected[0][0], expected[0][1], len(expected))
+    assert capsys.readouterr().out == ''
+    function(*args, errors='print')
+    assert capsys.readouterr().out.count('\n') == 2
+
+    masked = function(*args, errors='mask')
+    valid = masked[-1]
+    assert np.flatnonzero(~valid).tolist() == [row for row, code in expected]
+    with pytest.raises(ValueError):
+        function(*args, errors='skip')
@@ -0,0 +1,98 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import io
+import json
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_cli
+import pytest
+
+rng = np.random.default_rng(23)
+lat = rng.uniform(-90, 90, 500)
+lon = rng.uniform(-180, 180, 500)
+grid_IDs = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 10, 'U')[0].tolist()
+grid_IDs[7] = 'zz'
+grid_IDs[11] = ''
+
+
+def run_cli(tmp_path, argv, text):
+    in_file = tmp_path / 'in.txt'
+    out_file = tmp_path / 'out.txt'
+    in_file.write_text(text)
+    rows = pymaiden_cli.main(argv + [str(in_file), '-o', str(out_file)])
+    return rows, out_file.read_text()
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("workers, chunk", [(1, 100000), (1, 64), (2, 64)])
+def test_cli_commands(tmp_path, workers, chunk):
+    options = ['--workers', str(workers), '--chunk-rows', str(chunk)]
+
+    rows, text = run_cli(tmp_path, ['encode', '--precision', '6'] + options,
+                         ''.join('%r,%r\n' % point for point in zip(lat.tolist(), lon.tolist())) + '95 0\nbad\n')
+    assert rows == 502
+    assert text.split('\n')[:-1] == [pymaiden.lat_lon_to_grid_ID(*point)[:6] for point in zip(lat.tolist(), lon.tolist())] + ['', '']
+
+    rows, text = run_cli(tmp_path, ['validate'] + options, '\n'.join(grid_IDs) + '\n')
+    assert text.split('\n')[:-1] == [str(pymaiden.grid_location_valid_ID(gl_id)) for gl_id in grid_IDs]
+
+    rows, text = run_cli(tmp_path, ['decode', '--output-format', 'csv'] + options, '\n'.join(grid_IDs) + '\n')
+    bounds, valid = pymaiden_batch.grid_location_ID_bounds_array(grid_IDs)
+    for line, row_bounds, ok in zip(text.split('\n'), bounds.tolist(), valid.tolist()):
+        assert line == (','.join(map(repr, row_bounds[:6])) if ok else ',,,,,')
+
+    pairs = ''.join('%s %s\n' % pair for pair in zip(grid_IDs, grid_IDs[1:]))
+    rows, text = run_cli(tmp_path, ['distance', '--unit', 'nmi', '--float-format', '%.3f'] + options, pairs)
+    distance = pymaiden_batch.grid_location_distance_array(grid_IDs[:-1], grid_IDs[1:], 'nmi')
+    assert text.split('\n')[:-1] == ['' if np.isnan(value) else '%.3f' % value for value in distance.tolist()]
+
+    rows, text = run_cli(tmp_path, ['bearing', '--rounded'] + options, pairs)
+    bearing = pymaiden_batch.angle_from_grid_location_IDs_array(grid_IDs[:-1], grid_IDs[1:], rounded=True)
+    assert text.split('\n')[:-1] == ['' if np.isnan(value) else '%d' % value for value in bearing.tolist()]
+
+
+# -------------------------------------------------------------------
+def test_cli_csv_header(tmp_path):
+    text = 'id,tx_loc,rx_loc\n1,FN31pr,JO62qm\n2,"FN31",zz\n3\n'
+    rows, text = run_cli(tmp_path, ['distance', '--input-format', 'csv', '--header', '--columns', 'tx_loc,rx_loc',
+                                    '--keep', '--output-format', 'tsv', '--unit', 'smi', '--float-format', '%.1f'], text)
+    assert rows == 3
+    assert text.split('\n') == ['id\ttx_loc\trx_loc\tdistance', '1\tFN31pr\tJO62qm\t3869.1', '2\tFN31\tzz\t', '3\t', '']
+
+    rows, text = run_cli(tmp_path, ['bearing', '--input-format', 'tsv', '--columns', '2,0', '--output-format', 'jsonl', '--keep'],
+                         'JO62qm\tx\tFN31pr\nzz\tx\tFN31\n')
+    records = [json.loads(line) for line in text.split('\n')[:-1]]
+    assert records[0]['bearing'] == pytest.approx(pymaiden_batch.angle_from_grid_location_IDs_array(['FN31pr'], ['JO62qm'])[0])
+    assert records[0]['input'] == ['JO62qm', 'x', 'FN31pr']
+    assert records[1]['bearing'] is None
+
+
+# -------------------------------------------------------------------
+def test_cli_stdin(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('41.714775 -72.727260\n-33.9, 151.2\n'))
+    assert pymaiden_cli.main(['encode', '--precision', '4']) == 2
+    assert capsys.readouterr().out == 'FN31\nQF56\n'
+
+
+# Blank and short rows give an empty output row, also with negative column indexes
+def test_cli_short_rows_negative_column(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('FN31pr JO62qm\n\nFN31\nFN31 KI88\n'))
+    assert pymaiden_cli.main(['distance', '--columns', '0,-1']) == 4
+    lines = capsys.readouterr().out.split('\n')
+    assert len(lines) == 5 and lines[1] == '' and lines[4] == ''
+    assert float(lines[0]) == pytest.approx(pymaiden.grid_location_distance('FN31pr', 'JO62qm')['km'])
+    assert float(lines[3]) == pytest.approx(pymaiden.grid_location_distance('FN31', 'KI88')['km'])
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("argv", [['encode', '--columns', '0'], ['encode', '--workers', '0'], ['size']])
+def test_cli_bad_arguments(argv, monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''))
+    with pytest.raises(SystemExit):
+        pymaiden_cli.main(argv)
@@ -0,0 +1,112 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_cover
+import pytest
+
+# Every 4 character grid square and its corners
+square_IDs = pymaiden_batch.unpack_grid_ID_array(
+    pymaiden_batch.lat_lon_to_grid_code_array(*np.meshgrid(np.arange(-89.5, 90), np.arange(-179, 180, 2)), precision=4)[0].ravel(), 'U')[0]
+square_bounds = pymaiden_batch.grid_location_ID_bounds_array(square_IDs)[0]
+
+
+# -------------------------------------------------------------------
+# Radius cover tests
+radius_cover_testlist = [(41.71484375, -72.72829861111111, 100, 4, False, ['FN30', 'FN31', 'FN41', 'FN32', 'FN42']), # FN40 is just over 100 km away
+                         (41.71484375, -72.72829861111111, 100, 4, True, []),
+                         (41.71484375, -72.72829861111111, 0, 6, False, ['FN31pr']),
+                         (0.5, 179.9, 50, 4, False, ['RJ90', 'AJ00']), # Crosses the antimeridian
+                         (89.9, 0, 50, 2, False, [chr(c) + 'R' for c in range(ord('A'), ord('S'))])] # Covers the north pole
+@pytest.mark.parametrize("lat, lon, radius, precision, inside, result", radius_cover_testlist)
+def test_grid_location_radius_cover(lat, lon, radius, precision, inside, result):
+    assert list(pymaiden_cover.grid_location_radius_cover(lat, lon, radius, precision, inside=inside)) == result
+
+
+@pytest.mark.parametrize("lat, lon, radius", [(41.71, -72.73, 1500), (-33.45, -70.68, 3000), (-85.0, 120.0, 800), (10.0, -179.5, 2500)])
+def test_grid_location_radius_cover_brute_force(lat, lon, radius):
+    cover = list(pymaiden_cover.grid_location_radius_cover(lat, lon, radius))
+    inside = list(pymaiden_cover.grid_location_radius_cover(lat, lon, radius, inside=True))
+    assert len(cover) == len(set(cover))
+    assert set(inside) <= set(cover)
+
+    # Squares with their center in the circle are covered, squares with all
+    # corners in the circle are inside it
+    center = pymaiden_batch.lat_lon_distance_array(lat, lon, square_bounds['cen_lat'], square_bounds['cen_lon'])
+    corners = np.max([pymaiden_batch.lat_lon_distance_array(lat, lon, square_bounds['sw_lat'] + dlat, np.minimum(square_bounds['sw_lon'] + dlon, 180))
+                      for dlat in (0, square_bounds['dlat']) for dlon in (0, square_bounds['dlon'])], axis=0)
+    assert set(square_IDs[center < radius - 1e-6].tolist()) <= set(cover)
+    assert set(inside) == set(square_IDs[corners <= radius].tolist())
+
+
+def test_grid_location_radius_cover_codes():
+    gl_ids = pymaiden_cover.grid_location_radius_cover(-31.95, 115.86, 300, 6, unit='nmi')
+    codes = pymaiden_cover.grid_location_radius_cover(-31.95, 115.86, 300, 6, unit='nmi', codes=True)
+    assert [pymaiden.pack_grid_ID(gl_id) for gl_id in gl_ids] == list(codes)
+
+
+@pytest.mark.parametrize("lat, lon, radius, precision", [(91, 0, 10, 4), (0, 0, -1, 4), (0, 0, 10, 5)])
+def test_grid_location_radius_cover_invalid(lat, lon, radius, precision):
+    with pytest.raises(ValueError):
+        next(pymaiden_cover.grid_location_radius_cover(lat, lon, radius, precision))
+
+
+# -------------------------------------------------------------------
+# Box and polygon cover tests
+bbox_cover_testlist = [((40, -74, 42, -72), 4, False, ['FN30', 'FN31']), # Edges on square sides do not add neighbors
+                       ((40.5, -73.5, 41.5, -72.5), 4, False, ['FN30', 'FN31']),
+                       ((-1, 179, 1, -179), 4, False, ['RI99', 'AI09', 'RJ90', 'AJ00']), # Crosses the antimeridian
+                       ((40, -74, 42, -70), 6, True, ['FN30', 'FN40', 'FN31', 'FN41']),
+                       ((40, -74, 41.1, -72), 4, True, ['FN30', 'FN31'])]
+@pytest.mark.parametrize("bbox, precision, mixed, result", bbox_cover_testlist)
+def test_grid_location_bbox_cover(bbox, precision, mixed, result):
+    assert list(pymaiden_cover.grid_location_bbox_cover(*bbox, precision, mixed=mixed)) == result
+
+
+def test_grid_location_bbox_cover_globe():
+    assert len(list(pymaiden_cover.grid_location_bbox_cover(-90, -180, 90, 180, 4))) == 32400
+    assert len(list(pymaiden_cover.grid_location_bbox_cover(-90, -180, 90, 180, 10, mixed=True))) == 324
+
+
+def test_grid_location_bbox_cover_mixed():
+    # FN31 is entirely inside, the squares around it are cut by the box edges
+    cover = list(pymaiden_cover.grid_location_bbox_cover(40.9, -74.1, 42.1, -71.9, 6))
+    mixed = list(pymaiden_cover.grid_location_bbox_cover(40.9, -74.1, 42.1, -71.9, 6, mixed=True))
+    assert 'FN31' in mixed
+    assert len(cover) == len(set(cover)) == (24 + 2 * 2) * (24 + 3 * 2) # 0.1 degrees = 1.2 columns and 2.4 rows each side
+    assert sorted(gl_id for gl_id in cover if not gl_id.startswith('FN31')) == sorted(gl_id for gl_id in mixed if gl_id != 'FN31')
+
+
+polygon_cover_testlist = [([(40, -74), (42, -74), (40, -70)], 4, ['FN30', 'FN40', 'FN31']),
+                          ([(40, -74), (42, -74), (40, -70), (40, -74)], 4, ['FN30', 'FN40', 'FN31']), # Closed ring
+                          ([(-10, 170), (10, 170), (10, -170), (-10, -170)], 2, ['RI', 'AI', 'RJ', 'AJ']), # Crosses the antimeridian
+                          ([(0.5, 0.5), (0.7, 0.5), (0.5, 0.9)], 4, ['JJ00'])] # Inside one square
+@pytest.mark.parametrize("points, precision, result", polygon_cover_testlist)
+def test_grid_location_polygon_cover(points, precision, result):
+    assert list(pymaiden_cover.grid_location_polygon_cover(points, precision)) == result
+    codes = pymaiden_cover.grid_location_polygon_cover(points, precision, codes=True)
+    assert [pymaiden.unpack_grid_ID(code) for code in codes] == result
+
+
+def test_grid_location_polygon_cover_sampled():
+    # Every sampled point inside a concave polygon is in a covering square
+    points = [(41.0, -74.0), (42.5, -73.0), (41.2, -72.5), (42.4, -71.0), (40.6, -71.5)]
+    cover = set(pymaiden_cover.grid_location_polygon_cover(points, 6))
+    rng = np.random.default_rng(6)
+    lat = rng.uniform(40.6, 42.5, 20000)
+    lon = rng.uniform(-74, -71, 20000)
+    polygon = pymaiden_cover._polygon(points)
+    inside = [pymaiden_cover._point_in_polygon(x, y, polygon) for x, y in zip(lon, lat)]
+    assert set(pymaiden_batch.lat_lon_to_grid_ID_array(lat[inside], lon[inside], 6, 'U')[0].tolist()) <= cover
+
+
+@pytest.mark.parametrize("points", [[(40, -74), (42, -74)], [(91, 0), (0, 0), (0, 1)]])
+def test_grid_location_polygon_cover_invalid(points):
+    with pytest.raises(ValueError):
+        next(pymaiden_cover.grid_location_polygon_cover(points))
@@ -0,0 +1,90 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import math
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_cover
+import pymaiden_metrics
+import pytest
+
+
+@pytest.fixture
+def metrics():
+    pymaiden_metrics.reset()
+    pymaiden_metrics.enable()
+    yield pymaiden_metrics
+    pymaiden_metrics.disable()
+    pymaiden_metrics.reset()
+
+
+# -------------------------------------------------------------------
+def test_metrics_counts(metrics):
+    for i in range(5):
+        pymaiden.lat_lon_to_grid_ID(41.714775, -72.727260)
+    pymaiden.grid_location_distance('FN31pr', 'JO62qm')
+    pymaiden_batch.lat_lon_to_grid_ID_array(np.zeros(300), np.zeros(300), 6)
+    pymaiden_batch.lat_lon_distance_array(0, 0, np.zeros((4, 5)), [0] * 5)
+    squares = list(pymaiden_cover.grid_location_radius_cover(41.7, -72.7, 300))
+    with pytest.raises(pymaiden.InputError):
+        pymaiden.lat_lon_distance(95, 0, 0, 0, errors='raise')
+
+    stats = metrics.snapshot()
+    assert stats['pymaiden.lat_lon_to_grid_ID']['calls'] == 5
+    assert stats['pymaiden.lat_lon_to_grid_ID']['elements'] == 5
+    # Nested calls made through the module are recorded too
+    assert stats['pymaiden.grid_location_ID_bounds']['calls'] == 2
+    assert stats['pymaiden.lat_lon_distance']['calls'] == 2
+    assert stats['pymaiden.lat_lon_distance']['errors'] == 1
+    assert stats['pymaiden_batch.lat_lon_to_grid_ID_array']['elements'] == 300
+    assert stats['pymaiden_batch.lat_lon_distance_array']['elements'] == 20
+    assert stats['pymaiden_cover.grid_location_radius_cover']['calls'] == 1
+    assert stats['pymaiden_cover.grid_location_radius_cover']['elements'] == len(squares)
+    assert 'pymaiden.angle_from_coordinates' not in stats
+
+    for name, function_stats in stats.items():
+        histogram = function_stats['histogram']
+        assert sum(count for bound, count in histogram) == function_stats['calls']
+        assert histogram[-1][0] == math.inf
+        assert 0 < function_stats['max_seconds'] <= function_stats['total_seconds']
+        assert any(bound >= function_stats['max_seconds'] and count for bound, count in histogram)
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+    pymaiden.lat_lon_to_grid_ID(41.714775, -72.727260)
+    assert metrics.snapshot()['pymaiden.lat_lon_to_grid_ID']['calls'] == 1
+
+
+# -------------------------------------------------------------------
+def test_metrics_disable():
+    original = pymaiden.lat_lon_to_grid_ID
+    pymaiden_metrics.enable(['pymaiden'])
+    try:
+        assert pymaiden_metrics.is_enabled()
+        assert pymaiden.lat_lon_to_grid_ID is not original
+        assert pymaiden.lat_lon_to_grid_ID.__name__ == 'lat_lon_to_grid_ID'
+        assert pymaiden_batch.lat_lon_to_grid_ID_array.__module__ == 'pymaiden_batch'
+        pymaiden_metrics.enable(['pymaiden'])
+    finally:
+        pymaiden_metrics.disable()
+    assert not pymaiden_metrics.is_enabled()
+    assert pymaiden.lat_lon_to_grid_ID is original
+
+    pymaiden_metrics.reset()
+    pymaiden.lat_lon_to_grid_ID(41.714775, -72.727260)
+    assert pymaiden_metrics.snapshot() == {}
+
+
+# -------------------------------------------------------------------
+def test_metrics_generator_closed(metrics):
+    cover = pymaiden_cover.grid_location_radius_cover(41.7, -72.7, 300)
+    next(cover)
+    next(cover)
+    cover.close()
+    stats = metrics.snapshot()['pymaiden_cover.grid_location_radius_cover']
+    assert (stats['calls'], stats['elements'], stats['errors']) == (1, 2, 0)
@@ -0,0 +1,70 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import numpy as np
+import pymaiden_batch
+import pymaiden_npy
+import pytest
+
+rng = np.random.default_rng(29)
+lat = rng.uniform(-90, 90, 1000)
+lon = rng.uniform(-180, 180, 1000)
+lat[5] = 95
+grid_IDs, grid_valid = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 8)
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("chunk_rows", [1, 37, 1000, 5000])
+def test_npy_files(tmp_path, chunk_rows):
+    np.save(tmp_path / 'lat.npy', lat)
+    np.save(tmp_path / 'lon.npy', lon)
+    done = []
+    progress = lambda rows, total: done.append((rows, total))
+
+    ids, valid = pymaiden_npy.lat_lon_to_grid_ID_npy(tmp_path / 'lat.npy', str(tmp_path / 'lon.npy'), tmp_path / 'ids.npy',
+                                                     tmp_path / 'valid.npy', 8, chunk_rows, progress)
+    assert isinstance(ids, np.memmap)
+    assert done == [(min(rows, 1000), 1000) for rows in range(chunk_rows, 1000 + chunk_rows, chunk_rows)]
+    assert (np.load(tmp_path / 'ids.npy') == grid_IDs).all()
+    assert (np.load(tmp_path / 'valid.npy') == grid_valid).all()
+    del ids, valid
+
+    bounds, valid = pymaiden_npy.grid_location_ID_bounds_npy(tmp_path / 'ids.npy', tmp_path / 'bounds.npy', None, chunk_rows)
+    expected, expected_valid = pymaiden_batch.grid_location_ID_bounds_array(grid_IDs)
+    assert (valid == expected_valid).all()
+    for field in pymaiden_batch.bounds_dtype.names:
+        np.testing.assert_array_equal(np.load(tmp_path / 'bounds.npy')[field], expected[field])
+
+    distance = pymaiden_npy.lat_lon_distance_npy(tmp_path / 'lat.npy', lon, lat[::-1].copy(), tmp_path / 'lon.npy',
+                                                 tmp_path / 'distance.npy', 'nmi', chunk_rows)
+    np.testing.assert_array_equal(distance, pymaiden_batch.lat_lon_distance_array(lat, lon, lat[::-1], lon, 'nmi'))
+
+    np.save(tmp_path / 'ids2.npy', grid_IDs[::-1])
+    distance = pymaiden_npy.grid_location_distance_npy(tmp_path / 'ids.npy', np.load(tmp_path / 'ids2.npy', mmap_mode='r'),
+                                                       None, 'smi', chunk_rows=chunk_rows)
+    np.testing.assert_array_equal(distance, pymaiden_batch.grid_location_distance_array(grid_IDs, grid_IDs[::-1], 'smi'))
+
+
+# -------------------------------------------------------------------
+def test_npy_output_array():
+    out = np.full(1000, np.nan)
+    assert pymaiden_npy.lat_lon_distance_npy(lat, lon, lat, lon, out, chunk_rows=100) is out
+    assert np.nanmax(out) < 1e-6
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("call", [
+    lambda: pymaiden_npy.lat_lon_distance_npy(lat, lon, lat, lon[:10]),
+    lambda: pymaiden_npy.lat_lon_distance_npy(lat, lon, lat, lon, np.empty(1000, np.float32)),
+    lambda: pymaiden_npy.lat_lon_distance_npy(lat, lon, lat, lon, unit='mi'),
+    lambda: pymaiden_npy.lat_lon_to_grid_ID_npy(lat, lon, precision=5),
+    lambda: pymaiden_npy.grid_location_ID_bounds_npy(grid_IDs.reshape(10, 100)),
+    lambda: pymaiden_npy.grid_location_ID_bounds_npy(grid_IDs, chunk_rows=0),
+    ])
+def test_npy_errors(call):
+    with pytest.raises(ValueError):
+        call()
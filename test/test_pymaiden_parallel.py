@@ -0,0 +1,87 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import numpy as np
+import pymaiden_batch
+import pymaiden_parallel
+import pytest
+
+rng = np.random.default_rng(4)
+lat = rng.uniform(-90, 90, 1000)
+lon = rng.uniform(-180, 180, 1000)
+lat[7] = 95
+grid_IDs = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 6, 'U')[0]
+
+
+# -------------------------------------------------------------------
+# Process pool tests. Small chunk_rows values force several shards.
+@pytest.mark.parametrize("workers, start_method", [(1, None), (2, 'spawn'), (3, 'fork')])
+def test_lat_lon_to_grid_ID_parallel(workers, start_method):
+    result = pymaiden_parallel.lat_lon_to_grid_ID_parallel(lat, lon, 6, workers=workers, chunk_rows=300, start_method=start_method)
+    expected = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 6)
+    np.testing.assert_array_equal(result[0], expected[0])
+    np.testing.assert_array_equal(result[1], expected[1])
+
+
+def test_grid_location_ID_bounds_parallel():
+    bounds, valid = pymaiden_parallel.grid_location_ID_bounds_parallel(grid_IDs, workers=2, chunk_rows=128)
+    expected, expected_valid = pymaiden_batch.grid_location_ID_bounds_array(grid_IDs)
+    for field in pymaiden_batch.bounds_dtype.names:
+        np.testing.assert_array_equal(bounds[field], expected[field])
+    np.testing.assert_array_equal(valid, expected_valid)
+
+
+def test_distance_and_bearing_parallel():
+    elat = lat[::-1].copy()
+    elon = lon[::-1].copy()
+    np.testing.assert_array_equal(pymaiden_parallel.lat_lon_distance_parallel(lat, lon, elat, elon, 'nmi', workers=2, chunk_rows=256),
+                                  pymaiden_batch.lat_lon_distance_array(lat, lon, elat, elon, 'nmi'))
+    np.testing.assert_array_equal(pymaiden_parallel.angle_from_coordinates_parallel(lat, lon, elat, elon, True, workers=2, chunk_rows=256),
+                                  pymaiden_batch.angle_from_coordinates_array(lat, lon, elat, elon, True))
+    np.testing.assert_array_equal(pymaiden_parallel.grid_location_distance_parallel(grid_IDs, grid_IDs[::-1], workers=2, chunk_rows=256),
+                                  pymaiden_batch.grid_location_distance_array(grid_IDs, grid_IDs[::-1]))
+    np.testing.assert_array_equal(pymaiden_parallel.angle_from_grid_location_IDs_parallel(grid_IDs, "FN31pr", workers=2, chunk_rows=256),
+                                  pymaiden_batch.angle_from_grid_location_IDs_array(grid_IDs, "FN31pr"))
+
+
+def test_parallel_memmap_input(tmp_path):
+    np.save(tmp_path / 'lat.npy', lat)
+    np.save(tmp_path / 'lon.npy', lon)
+    lat_map = np.load(tmp_path / 'lat.npy', mmap_mode='r')
+    lon_map = np.load(tmp_path / 'lon.npy', mmap_mode='r')
+    assert pymaiden_parallel._is_file_mapped(lat_map)
+    assert not pymaiden_parallel._is_file_mapped(lat_map[10:])
+    result = pymaiden_parallel.lat_lon_to_grid_ID_parallel(lat_map, lon_map, workers=2, chunk_rows=400)
+    np.testing.assert_array_equal(result[0], pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon)[0])
+
+
+# Without chunk_rows the rows are split evenly over the workers, within the
+# shard size limits, scaled down here by 1000
+@pytest.mark.parametrize("rows, workers, shards", [
+    (5, 4, 0), (100, 4, 4), (100, 32, 10), (8000, 32, 32), (100000, 32, 100)])
+def test_default_chunk_rows(rows, workers, shards, monkeypatch):
+    monkeypatch.setattr(pymaiden_parallel, 'min_chunk_rows', 10)
+    monkeypatch.setattr(pymaiden_parallel, 'max_chunk_rows', 1000)
+    submitted = []
+    class RecordingPool:
+        def __init__(self, max_workers, mp_context=None):
+            assert max_workers == min(workers, shards)
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def submit(self, function, kernel, in_specs, out_specs, start, end, kwargs):
+            submitted.append(end - start)
+            return RecordingPool.Done()
+        class Done:
+            def result(self):
+                return None
+    monkeypatch.setattr(pymaiden_parallel, 'ProcessPoolExecutor', RecordingPool)
+    monkeypatch.setattr(pymaiden_parallel, 'kernels', dict(pymaiden_parallel.kernels, distance=lambda inputs, outputs, **kwargs: None))
+    lat = np.zeros(rows, dtype=np.float32)
+    pymaiden_parallel.run_parallel('distance', [lat], [np.float32], workers=workers)
+    assert len(submitted) == shards and sum(submitted) == (rows if shards else 0)
@@ -0,0 +1,82 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import io
+import pymaiden
+import pymaiden_pipeline
+import pytest
+
+spot_csv = ("tx_grid,rx_grid,rx_lat,rx_lon\n"
+            "PM95vq23BN,FN30as00SD,40.75065390774735,-73.99349806969549\n"
+            "OF78wb32FD,FF46pn81KG,-33.45302146354265,-70.67975036211871\n"
+            "bad,FF46,x,0\n"
+            "FN31pr,KI88jr,-1.286389,36.817222\n")
+
+
+# -------------------------------------------------------------------
+# CSV chunk reader tests
+@pytest.mark.parametrize("rows, sizes", [(1, [1, 1, 1, 1, 1]), (2, [2, 2, 1]), (10, [5])])
+def test_read_csv_chunks(rows, sizes):
+    chunks = list(pymaiden_pipeline.read_csv_chunks(io.StringIO(spot_csv), rows))
+    assert [len(chunk) for chunk in chunks] == sizes
+
+
+# -------------------------------------------------------------------
+# CSV spot enrichment tests
+@pytest.mark.parametrize("rows", [1, 3, 100])
+def test_enrich_spot_csv_grids(rows):
+    out = io.StringIO()
+    count = pymaiden_pipeline.enrich_spot_csv(io.StringIO(spot_csv), out, 'tx_grid', 'rx_grid', rows=rows)
+    lines = out.getvalue().splitlines()
+    assert count == 4
+    assert lines[0] == "tx_grid,rx_grid,rx_lat,rx_lon,distance_km,bearing"
+    assert lines[3].endswith(",,")
+    for line in lines[1:]:
+        fields = line.split(',')
+        if fields[-1]:
+            assert float(fields[-2]) == pytest.approx(pymaiden.grid_location_distance(fields[0], fields[1])['km'], abs=0.05)
+            assert int(fields[-1]) == pymaiden.angle_from_grid_location_IDs(fields[0], fields[1])
+
+
+def test_enrich_spot_csv_lat_lon_columns():
+    out = io.StringIO()
+    pymaiden_pipeline.enrich_spot_csv(io.StringIO(spot_csv), out, 'tx_grid', ('rx_lat', 'rx_lon'), unit='smi', model='wgs84')
+    lines = out.getvalue().splitlines()
+    assert lines[0].endswith("distance_smi,bearing")
+    assert lines[1].split(',')[-1] == str(pymaiden.angle_from_grid_location_IDs("PM95vq23BN", "FN30as00SD", model='wgs84'))
+    assert lines[3].endswith(",,")
+
+
+def test_enrich_spot_csv_no_header():
+    out = io.StringIO()
+    data = spot_csv.split('\n', 1)[1].replace(',', '\t')
+    count = pymaiden_pipeline.enrich_spot_csv(io.StringIO(data), out, 0, 1, header=False, delimiter='\t')
+    assert count == 4
+    assert out.getvalue().splitlines()[0].split('\t')[:2] == ["PM95vq23BN", "FN30as00SD"]
+    with pytest.raises(ValueError):
+        pymaiden_pipeline.enrich_spot_csv(io.StringIO(data), io.StringIO(), 'tx_grid', 1, header=False)
+
+
+# Blank and short rows are kept with empty distance and bearing fields
+def test_enrich_spot_csv_short_rows():
+    out = io.StringIO()
+    data = "tx_grid,rx_grid,rx_lat,rx_lon\nFN31pr,KI88jr\n\nFN31pr\nFN31pr,KI88jr,-1.286389,36.817222\n"
+    count = pymaiden_pipeline.enrich_spot_csv(io.StringIO(data), out, 'tx_grid', ('rx_lat', 'rx_lon'))
+    lines = out.getvalue().splitlines()
+    assert count == 4
+    assert lines[1:4] == ["FN31pr,KI88jr,,", ",", "FN31pr,,"]
+    assert lines[4].split(',')[-1] == str(pymaiden.angle_from_coordinates(41.72916666666667, -72.70833333333333, -1.286389, 36.817222))
+
+
+@pytest.mark.parametrize("unit, model", [('km', 'WGS84'), ('km', 'ellipsoid'), ('miles', 'sphere')])
+def test_enrich_spot_bad_unit_model(unit, model):
+    with pytest.raises(ValueError):
+        list(pymaiden_pipeline.enrich_spot_chunks([[["FN31pr", "KI88jr"]]], 0, 1, unit, model))
+    out = io.StringIO()
+    with pytest.raises(ValueError):
+        pymaiden_pipeline.enrich_spot_csv(io.StringIO(spot_csv), out, 'tx_grid', 'rx_grid', unit=unit, model=model)
+    assert out.getvalue() == ''
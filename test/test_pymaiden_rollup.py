@@ -0,0 +1,81 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import collections
+import numpy as np
+import pymaiden
+import pymaiden_batch
+import pymaiden_rollup
+import pytest
+
+rng = np.random.default_rng(16)
+lat = rng.uniform(-90, 90, 3000)
+lon = rng.uniform(-180, 180, 3000)
+lengths = rng.choice([2, 4, 6, 8, 10], lat.size)
+grid_IDs = [grid_ID[:length] for grid_ID, length in zip(pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 10, 'U')[0].tolist(), lengths)]
+grid_IDs += ['FN31', 'FN31pr', 'FN31', 'zz99', 'FN3']
+weights = rng.uniform(0, 100, len(grid_IDs))
+
+
+# Aggregate with a dict as the reference
+def expected_rollup(precision, how):
+    groups = collections.defaultdict(list)
+    for grid_ID, weight in zip(grid_IDs, weights.tolist()):
+        if len(grid_ID) >= precision and pymaiden.grid_location_valid_ID(grid_ID):
+            groups[grid_ID[:precision]].append(weight)
+    reduce = {'count': len, 'sum': sum, 'max': max}[how]
+    return {grid_ID: reduce(values) for grid_ID, values in groups.items()}
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("how", ['count', 'sum', 'max'])
+def test_grid_location_rollup(how):
+    levels = pymaiden_rollup.grid_location_rollup(grid_IDs, None if how == 'count' else weights, (2, 4, 6, 8, 10), how, 'U')
+    assert list(levels) == [2, 4, 6, 8, 10]
+    for precision in (2, 4):
+        expected = expected_rollup(precision, how)
+        labels = pymaiden_rollup.rollup_grid_IDs(precision, dtype='U')
+        assert levels[precision].shape == (pymaiden_rollup.level_squares[precision // 2],)
+        for grid_ID, value in zip(labels.tolist(), levels[precision].tolist()):
+            if grid_ID in expected:
+                assert value == pytest.approx(expected[grid_ID])
+            elif how == 'max':
+                assert np.isnan(value)
+            else:
+                assert value == 0
+    for precision in (6, 8, 10):
+        expected = expected_rollup(precision, how)
+        labels, values = levels[precision]
+        assert labels.tolist() == sorted(expected)
+        assert values.tolist() == pytest.approx([expected[grid_ID] for grid_ID in labels.tolist()])
+
+
+def test_grid_location_rollup_codes():
+    codes = pymaiden_batch.pack_grid_ID_array(grid_IDs)[0]
+    from_codes = pymaiden_rollup.grid_location_rollup(codes, precisions=(4, 6))
+    from_IDs = pymaiden_rollup.grid_location_rollup(np.array(grid_IDs), precisions=(4, 6))
+    np.testing.assert_array_equal(from_codes[4], from_IDs[4])
+    np.testing.assert_array_equal(from_codes[6][0], from_IDs[6][0])
+    np.testing.assert_array_equal(from_codes[6][1], from_IDs[6][1])
+    assert from_IDs[4].dtype == np.int64
+    assert from_IDs[6][0].dtype.kind == 'S'
+
+
+def test_rollup_grid_IDs():
+    fields = pymaiden_rollup.rollup_grid_IDs(2, dtype='U')
+    assert fields[0] == 'AA' and fields[1] == 'AB' and fields[-1] == 'RR'
+    squares = pymaiden_rollup.rollup_grid_IDs(4)
+    assert squares.size == 32400 and squares[0] == b'AA00' and squares[1] == b'AA01' and squares[10] == b'AA10'
+    assert (np.sort(squares) == squares).all()
+    assert pymaiden_rollup.rollup_grid_IDs(10, [0, pymaiden_rollup.level_squares[5] - 1], 'U').tolist() == ['AA00aa00AA', 'RR99xx99XX']
+
+
+@pytest.mark.parametrize("args", [{'how': 'mean'}, {'how': 'sum'}, {'precisions': (3,)}, {'dtype': 'B'},
+                                  {'how': 'count', 'weights': 0.5}, {'weights': np.full(len(grid_IDs), 0.25)}])
+def test_grid_location_rollup_invalid(args):
+    with pytest.raises(ValueError):
+        pymaiden_rollup.grid_location_rollup(grid_IDs, **args)
@@ -0,0 +1,165 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import pymaiden
+import pymaiden_service
+from pymaiden_service import MaidenheadService
+import pytest
+
+grid_IDs = ['FN31pr', 'JO62qm', 'RR99xx99XX', 'AA00aa00AA', 'FN31', 'zz', 'FN3']
+
+
+# Send one request over HTTP and return the status and JSON response
+async def http_request(port, method, path, request=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(request).encode() if request is not None else b''
+    writer.write(b'%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\nConnection: close\r\n\r\n'
+                 % (method.encode(), path.encode(), len(body)) + body)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+def run_service(requests, max_batch=4096, max_wait=0.01):
+    async def main():
+        service = MaidenheadService(max_batch, max_wait)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            responses = await asyncio.gather(*(http_request(port, *request) for request in requests))
+            return responses, service.stats()
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+# -------------------------------------------------------------------
+def test_service_results():
+    pairs = [[gl_id1, gl_id2] for gl_id1 in grid_IDs for gl_id2 in grid_IDs]
+    locations = [[41.714775, -72.727260], [-33.9, 151.2], [95, 0]]
+    responses, stats = run_service([
+        ('POST', '/validate', {'items': grid_IDs}),
+        ('POST', '/encode', {'items': locations, 'precision': 6}),
+        ('POST', '/decode', {'items': grid_IDs}),
+        ('POST', '/size', {'items': grid_IDs}),
+        ('POST', '/distance', {'items': pairs, 'unit': 'smi'}),
+        ('POST', '/bearing', {'items': pairs})])
+    assert all(status == 200 for status, response in responses)
+    validate, encode, decode, size, distance, bearing = (response['results'] for status, response in responses)
+
+    assert validate == [pymaiden.grid_location_valid_ID(gl_id) for gl_id in grid_IDs]
+    assert encode == [(pymaiden.lat_lon_to_grid_ID(lat, lon) or None) and pymaiden.lat_lon_to_grid_ID(lat, lon)[:6] for lat, lon in locations]
+    for gl_id, result in zip(grid_IDs, decode):
+        if not pymaiden.grid_location_valid_ID(gl_id):
+            assert result is None
+            continue
+        bounds = pymaiden.grid_location_ID_bounds(gl_id)
+        assert (result['sw_lat'], result['sw_lon']) == pytest.approx((bounds['SW']['lat'], bounds['SW']['lon']))
+        assert (result['cen_lat'], result['cen_lon']) == pytest.approx((bounds['CEN']['lat'], bounds['CEN']['lon']))
+        assert (result['dlat'], result['dlon']) == pytest.approx((bounds['NE']['lat'] - bounds['SW']['lat'], bounds['NE']['lon'] - bounds['SW']['lon']))
+    for gl_id, result in zip(grid_IDs, size):
+        expected = pymaiden.grid_location_size(gl_id) if pymaiden.grid_location_valid_ID(gl_id) else None
+        assert result == (expected if expected is None else pytest.approx(expected))
+    for (gl_id1, gl_id2), result, angle in zip(pairs, distance, bearing):
+        if not (pymaiden.grid_location_valid_ID(gl_id1) and pymaiden.grid_location_valid_ID(gl_id2)):
+            assert result is None and angle is None
+            continue
+        assert result == pytest.approx(pymaiden.grid_location_distance(gl_id1, gl_id2)['smi'], abs=1e-3)
+        if gl_id1 != gl_id2:
+            assert abs((angle - pymaiden.angle_from_grid_location_IDs(gl_id1, gl_id2) + 180) % 360 - 180) <= 0.5
+
+
+# -------------------------------------------------------------------
+def test_service_coalesces_requests():
+    requests = [('POST', '/validate', {'items': grid_IDs[:3]}) for i in range(40)]
+    responses, stats = run_service(requests + [('GET', '/stats')], max_batch=30)
+    assert all(response == (200, {'results': [True, True, True]}) for response in responses[:-1])
+    validate = stats['validate']
+    assert validate['requests'] == 40
+    assert validate['items'] == 120
+    assert validate['batches'] < 40
+    assert validate['max_batch_size'] <= 30
+    assert validate['queue_depth'] == 0
+    assert sum(validate['batch_size_histogram'].values()) == validate['batches']
+
+
+# Sizes are calculated once per latitude row and given to every grid ID in the row
+def test_service_size_rows():
+    gl_ids = ['FN31pr', 'AA31pr', 'RR31pr', 'FN31pq', 'FN31', 'FN31pr00AA', 'zz', 'FN31pr']
+    results = pymaiden_service._size_batch(gl_ids)
+    for gl_id, result in zip(gl_ids, results):
+        expected = pymaiden.grid_location_size(gl_id) if pymaiden.grid_location_valid_ID(gl_id) else None
+        assert result == (expected if expected is None else pytest.approx(expected))
+    assert pymaiden_service._size_batch([]) == []
+
+
+# Batches running on the executor are counted in the queue depth
+def test_service_queue_depth_running():
+    started = threading.Event()
+    release = threading.Event()
+    def blocked(items):
+        started.set()
+        release.wait(5)
+        return items
+
+    async def main():
+        executor = ThreadPoolExecutor(1)
+        batcher = pymaiden_service.Batcher(blocked, executor, max_batch=3, max_wait=0)
+        task = asyncio.create_task(batcher.submit([1, 2, 3]))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        running = batcher.stats()
+        release.set()
+        results = await task
+        executor.shutdown()
+        return running, batcher.stats(), results
+
+    running, finished, results = asyncio.run(main())
+    assert results == [1, 2, 3]
+    assert running['queue_depth'] == 3 and running['running_batches'] == 1
+    assert finished['queue_depth'] == 0 and finished['running_batches'] == 0
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("request_, status", [
+    (('POST', '/nope', {'items': []}), 404),
+    (('GET', '/validate'), 405),
+    (('POST', '/validate', {'items': 'FN31'}), 400),
+    (('POST', '/encode', {'items': [[41, -72]], 'precision': 5}), 400),
+    (('POST', '/encode', {'items': [[41, -72]], 'precision': 6.0}), 400),
+    (('POST', '/encode', {'items': [[True, -72]]}), 400),
+    (('POST', '/distance', {'items': [['FN31', 'JO62']], 'unit': 'mi'}), 400),
+    (('POST', '/bearing', {'items': [['FN31']]}), 400),
+    (('POST', '/validate', {'items': []}), 200),
+    ])
+def test_service_errors(request_, status):
+    responses, stats = run_service([request_])
+    assert responses[0][0] == status
+
+
+# A request that fails its batch is run again on its own, the others coalesced
+# with it still get their results
+def test_service_failed_batch_runs_requests_alone():
+    def first_item_int(items):
+        return [int(item) for item in items]
+
+    async def main():
+        executor = ThreadPoolExecutor(1)
+        batcher = pymaiden_service.Batcher(first_item_int, executor, max_batch=10, max_wait=0.01)
+        results = await asyncio.gather(batcher.submit(['1', '2']), batcher.submit(['x']), batcher.submit(['3']),
+                                       return_exceptions=True)
+        executor.shutdown()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(main())
+    assert results[0] == [1, 2] and results[2] == [3]
+    assert isinstance(results[1], ValueError)
+    assert stats['batches'] == 1 and stats['queue_depth'] == 0 and stats['running_batches'] == 0
@@ -0,0 +1,50 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import numpy as np
+import pymaiden
+import pymaiden_rollup
+import pymaiden_table
+import pytest
+
+squares = pymaiden_rollup.rollup_grid_IDs(4, dtype='U')
+
+
+# -------------------------------------------------------------------
+# Only a few blocks of the table are built. The table files are sparse.
+def test_build_square_table(tmp_path):
+    progress = []
+    left = pymaiden_table.build_square_table(tmp_path, workers=2, rows_per_block=64, blocks=[0, 506], report=lambda done, total: progress.append((done, total)))
+    assert left == 505 and progress == [(1, 507), (2, 507)]
+    with pytest.raises(ValueError):
+        pymaiden_table.SquareTable(tmp_path)
+    with pytest.raises(ValueError):
+        pymaiden_table.build_square_table(tmp_path, rows_per_block=128, blocks=[])
+    # Block numbers outside the table are rejected before anything is built
+    for blocks in ([507], [-1], [1, 2.0]):
+        with pytest.raises(ValueError):
+            pymaiden_table.build_square_table(tmp_path, rows_per_block=64, blocks=blocks)
+    assert pymaiden_table.build_square_table(tmp_path, workers=1, rows_per_block=64, blocks=[]) == 505
+
+    # Resuming skips the blocks already built
+    assert pymaiden_table.build_square_table(tmp_path, workers=1, rows_per_block=64, blocks=[0, 1]) == 504
+
+    table = pymaiden_table.SquareTable(tmp_path, partial=True)
+    for row, column in [(0, 5), (3, 32399), (100, 16000), (32399, 0), (32399, 32399), (32390, 12345)]:
+        start = squares[row]
+        end = squares[column]
+        assert table.distance(start, end) == round(pymaiden.grid_location_distance(start, end)['km'])
+        assert table.bearing(start + "ll", end + "aa") == pytest.approx(pymaiden.angle_from_grid_location_IDs(start, end), abs=0.5)
+    assert table.distance(pymaiden.pack_grid_ID("AA00"), "AA05") == 556
+    assert table.distance("AA", "AA05") is False
+    assert table.bearing("AA00", "zz") is False
+
+    distances = table.distance_array(np.array(["AA00", "AA01xx", "zz", "AA"]), "AA05")
+    np.testing.assert_array_equal(distances, [556, 445, np.nan, np.nan])
+    bearings = table.bearing_array(["AA00", "RR99"], [["RR99"], ["AA00"]])
+    assert bearings.shape == (2, 2)
+    assert bearings[1, 1] == pytest.approx(pymaiden.angle_from_grid_location_IDs("RR99", "AA00"), abs=0.5)
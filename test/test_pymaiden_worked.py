@@ -0,0 +1,78 @@
+# This setup is needed to access pymaiden imports while working from the \test directory
+import os
+import sys
+test_path = os.path.dirname(__file__)
+pymaiden_path = test_path.removesuffix('\\test')
+sys.path.insert(0, pymaiden_path)
+
+import numpy as np
+import pymaiden
+import pymaiden_batch
+from pymaiden_worked import WorkedGrids
+import pytest
+
+rng = np.random.default_rng(17)
+lat = rng.uniform(-90, 90, 2000)
+lon = rng.uniform(-180, 180, 2000)
+grid_IDs = pymaiden_batch.lat_lon_to_grid_ID_array(lat, lon, 10, 'U')[0].tolist()
+log1 = grid_IDs[:1200]
+log2 = grid_IDs[800:]
+
+
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("precision", [2, 4, 6, 8, 10])
+def test_worked_grids(precision):
+    worked1 = WorkedGrids(precision)
+    for grid_ID in log1:
+        worked1.add(grid_ID)
+    worked2 = WorkedGrids(precision, np.array(log2))
+    expected1 = {grid_ID[:precision] for grid_ID in log1}
+    expected2 = {grid_ID[:precision] for grid_ID in log2}
+
+    assert len(worked1) == len(expected1)
+    assert list(worked1) == sorted(expected1)
+    assert set(worked1 | worked2) == expected1 | expected2
+    assert set(worked1 & worked2) == expected1 & expected2
+    assert set(worked1 - worked2) == expected1 - expected2
+    assert all(grid_ID in worked2 for grid_ID in log2)
+    assert worked2.test_array(log1).tolist() == [grid_ID[:precision] in expected2 for grid_ID in log1]
+    assert WorkedGrids.from_bytes(worked1.to_bytes()) == worked1
+
+
+def test_worked_grids_codes():
+    worked = WorkedGrids(4)
+    assert worked.add(pymaiden.pack_grid_ID("FN31pr"))
+    assert not worked.add("FN31")
+    assert "FN31" in worked and "FN31aa" in worked and pymaiden.pack_grid_ID("FN31") in worked
+    assert "FN32" not in worked and "FN3" not in worked and "fn31" not in worked and "FN31p" not in worked
+    assert pymaiden.pack_grid_ID("FN") not in worked
+    codes = pymaiden_batch.pack_grid_ID_array(["FN31", "FN", "FN31xx", "JJ00"])[0]
+    assert worked.test_array(codes).tolist() == [True, False, True, False]
+    assert worked.update(codes).tolist() == [True, False, True, True]
+    assert list(worked) == ["FN31", "JJ00"]
+
+
+def test_worked_grids_bytes():
+    worked = WorkedGrids(4, ["AA00", "RR99"])
+    data = worked.to_bytes()
+    assert len(data) == 3 + 32400 // 8
+    assert data[3] == 1 and data[-1] == 0x80
+    sparse = WorkedGrids(6, ["AA00aa", "RR99xx"]).to_bytes()
+    assert sparse[3:] == np.array([0, 18662399], dtype='<u4').tobytes()
+
+
+@pytest.mark.parametrize("data", [b'', b'XX\x04', b'WG\x03', b'WG\x04\x00', b'WG\x06\x00\x00\x00', b'WG\x06\xff\xff\xff\xff'])
+def test_worked_grids_bad_bytes(data):
+    with pytest.raises(ValueError):
+        WorkedGrids.from_bytes(data)
+
+
+def test_worked_grids_invalid():
+    with pytest.raises(ValueError):
+        WorkedGrids(4).add("FN")
+    with pytest.raises(ValueError):
+        WorkedGrids(4).add("ZZ99")
+    with pytest.raises(ValueError):
+        WorkedGrids(4) | WorkedGrids(6)
+    with pytest.raises(ValueError):
+        WorkedGrids(5)